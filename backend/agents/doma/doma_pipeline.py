@@ -13,6 +13,14 @@ class DOMAAgent:
         ans = self.lease.run(question, retrieved_chunks)
         return {"stage":"DOMA","lease_answer": ans.model_dump()}
 
+    async def ahandle_lease(self, question: str, retrieved_chunks: List[Dict[str, Any]]):
+        ans = await self.lease.arun(question, retrieved_chunks)
+        return {"stage":"DOMA","lease_answer": ans.model_dump()}
+
+    async def astream_lease(self, question: str, retrieved_chunks: List[Dict[str, Any]]):
+        async for event, data in self.lease.astream(question, retrieved_chunks):
+            yield event, ({"stage":"DOMA","lease_answer": data} if event == "answer" else data)
+
     def handle_triage(self, ticket_text: str, photos: List[str] | None = None):
         res = self.triage.run(ticket_text, photos)
         return {"stage":"DOMA","triage": res.model_dump()}
@@ -0,0 +1,53 @@
+"""
+Handlers for DOMA events on buildwise.events, run by EventConsumer workers.
+
+Each handler turns an event into a follow-up event for the next system in
+line: vendor dispatch, or a manager/tenant notification. It carries
+`source_event_id`, so downstream consumers can drop duplicates when an
+event is redelivered after a worker crash.
+"""
+
+import time
+import logging
+from typing import Dict, Any
+
+from backend.core.notifications import publish_event
+
+logger = logging.getLogger("buildwise")
+
+TRIAGE_GROUP = "doma-vendor-dispatch"
+RENEWAL_GROUP = "doma-renewal-notify"
+
+def _due_at(hours: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + hours * 3600))
+
+def dispatch_vendor(evt: Dict[str, Any]):
+    """doma.triage.created -> doma.vendor.dispatched for the assigned vendor."""
+    triage = evt["payload"]["triage"]
+    dispatch = {
+        "source_event_id": evt["event_id"],
+        "vendor": triage["vendor"],
+        "category": triage["category"],
+        "priority": triage["priority"],
+        "due_at": _due_at(triage["eta_hours"]),
+    }
+    if triage["priority"] == "P0":
+        logger.warning(f"Emergency dispatch to {triage['vendor']} for event {evt['event_id']}")
+    publish_event("doma.vendor.dispatched", dispatch, actor="VendorDispatch", conv_id=evt.get("conversation_id"))
+
+def notify_renewal(evt: Dict[str, Any]):
+    """doma.renewal.offer -> a manager approval request, or an offer-ready notice for the tenant."""
+    renewal = evt["payload"]["renewal"]
+    notice = {
+        "source_event_id": evt["event_id"],
+        "primary": renewal["primary"],
+        "alternatives": len(renewal.get("alternatives", [])),
+        "justification": renewal.get("justification"),
+    }
+    event_type = "doma.renewal.approval_requested" if renewal.get("needs_manager_approval") else "doma.renewal.offer_ready"
+    publish_event(event_type, notice, actor="RenewalNotifier", conv_id=evt.get("conversation_id"))
+
+def register(triage_consumer, renewal_consumer=None):
+    """Attaches the handlers; pass one consumer to run both in the same group."""
+    triage_consumer.register("doma.triage.created", dispatch_vendor)
+    (renewal_consumer or triage_consumer).register("doma.renewal.offer", notify_renewal)
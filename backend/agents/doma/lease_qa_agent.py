@@ -1,28 +1,85 @@
-from typing import List, Dict, Any
+import os
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from pydantic import BaseModel
-from openai import OpenAI
+from backend.core.llm_gateway import get_gateway
+from backend.core.embedding_cache import embed_with_cache, aembed_with_cache
+from backend.core.answer_cache import get_answer_cache
 
-client = OpenAI()
+llm = get_gateway()
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 
 class LeaseAnswer(BaseModel):
     answer: str
     citations: List[Dict[str, Any]]
     risk_flags: List[str] = []
+    cached: bool = False
 
 SYSTEM = (
     "You answer strictly from retrieved lease text. Cite section and page. "
     "If the answer is not in the text, say 'Not found in provided lease' and suggest escalation."
 )
 
+def _chunk_key(c: Dict[str, Any]) -> str:
+    # caller-supplied chunks may not carry ids; their text identifies them
+    return c.get("id") or hashlib.sha256(c.get("text", "").encode("utf-8")).hexdigest()[:16]
+
 class LeaseQAAgent:
-    def run(self, question: str, retrieved_chunks: List[Dict[str, Any]]) -> LeaseAnswer:
-        context = "\n\n".join([f"[{c.get('source','doc')} p{c.get('page', '?')}] {c['text']}" for c in retrieved_chunks])
-        messages = [
+    def _cache_context(self, retrieved_chunks: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+        return [c.get("source", "doc") for c in retrieved_chunks], [_chunk_key(c) for c in retrieved_chunks]
+
+    def _cached(self, question: str, retrieved_chunks: List[Dict[str, Any]], q_emb: List[float]) -> Optional[LeaseAnswer]:
+        # near-duplicate questions over the same lease context reuse the earlier answer
+        hit = get_answer_cache().get(*self._cache_context(retrieved_chunks), q_emb)
+        return LeaseAnswer(**{**hit["answer"], "cached": True}) if hit else None
+
+    def _messages(self, question: str, retrieved_chunks: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        context = "\n\n".join([f"[{c.get('source','doc')} p{c.get('page', '?')}] {c['text']}"
+                                for c in retrieved_chunks if c.get("text")])
+        return [
             {"role":"system","content":SYSTEM},
             {"role":"user","content": f"Lease snippets:\n{context}\n\nQuestion: {question}\nProvide a concise answer with inline citations."}
         ]
-        resp = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
-        txt = resp.choices[0].message.content
+
+    def _answer(self, question: str, retrieved_chunks: List[Dict[str, Any]], q_emb: List[float], txt: str) -> LeaseAnswer:
         # simple placeholder citation extraction
         cits = [{"section":"unknown","page": c.get("page")} for c in retrieved_chunks[:2]]
-        return LeaseAnswer(answer=txt, citations=cits)
+        ans = LeaseAnswer(answer=txt, citations=cits)
+        get_answer_cache().put(*self._cache_context(retrieved_chunks), q_emb, question, ans.model_dump(exclude={"cached"}))
+        return ans
+
+    def run(self, question: str, retrieved_chunks: List[Dict[str, Any]]) -> LeaseAnswer:
+        q_emb = embed_with_cache(llm.client, [question], EMBED_MODEL)[0]
+        cached = self._cached(question, retrieved_chunks, q_emb)
+        if cached:
+            return cached
+        resp = llm.client.chat.completions.create(model="gpt-4o-mini", messages=self._messages(question, retrieved_chunks))
+        return self._answer(question, retrieved_chunks, q_emb, resp.choices[0].message.content)
+
+    async def arun(self, question: str, retrieved_chunks: List[Dict[str, Any]]) -> LeaseAnswer:
+        q_emb = (await aembed_with_cache(llm.aclient, [question], EMBED_MODEL))[0]
+        cached = self._cached(question, retrieved_chunks, q_emb)
+        if cached:
+            return cached
+        resp = await llm.aclient.chat.completions.create(model="gpt-4o-mini", messages=self._messages(question, retrieved_chunks))
+        return self._answer(question, retrieved_chunks, q_emb, resp.choices[0].message.content)
+
+    async def astream(self, question: str, retrieved_chunks: List[Dict[str, Any]]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yields ("token", {"text": ...}) as the model writes, then ("answer", LeaseAnswer) with the citations."""
+        q_emb = (await aembed_with_cache(llm.aclient, [question], EMBED_MODEL))[0]
+        cached = self._cached(question, retrieved_chunks, q_emb)
+        if cached:
+            yield "token", {"text": cached.answer}
+            yield "answer", cached.model_dump()
+            return
+        stream = await llm.aclient.chat.completions.create(model="gpt-4o-mini", messages=self._messages(question, retrieved_chunks),
+                                                           stream=True)
+        parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield "token", {"text": delta}
+        # only a completed answer reaches the cache; a dropped stream never gets here
+        yield "answer", self._answer(question, retrieved_chunks, q_emb, "".join(parts)).model_dump()
@@ -0,0 +1,135 @@
+from typing import List, Dict, Any, Iterable, Optional, Sequence
+import numpy as np
+
+NUMERIC_FIELDS = ("sqft", "rent", "ppsf_year")
+
+def _num(v) -> float:
+    try:
+        return np.nan if v is None or v == "" else float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+class InventoryIndex:
+    """
+    Secondary indexes over inventory rows for sub-linear candidate generation.
+
+    - sqft / rent / ppsf_year: row ids sorted by value, range queries by binary search
+    - location: inverted index from each distinct (lower-cased) location text, e.g.
+      a neighborhood, to its rows; queries substring-match the distinct texts only,
+      so cost grows with the number of neighborhoods/buildings, not units
+    - amenities: one packed bitmap per amenity over all rows
+
+    Every query returns a sorted array of row positions into `rows`.
+    Missing numeric values are NaN and never match a range.
+    """
+    def __init__(self, rows: List[Dict[str, Any]], text_fields: Sequence[str] = ("neighborhood",)):
+        self.rows = rows
+        self.n = n = len(rows)
+
+        self.columns: Dict[str, np.ndarray] = {}
+        self._sorted: Dict[str, np.ndarray] = {}
+        self._sorted_ids: Dict[str, np.ndarray] = {}
+        for f in NUMERIC_FIELDS:
+            col = np.fromiter((_num(r.get(f)) for r in rows), dtype=np.float64, count=n)
+            ids = np.flatnonzero(~np.isnan(col))
+            order = ids[np.argsort(col[ids], kind="stable")]
+            self.columns[f] = col
+            self._sorted[f] = col[order]
+            self._sorted_ids[f] = order
+
+        self.text_fields = tuple(text_fields)
+        postings: Dict[str, List[int]] = {}
+        for i, r in enumerate(rows):
+            text = " ".join(str(r.get(k) or "") for k in self.text_fields).strip().lower()
+            if text:
+                postings.setdefault(text, []).append(i)
+        self._text_postings = {t: np.array(ids, dtype=np.int64) for t, ids in postings.items()}
+
+        amenity_rows: Dict[str, List[int]] = {}
+        for i, r in enumerate(rows):
+            am = r.get("amenities") or []
+            for a in (am if isinstance(am, list) else [am]):
+                amenity_rows.setdefault(str(a).lower(), []).append(i)
+        self._amenity_bitmaps: Dict[str, np.ndarray] = {}
+        for a, ids in amenity_rows.items():
+            bits = np.zeros(n, dtype=bool)
+            bits[ids] = True
+            self._amenity_bitmaps[a] = np.packbits(bits)
+
+        self.all_ids = np.arange(n, dtype=np.int64)
+        self._flags: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.n
+
+    def range(self, field: str, lo: Optional[float] = None, hi: Optional[float] = None) -> np.ndarray:
+        """Rows with lo <= field <= hi (either bound optional)."""
+        vals = self._sorted[field]
+        start = 0 if lo is None else np.searchsorted(vals, lo, side="left")
+        end = len(vals) if hi is None else np.searchsorted(vals, hi, side="right")
+        return np.sort(self._sorted_ids[field][start:end])
+
+    def range_count(self, field: str, lo: Optional[float] = None, hi: Optional[float] = None) -> int:
+        """Size of range(field, lo, hi) without materializing it."""
+        vals = self._sorted[field]
+        start = 0 if lo is None else np.searchsorted(vals, lo, side="left")
+        end = len(vals) if hi is None else np.searchsorted(vals, hi, side="right")
+        return int(max(0, end - start))
+
+    def _location_postings(self, locations: Iterable[str]) -> List[np.ndarray]:
+        locs = [l.lower() for l in locations]
+        return [ids for text, ids in self._text_postings.items() if any(l in text for l in locs)]
+
+    def location(self, locations: Iterable[str]) -> np.ndarray:
+        """Rows whose location text contains any of `locations` (case-insensitive substring)."""
+        hits = self._location_postings(locations)
+        # each row has one location text, so postings are disjoint
+        return np.sort(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+
+    def location_count(self, locations: Iterable[str]) -> int:
+        return sum(len(ids) for ids in self._location_postings(locations))
+
+    def location_mask(self, locations: Iterable[str]) -> np.ndarray:
+        """Dense boolean form of location(), cheaper when most rows match."""
+        mask = np.zeros(self.n, dtype=bool)
+        for ids in self._location_postings(locations):
+            mask[ids] = True
+        return mask
+
+    def _bitmap_ids(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n)).astype(np.int64)
+
+    def amenities_all(self, amenities: Iterable[str]) -> np.ndarray:
+        """Rows having every amenity; all rows when none are required."""
+        amenities = {a.lower() for a in amenities}
+        if not amenities:
+            return self.all_ids
+        if any(a not in self._amenity_bitmaps for a in amenities):
+            return np.empty(0, dtype=np.int64)
+        bitmap = None
+        for a in amenities:
+            bitmap = self._amenity_bitmaps[a] if bitmap is None else bitmap & self._amenity_bitmaps[a]
+        return self._bitmap_ids(bitmap)
+
+    def amenities_any(self, amenities: Iterable[str]) -> np.ndarray:
+        """Rows having at least one of the amenities."""
+        bitmap = None
+        for a in {a.lower() for a in amenities}:
+            if a in self._amenity_bitmaps:
+                bitmap = self._amenity_bitmaps[a] if bitmap is None else bitmap | self._amenity_bitmaps[a]
+        return np.empty(0, dtype=np.int64) if bitmap is None else self._bitmap_ids(bitmap)
+
+    def flag(self, field: str) -> np.ndarray:
+        """Rows where a boolean field is truthy (e.g. near_transit); built on first use."""
+        if field not in self._flags:
+            self._flags[field] = np.array([i for i, r in enumerate(self.rows) if r.get(field)], dtype=np.int64)
+        return self._flags[field]
+
+    @staticmethod
+    def union(*id_arrays: np.ndarray) -> np.ndarray:
+        arrays = [a for a in id_arrays if len(a)]
+        return np.unique(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.int64)
+
+    @staticmethod
+    def intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return np.intersect1d(a, b, assume_unique=True)
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import numpy as np
+from .inventory_index import InventoryIndex
 
 class MatchItem(BaseModel):
     id: str
@@ -18,9 +19,17 @@ class MatchRankAgent:
     """
     Hybrid ranking placeholder.
     In production, replace with pgvector or Pinecone similarity + rules.
+
+    Candidates come from an InventoryIndex: the amenity bitmaps give the hard-filter
+    survivors; for selective specs the range/location postings give the only rows
+    that can score above zero and just those are scored, otherwise all survivors are
+    scored as vectorized column masks. Only the top-N winners become MatchItem objects.
+    When too few units fit max_sqft, the sqft range index finds the ones a 10% wider
+    limit admits and the spec is re-ranked with it.
     """
     def __init__(self, inventory_rows: List[Dict[str, Any]]):
         self.inventory = inventory_rows
+        self.index = InventoryIndex(inventory_rows)
 
     def _hard_filter(self, row: Dict[str, Any], spec: Dict[str, Any]) -> bool:
         musts = {m.lower() for m in spec.get("must_haves", [])}
@@ -47,27 +56,147 @@ class MatchRankAgent:
                 s += 20
         return float(np.clip(s, 0, 100))
 
+    # Above this share of the inventory, postings cost more than scanning columns
+    SPARSE_MAX_FRACTION = 0.05
+    WEIGHTS = {"min_sqft": 20, "max_sqft": 20, "budget_min": 15, "budget_max": 15, "location": 20}
+
+    @staticmethod
+    def _criteria(spec: Dict[str, Any]) -> Dict[str, tuple]:
+        """Scoring criteria present in the spec: name -> (field, lo, hi) or location list."""
+        crit = {}
+        if spec.get("min_sqft"):
+            crit["min_sqft"] = ("sqft", spec["min_sqft"], None)
+        if spec.get("max_sqft"):
+            crit["max_sqft"] = ("sqft", None, spec["max_sqft"])
+        if spec.get("budget_monthly_usd"):
+            b = spec["budget_monthly_usd"]
+            if b.get("min") is not None:
+                crit["budget_min"] = ("rent", b["min"], None)
+            if b.get("max") is not None:
+                crit["budget_max"] = ("rent", None, b["max"])
+        if spec.get("location"):
+            crit["location"] = ("location", spec["location"])
+        return crit
+
+    def _estimate(self, crit: Dict[str, tuple]) -> int:
+        idx = self.index
+        return sum(idx.location_count(c[1]) if name == "location" else idx.range_count(*c)
+                   for name, c in crit.items())
+
+    def _member(self, name: str, c: tuple, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whether each row (all rows, or `ids`) earns criterion `name`."""
+        idx = self.index
+        if name == "location":
+            mask = idx.location_mask(c[1])
+            return mask if ids is None else mask[ids]
+        field, lo, hi = c
+        col = idx.columns[field] if ids is None else idx.columns[field][ids]
+        # the row rules only count truthy values, so a 0 never earns points (NaN compares False)
+        m = col != 0
+        if lo is not None:
+            m &= col >= lo
+        if hi is not None:
+            m &= col <= hi
+        return m
+
+    @staticmethod
+    def _top_n(idx: np.ndarray, scores: np.ndarray, topn: int) -> np.ndarray:
+        """Top-N of idx by score descending, ties in inventory order (same as a stable sort)."""
+        if len(idx) > topn > 0:
+            kth = np.argpartition(-scores, topn - 1)[:topn]
+            thr = scores[kth].min()
+            above = scores > thr
+            tie = np.flatnonzero(scores == thr)[:topn - int(above.sum())]
+            keep = np.concatenate([np.flatnonzero(above), tie])
+            idx, scores = idx[keep], scores[keep]
+        order = np.lexsort((idx, -scores))[:max(topn, 0)]
+        return idx[order], scores[order]
+
+    def _rank(self, spec: Dict[str, Any], candidates: np.ndarray, topn: int):
+        crit = self._criteria(spec)
+        if self._estimate(crit) > self.SPARSE_MAX_FRACTION * len(self.index):
+            # dense: score every hard-filter survivor from the columns
+            s = np.zeros(len(self.index), dtype=np.float64)
+            for name, c in crit.items():
+                s += self.WEIGHTS[name] * self._member(name, c)
+            ids, scores = self._top_n(candidates, np.clip(s[candidates], 0, 100), topn)
+            return [(int(i), float(sc)) for i, sc in zip(ids, scores)]
+
+        # sparse: only rows in some criterion's postings can score above zero
+        idx = self.index
+        postings = [idx.location(c[1]) if name == "location" else idx.range(*c) for name, c in crit.items()]
+        pos = InventoryIndex.intersect(InventoryIndex.union(*postings), candidates)
+        scores = np.zeros(len(pos), dtype=np.float64)
+        for name, c in crit.items():
+            scores += self.WEIGHTS[name] * self._member(name, c, pos)
+        scores = np.clip(scores, 0, 100)
+        keep = scores > 0
+        pos, scores = pos[keep], scores[keep]
+        ids, scores = self._top_n(pos, scores, topn)
+        winners = [(int(i), float(sc)) for i, sc in zip(ids, scores)]
+        if len(winners) < topn:
+            # fill with zero-score survivors in inventory order, as a stable sort would
+            head = candidates[:topn + len(pos)]
+            fill = np.setdiff1d(head, pos, assume_unique=True)[:topn - len(winners)]
+            winners += [(int(i), 0.0) for i in fill]
+        return winners
+
+    def _item(self, i: int, score: float) -> MatchItem:
+        row = self.inventory[i]
+        reasons = []
+        if row.get("neighborhood"):
+            reasons.append(f"Neighborhood match {row['neighborhood']}")
+        if row.get("sqft"):
+            reasons.append(f"{row['sqft']} sqft fits range")
+        if row.get("rent"):
+            reasons.append(f"Rent ${row['rent']} within budget")
+        return MatchItem(
+            id=str(row.get("id", "")),
+            score=score,
+            reasons=reasons[:3],
+            row_preview=row
+        )
+
+    # max_sqft is widened by this factor when fewer than RELAX_MIN_FITS candidates fit it
+    RELAX_MIN_FITS = 3
+    RELAX_FACTOR = 1.1
+
+    def _fits_max_sqft(self, max_sqft: float, candidates: np.ndarray) -> np.ndarray:
+        """Candidates whose (non-zero) sqft is at most max_sqft, from the sqft range index."""
+        ids = InventoryIndex.intersect(self.index.range("sqft", None, max_sqft), candidates)
+        return ids[self.index.columns["sqft"][ids] != 0]
+
     def run(self, spec: Dict[str, Any], topn: int = 5) -> MatchResult:
+        spec = dict(spec)
+        candidates = self.index.amenities_all(spec.get("must_haves", []))
+        ranked = self._rank(spec, candidates, topn)
+        # constraint relaxation: with too few units inside max_sqft, widen it through the
+        # range index and re-rank, marking only the units the wider range brought in
+        relaxed = np.empty(0, dtype=np.int64)
+        if spec.get("max_sqft"):
+            fits = self._fits_max_sqft(spec["max_sqft"], candidates)
+            if len(fits) < self.RELAX_MIN_FITS:
+                spec["max_sqft"] = int(spec["max_sqft"] * self.RELAX_FACTOR)
+                relaxed = np.setdiff1d(self._fits_max_sqft(spec["max_sqft"], candidates), fits, assume_unique=True)
+                if len(relaxed):
+                    ranked = self._rank(spec, candidates, topn)
+        relaxed_ids = set(relaxed.tolist())
+        matches = []
+        for i, sc in ranked:
+            item = self._item(i, sc)
+            if i in relaxed_ids:
+                item.relaxed_field = "max_sqft"
+            matches.append(item)
+        return MatchResult(matches=matches, spec_used=spec)
+
+    def _run_rowwise(self, spec: Dict[str, Any], topn: int = 5) -> MatchResult:
+        """Original per-row implementation, kept as the benchmark baseline (relaxation only edits the spec)."""
         candidates = []
-        for row in self.inventory:
+        for i, row in enumerate(self.inventory):
             if not self._hard_filter(row, spec):
                 continue
-            score = self._score(row, spec)
-            reasons = []
-            if row.get("neighborhood"):
-                reasons.append(f"Neighborhood match {row['neighborhood']}")
-            if row.get("sqft"):
-                reasons.append(f"{row['sqft']} sqft fits range")
-            if row.get("rent"):
-                reasons.append(f"Rent ${row['rent']} within budget")
-            candidates.append(MatchItem(
-                id=str(row.get("id", "")),
-                score=score,
-                reasons=reasons[:3],
-                row_preview=row
-            ))
+            candidates.append(self._item(i, self._score(row, spec)))
         candidates.sort(key=lambda x: x.score, reverse=True)
-        # constraint relaxation if few results
         relaxed = None
         if len(candidates) < 3:
             if spec.get("max_sqft"):
@@ -76,3 +205,43 @@ class MatchRankAgent:
         for c in candidates:
             c.relaxed_field = relaxed
         return MatchResult(matches=candidates[:topn], spec_used=spec)
+
+# Benchmark: python -m backend.agents.via.match_rank_agent [sizes...]
+if __name__ == "__main__":
+    import sys
+    import time
+    import random
+
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    hoods = ["Midtown South", "Flatiron", "Chelsea", "SoHo", "Tribeca", "Financial District", "NoMad", "Hudson Yards"]
+    amenity_pool = ["elevator", "doorman", "gym", "roof deck", "pet friendly", "bike storage", "parking", "24/7 access"]
+    specs = {
+        "broad": {"location": ["chelsea", "soho"], "min_sqft": 1500, "max_sqft": 6000,
+                  "budget_monthly_usd": {"min": 4000, "max": 20000}, "must_haves": ["elevator"]},
+        "narrow": {"min_sqft": 9000, "max_sqft": 9050, "must_haves": ["gym", "doorman"]},
+    }
+
+    rng = random.Random(7)
+    for n in sizes:
+        rows = [{
+            "id": str(i),
+            "neighborhood": rng.choice(hoods),
+            "sqft": rng.randint(500, 20000),
+            "rent": rng.randint(2000, 150000),
+            "amenities": rng.sample(amenity_pool, rng.randint(0, 4)),
+        } for i in range(n)]
+
+        t0 = time.perf_counter()
+        agent = MatchRankAgent(rows)
+        t_build = time.perf_counter() - t0
+        for label, spec in specs.items():
+            t0 = time.perf_counter()
+            fast = agent.run(dict(spec), topn=5)
+            t_fast = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            slow = agent._run_rowwise(dict(spec), topn=5)
+            t_slow = time.perf_counter() - t0
+
+            same = [m.id for m in fast.matches] == [m.id for m in slow.matches]
+            print(f"{n:>9,} units {label:>6}  row loop {t_slow * 1000:9.1f} ms  indexed {t_fast * 1000:8.2f} ms "
+                  f"(+{t_build * 1000:.0f} ms one-off build)  speedup x{t_slow / t_fast:,.0f}  same top-5: {same}")
@@ -1,19 +1,28 @@
-from .needs_agent.py import NeedsAgent
+from .needs_agent import NeedsAgent
 from .match_rank_agent import MatchRankAgent
 from .tour_close_agent import TourCloseAgent
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 class VIAAgent:
-    def __init__(self, inventory_rows: List[Dict[str, Any]], calendar_slots: List[Dict[str,str]]):
+    def __init__(self, inventory_rows: List[Dict[str, Any]], calendar_slots: List[Dict[str,str]],
+                 matcher: Optional[MatchRankAgent] = None):
         self.inventory = inventory_rows
         self.calendar = calendar_slots
         self.needs = NeedsAgent()
         self.closer = TourCloseAgent(calendar_slots)
+        # a prebuilt matcher (e.g. from the inventory store) skips re-indexing the rows
+        self.matcher = matcher or MatchRankAgent(inventory_rows=inventory_rows)
 
     def handle(self, user_text: str, sample_rows: str | None = None) -> Dict[str, Any]:
         spec = self.needs.run(user_text=user_text, sample_rows=sample_rows)
-        matcher = MatchRankAgent(inventory_rows=self.inventory)
-        mres = matcher.run(spec=spec.model_dump())
+        return self._match_and_plan(spec)
+
+    async def ahandle(self, user_text: str, sample_rows: str | None = None) -> Dict[str, Any]:
+        spec = await self.needs.arun(user_text=user_text, sample_rows=sample_rows)
+        return self._match_and_plan(spec)
+
+    def _match_and_plan(self, spec) -> Dict[str, Any]:
+        mres = self.matcher.run(spec=spec.model_dump())
         plan = self.closer.run([m.model_dump() for m in mres.matches])
         return {
             "stage":"VIA",
@@ -1,8 +1,17 @@
 # backend/api/chat.py
 
+import asyncio
 from fastapi import APIRouter
+from typing import Optional
 from pydantic import BaseModel
 from backend.core.orchestrator import Orchestrator
+from backend.core.intent_router import route_intent
+from backend.core.inventory_store import store, DEFAULT_INVENTORY_ID
+from backend.core.notifications import publish_event
+from backend.core.sse import sse_response
+from backend.core.conversation_memory import get_conversation_memory
+from backend.agents.via.via_pipeline import VIAAgent
+from backend.api.doma import lease_qa_events
 
 router = APIRouter()
 
@@ -12,6 +21,8 @@ class ChatRequest(BaseModel):
     user_message: str
     user_id: str
     has_lease: bool
+    # with an id, /chat/stream records the turns (and their rolling summary) in Supabase
+    conversation_id: Optional[str] = None
 
 @router.post("/chat")
 def chat_endpoint(req: ChatRequest):
@@ -21,3 +32,46 @@ def chat_endpoint(req: ChatRequest):
         has_lease=req.has_lease
     )
     return {"response": response}
+
+def _reply_text(out) -> str:
+    """What the assistant turn records for a final `answer` event."""
+    if out.get("stage") == "DOMA":
+        return out["lease_answer"]["answer"]
+    ids = [m["id"] for m in out.get("matches", [])]
+    return f"Shortlisted units: {', '.join(ids)}." if ids else "No matching units found."
+
+async def _answer_events(req: ChatRequest):
+    intent = route_intent(req.user_message)
+    yield "route", {"intent": intent}
+    if intent == "DOMA":
+        async for event, data in lease_qa_events(req.user_message):
+            yield event, data
+        return
+    # VIA output is a structured match list, not prose: it arrives as a single answer event
+    # the first request loads the default inventory snapshot from disk: keep it off the event loop
+    snap = await asyncio.to_thread(store.get, DEFAULT_INVENTORY_ID)
+    via = VIAAgent(inventory_rows=snap.rows, calendar_slots=[], matcher=snap.matcher)
+    out = await via.ahandle(req.user_message)
+    out["inventory"] = {"inventory_id": snap.inventory_id, "version": snap.version}
+    publish_event("via.pipeline.completed", {"matches": out.get("matches", [])}, actor="VIAAgent")
+    yield "answer", out
+
+async def _chat_events(req: ChatRequest):
+    memory = None
+    if req.conversation_id:
+        # loading reads the stored summary and recent messages: keep it off the event loop
+        memory = await asyncio.to_thread(get_conversation_memory, req.conversation_id)
+        await asyncio.to_thread(memory.add, "user", req.user_message)
+    async for event, data in _answer_events(req):
+        if event == "answer" and memory is not None:
+            await asyncio.to_thread(memory.add, "assistant", _reply_text(data))
+        yield event, data
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Server-Sent Events: a `route` event with the detected intent, `token`
+    events while a lease answer is generated, then a final `answer` event
+    carrying the structured result (citations for DOMA, matches for VIA).
+    """
+    return sse_response(_chat_events(req))
@@ -1,19 +1,34 @@
 from fastapi import APIRouter
+import numpy as np
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from backend.agents.doma.doma_pipeline import DOMAAgent
+from backend.rag.retriever import Retriever
+from backend.core.answer_cache import get_answer_cache
 from backend.core.notifications import publish_event
+from backend.core.sse import sse_response
 
 router = APIRouter(prefix="/doma", tags=["doma"])
 
 class LeaseQARequest(BaseModel):
     question: str
-    retrieved_chunks: List[Dict[str, Any]]
+    # when omitted, chunks are retrieved server-side, optionally filtered
+    retrieved_chunks: Optional[List[Dict[str, Any]]] = None
+    source: Optional[Union[str, List[str]]] = None
+    page: Optional[Union[int, List[int], Dict[str, int]]] = None
+    building: Optional[Union[str, List[str]]] = None
+    top_k: int = 5
 
 class TriageRequest(BaseModel):
     ticket_text: str
     photos: List[str] = []
 
+class TriageBatchRequest(BaseModel):
+    tickets: List[str]
+    # per-category vendor overrides, e.g. {"plumbing": "storm_response_plumbing"}
+    roster: Optional[Dict[str, str]] = None
+    publish: bool = True
+
 class RenewalRequest(BaseModel):
     current_rent: float
     comps_median: float
@@ -21,19 +36,64 @@ class RenewalRequest(BaseModel):
     policy_ceiling: float
 
 doma = DOMAAgent()
+_retriever: Optional[Retriever] = None
+
+def get_retriever() -> Retriever:
+    # built on first use so importing the API does not connect to the vector store
+    global _retriever
+    if _retriever is None:
+        _retriever = Retriever()
+    return _retriever
 
 @router.post("/lease-qa")
-def lease_qa(req: LeaseQARequest):
-    out = doma.handle_lease(req.question, req.retrieved_chunks)
+async def lease_qa(req: LeaseQARequest):
+    chunks = req.retrieved_chunks
+    if chunks is None:
+        chunks = await get_retriever().aretrieve(req.question, top_k=req.top_k, source=req.source,
+                                                 page=req.page, building=req.building)
+    out = await doma.ahandle_lease(req.question, chunks)
     publish_event("doma.lease.answer", out, actor="LeaseQAAgent")
     return out
 
+async def lease_qa_events(question: str, chunks: Optional[List[Dict[str, Any]]] = None, top_k: int = 5, **filter_fields):
+    """Lease answer as ("token", {"text"}) events, then ("answer", {"stage", "lease_answer"}) with the citations."""
+    if chunks is None:
+        chunks = await get_retriever().aretrieve(question, top_k=top_k, **filter_fields)
+    async for event, data in doma.astream_lease(question, chunks):
+        if event == "answer":
+            publish_event("doma.lease.answer", data, actor="LeaseQAAgent")
+        yield event, data
+
+@router.post("/lease-qa/stream")
+async def lease_qa_stream(req: LeaseQARequest):
+    """Server-Sent Events version of /lease-qa: `token` events as the answer is written, then one `answer` event."""
+    return sse_response(lease_qa_events(req.question, req.retrieved_chunks, req.top_k, source=req.source,
+                                        page=req.page, building=req.building))
+
+@router.get("/lease-qa/cache")
+def lease_qa_cache_stats():
+    return get_answer_cache().stats()
+
 @router.post("/triage")
 def triage(req: TriageRequest):
     out = doma.handle_triage(req.ticket_text, req.photos)
     publish_event("doma.triage.created", out, actor="ServiceTriageAgent")
     return out
 
+@router.post("/triage/batch")
+def triage_batch(req: TriageBatchRequest):
+    """Classifies many tickets in one pass (storm surges, backlog imports)."""
+    agent = doma.triage
+    # one serialized result per category, shared by every ticket in it
+    results = [r.model_dump() for r in agent.category_results(req.roster)]
+    ranks = agent.classify_batch(req.tickets)
+    triage = [results[r] for r in ranks]
+    if req.publish:
+        for t in triage:
+            publish_event("doma.triage.created", {"stage": "DOMA", "triage": t}, actor="ServiceTriageAgent")
+    counts = dict(zip(agent.categories, np.bincount(ranks, minlength=len(agent.categories)).tolist()))
+    return {"stage": "DOMA", "triage": triage, "counts": counts}
+
 @router.post("/renewal")
 def renewal(req: RenewalRequest):
     out = doma.handle_renewal(req.current_rent, req.comps_median, req.policy_floor, req.policy_ceiling)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
+import pandas as pd
+from backend.core.inventory_store import store
+from backend.loaders.csv_excel_loader import build_inventory, inventory_records
+
+router = APIRouter(prefix="/inventory", tags=["inventory"])
+
+class InventoryRowsRequest(BaseModel):
+    rows: List[Dict[str, Any]]
+
+class InventoryUpdateRequest(BaseModel):
+    upserts: List[Dict[str, Any]] = []
+    delete_ids: List[str] = []
+
+@router.get("")
+def list_inventories():
+    return {"inventories": store.list()}
+
+@router.get("/{inventory_id}")
+def inventory_info(inventory_id: str, version: Optional[int] = None):
+    try:
+        return store.get(inventory_id, version).info()
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.put("/{inventory_id}")
+def replace_inventory(inventory_id: str, req: InventoryRowsRequest):
+    return store.put(inventory_id, req.rows).info()
+
+@router.post("/{inventory_id}/csv")
+def upload_inventory_csv(inventory_id: str, units: UploadFile = File(...), buildings: Optional[UploadFile] = File(None)):
+    try:
+        df_u = pd.read_csv(units.file)
+        df_b = pd.read_csv(buildings.file) if buildings else None
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read CSV: {e}")
+    return store.put(inventory_id, inventory_records(build_inventory(df_u, df_b))).info()
+
+@router.patch("/{inventory_id}/rows")
+def update_inventory_rows(inventory_id: str, req: InventoryUpdateRequest):
+    if any("id" not in r for r in req.upserts):
+        raise HTTPException(status_code=400, detail="Every upserted row needs an 'id'")
+    try:
+        return store.update_rows(inventory_id, req.upserts, req.delete_ids).info()
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/reload")
+def reload_default():
+    return store.load_default().info()
@@ -1,24 +1,145 @@
-from fastapi import APIRouter, UploadFile, File
-from typing import List
-from backend.core.ingest import embed_and_upsert
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from typing import List, Dict, Optional
+from backend.core.ingest_jobs import job_queue
 import os
+import json
+import uuid
+import hashlib
+import threading
 
 router = APIRouter()
 
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(500 * 1024 * 1024)))
+
+TEMP_DIR = "temp_files"
+# sha256 -> {"path", "job_id", "building"} of the upload that last ingested those bytes
+_HASH_INDEX = os.path.join(TEMP_DIR, ".upload_hashes.json")
+_hash_lock = threading.Lock()
+
+def _load_hashes() -> Dict[str, Dict[str, str]]:
+    try:
+        with open(_HASH_INDEX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_hashes(hashes: Dict[str, Dict[str, str]]):
+    tmp = _HASH_INDEX + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(hashes, f)
+    os.replace(tmp, _HASH_INDEX)
+
+async def _stream_to_disk(file: UploadFile, budget: int):
+    """
+    Copies an upload to a temp file in fixed-size chunks, hashing as it goes.
+    Returns (temp_path, sha256, size); raises 413 past the per-file or remaining request budget.
+    """
+    tmp_path = os.path.join(TEMP_DIR, f".{uuid.uuid4().hex}.part")
+    digest, size = hashlib.sha256(), 0
+    limit = min(UPLOAD_MAX_FILE_BYTES, budget)
+    try:
+        with open(tmp_path, "wb") as f_out:
+            while True:
+                block = await file.read(UPLOAD_CHUNK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > limit:
+                    which = "file" if limit == UPLOAD_MAX_FILE_BYTES else "request"
+                    raise HTTPException(status_code=413, detail=f"{file.filename} exceeds the {which} size limit")
+                digest.update(block)
+                f_out.write(block)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+def _stored_copy(entry) -> Optional[str]:
+    """
+    Path of an earlier upload with the same bytes, if it is still on disk and
+    its ingestion job has not failed (queued and running count, they will
+    finish); otherwise None, so the bytes are stored and ingested again.
+    """
+    if not isinstance(entry, dict) or not os.path.exists(entry.get("path", "")):
+        return None
+    job = job_queue.status(entry.get("job_id") or "")
+    if job is None:
+        return None
+    states = [f["status"] for f in job["files"] if f["path"] == entry["path"]]
+    return entry["path"] if states and states[0] != "failed" else None
+
+def _content_path(sha: str, name: str) -> str:
+    """
+    Storage path for an upload: one directory per content hash, so a new
+    upload never overwrites bytes a queued or running job is still reading.
+    The file keeps its name, which is the document's source for ingestion.
+    """
+    return os.path.join(TEMP_DIR, sha[:16], name)
+
 @router.post("/upload_docs")
-async def upload_docs(files: List[UploadFile] = File(...)):
-    temp_dir = "temp_files"
-    os.makedirs(temp_dir, exist_ok=True)  # Ensure temp_files/ exists
+async def upload_docs(files: List[UploadFile] = File(...), building: Optional[str] = Form(None)):
+    os.makedirs(TEMP_DIR, exist_ok=True)  # Ensure temp_files/ exists
+
+    paths, saved, remaining = [], [], UPLOAD_MAX_REQUEST_BYTES
+    try:
+        for file in files:
+            name = os.path.basename(file.filename or "") or f"upload-{uuid.uuid4().hex[:8]}"
+            tmp_path, sha, size = await _stream_to_disk(file, remaining)
+            remaining -= size
+            saved.append((name, tmp_path, sha, size))
+    except BaseException:
+        # 413s, client disconnects and disk errors alike: drop the files already spooled
+        for _, tmp_path, _, _ in saved:
+            os.remove(tmp_path)
+        raise
+
+    results, new, rewrite = [], {}, set()
+    with _hash_lock:
+        hashes = _load_hashes()
+        for name, tmp_path, sha, size in saved:
+            known = new.get(sha) or _stored_copy(hashes.get(sha))
+            if known and (sha in new or hashes[sha].get("building") == building):
+                # identical bytes already stored and ingested (or being ingested), or earlier in this request
+                os.remove(tmp_path)
+                print(f"↺ Duplicate: {name} matches {known}")
+                results.append({"file": name, "sha256": sha, "bytes": size, "duplicate_of": known})
+                continue
+            if known:
+                # same bytes under another building: chunk ids are unchanged, so rewrite them all
+                os.remove(tmp_path)
+                file_path = known
+                rewrite.add(file_path)
+                print(f"↻ Re-ingesting {file_path} for building {building!r}")
+            else:
+                file_path = _content_path(sha, name)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                os.replace(tmp_path, file_path)
+                print(f"✅ Saved: {file_path}")
+            paths.append(file_path)
+            new[sha] = file_path
+            results.append({"file": name, "sha256": sha, "bytes": size, "path": file_path})
 
-    for file in files:
-        file_path = f"{temp_dir}/{file.filename}"
-        with open(file_path, "wb") as f_out:
-            content = await file.read()
-            f_out.write(content)
+        if not paths:
+            return {"message": f"✅ {len(files)} files uploaded, all duplicates of stored files", "files": results}
 
-        print(f"✅ Saved: {file_path}")
+        # Ingestion runs on the background worker pool; poll the status endpoint for progress
+        job = job_queue.submit(paths, building=building, rewrite=rewrite)
+        hashes.update({sha: {"path": p, "job_id": job["job_id"], "building": building} for sha, p in new.items()})
+        _save_hashes(hashes)
 
-        # Call your end-to-end pipeline for each file
-        embed_and_upsert(file_path)
+    return {
+        "message": f"✅ {len(files)} files uploaded, ingestion queued",
+        "job_id": job["job_id"],
+        "status_url": f"/upload_docs/{job['job_id']}",
+        "files": results,
+        "job": job,
+    }
 
-    return {"message": f"✅ {len(files)} files uploaded & processed successfully!"}
+@router.get("/upload_docs/{job_id}")
+def upload_status(job_id: str):
+    job = job_queue.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job")
+    return job
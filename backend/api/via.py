@@ -1,7 +1,9 @@
-from fastapi import APIRouter
+import asyncio
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from backend.agents.via.via_pipeline import VIAAgent
+from backend.core.inventory_store import store, DEFAULT_INVENTORY_ID
 from backend.core.notifications import publish_event
 
 router = APIRouter(prefix="/via", tags=["via"])
@@ -9,12 +11,26 @@ router = APIRouter(prefix="/via", tags=["via"])
 class ViaNeedsRequest(BaseModel):
     user_text: str
     sample_rows: Optional[str] = None
+    # reference a server-side inventory (see /inventory); inventory_rows is the legacy inline form
+    inventory_id: str = DEFAULT_INVENTORY_ID
+    inventory_version: Optional[int] = None
     inventory_rows: List[Dict[str, Any]] = []
     calendar_slots: List[Dict[str, str]] = []
 
 @router.post("/run")
-def via_run(req: ViaNeedsRequest):
-    via = VIAAgent(inventory_rows=req.inventory_rows, calendar_slots=req.calendar_slots)
-    out = via.handle(req.user_text, req.sample_rows)
+async def via_run(req: ViaNeedsRequest):
+    if req.inventory_rows:
+        via = VIAAgent(inventory_rows=req.inventory_rows, calendar_slots=req.calendar_slots)
+        inventory = {"inventory_id": None, "version": None}
+    else:
+        try:
+            # may load the default inventory snapshot from disk on first use
+            snap = await asyncio.to_thread(store.get, req.inventory_id, req.inventory_version)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        via = VIAAgent(inventory_rows=snap.rows, calendar_slots=req.calendar_slots, matcher=snap.matcher)
+        inventory = {"inventory_id": snap.inventory_id, "version": snap.version}
+    out = await via.ahandle(req.user_text, req.sample_rows)
+    out["inventory"] = inventory
     publish_event("via.pipeline.completed", {"matches": out.get("matches", [])}, actor="VIAAgent")
     return out
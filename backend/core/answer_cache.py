@@ -0,0 +1,138 @@
+"""
+Semantic answer cache for lease Q&A.
+
+Answers are grouped by the retrieval context they were generated from (the
+set of source documents and retrieved chunk ids). Within a group, a new
+question is served from cache when its embedding is close enough to a cached
+question's, so "when is rent due?" and "when's my rent due" share one LLM call
+and return the original citations.
+
+Entries expire after a TTL, the least recently used are evicted past
+max_entries, and everything derived from a document is dropped when that
+document is re-ingested with changed chunks.
+"""
+
+import os
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable, Set
+
+import numpy as np
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+def context_key(sources: Iterable[str], chunk_ids: Iterable[str]) -> str:
+    """Order-independent key of the retrieval context."""
+    payload = json.dumps([sorted(set(sources)), sorted(set(chunk_ids))])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class AnswerCache:
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        # entry id -> entry, least recently used first
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_context: Dict[str, Set[int]] = {}
+        self._by_source: Dict[str, Set[int]] = {}
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for index, key in [(self._by_context, entry["context"])] + [(self._by_source, s) for s in entry["sources"]]:
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del index[key]
+
+    def get(self, sources: Iterable[str], chunk_ids: Iterable[str], embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Cached answer for the most similar question in the same context, if above the threshold."""
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        key = context_key(sources, chunk_ids)
+        now = time.time()
+        with self._lock:
+            best, best_sim = None, self.threshold
+            for entry_id in list(self._by_context.get(key, ())):
+                entry = self._entries[entry_id]
+                if now - entry["created_at"] > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                sim = float(entry["embedding"] @ q)
+                if sim >= best_sim:
+                    best, best_sim = entry_id, sim
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            entry = self._entries[best]
+            return {"answer": entry["answer"], "question": entry["question"], "similarity": round(best_sim, 4)}
+
+    def put(self, sources: Iterable[str], chunk_ids: Iterable[str], embedding: List[float],
+            question: str, answer: Dict[str, Any]):
+        sources = sorted(set(sources))
+        q = np.asarray(embedding, dtype=np.float32)
+        key = context_key(sources, chunk_ids)
+        with self._lock:
+            self._seq += 1
+            self._entries[self._seq] = {
+                "context": key, "sources": sources, "question": question, "answer": answer,
+                "embedding": q / max(float(np.linalg.norm(q)), 1e-12), "created_at": time.time(),
+            }
+            self._by_context.setdefault(key, set()).add(self._seq)
+            for s in sources:
+                self._by_source.setdefault(s, set()).add(self._seq)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_source(self, source: str) -> int:
+        """Drops every answer that cited context from `source`; returns how many."""
+        with self._lock:
+            ids = list(self._by_source.get(source, ()))
+            for entry_id in ids:
+                self._remove(entry_id)
+            self.invalidations += len(ids)
+        return len(ids)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+_default_cache: Optional[AnswerCache] = None
+_default_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnswerCache()
+        return _default_cache
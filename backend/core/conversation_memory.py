@@ -0,0 +1,323 @@
+"""
+Bounded prompt context for long conversations.
+
+A conversation's context is a rolling summary of its older turns plus the
+most recent turns verbatim. The verbatim part stays within
+CONTEXT_WINDOW_TOKENS. Once the unsummarized turns exceed that by
+CONTEXT_FOLD_TOKENS, the oldest ones are folded into the summary: one LLM
+call updates the previous summary with just those turns, on a background
+thread, so the turn that triggers it does not wait. Until the fold
+lands, those turns stay in the context verbatim. Prompt size is therefore
+capped at roughly summary + window + fold tokens, however long the
+thread runs.
+
+With persistence on, messages go through backend/db/supabase_client
+(buffered inserts). The summary is stored in conversation_summaries,
+next to chat_messages: the text, plus through_id, the last chat_messages
+id it covers. A process that picks up a conversation reads that row and
+the messages after through_id, never the whole history.
+
+Hosted schema:
+
+    create table conversation_summaries (
+        conversation_id uuid primary key references conversations (id),
+        summary text, through_id bigint, message_count int,
+        updated_at timestamptz default now());
+"""
+
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Any, Optional, Callable
+
+from backend.loaders.chunker import count_tokens
+
+logger = logging.getLogger("buildwise")
+
+CONTEXT_WINDOW_TOKENS = int(os.getenv("CONTEXT_WINDOW_TOKENS", "1500"))
+CONTEXT_FOLD_TOKENS = int(os.getenv("CONTEXT_FOLD_TOKENS", "500"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300"))
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+CONTEXT_SUMMARY_WORKERS = int(os.getenv("CONTEXT_SUMMARY_WORKERS", "2"))
+# most messages read back when a conversation is loaded from the database
+CONTEXT_LOAD_MAX_MESSAGES = int(os.getenv("CONTEXT_LOAD_MAX_MESSAGES", "200"))
+CONTEXT_MAX_CONVERSATIONS = int(os.getenv("CONTEXT_MAX_CONVERSATIONS", "1000"))
+
+SUMMARY_PROMPT = (
+    "You maintain the running summary of a conversation between a tenant or prospect and BuildWise, "
+    "a property-management assistant. Update the summary with the new messages. Keep facts that later "
+    "turns may need: names, addresses, units, budgets, sizes, dates, requests, tickets, decisions and "
+    "open questions. Drop pleasantries. Answer with the summary only, at most {words} words."
+)
+
+_ROLE_NAMES = {"user": "User", "assistant": "Assistant"}
+
+def _line(m: Dict[str, Any]) -> str:
+    return f"{_ROLE_NAMES.get(m['role'], m['role'].title())}: {m['content']}"
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+def extractive_summary(previous: str, messages: List[Dict[str, Any]], max_tokens: int = CONTEXT_SUMMARY_TOKENS) -> str:
+    """Fallback without an LLM: first sentence of each message, newest kept when over budget."""
+    lines = previous.splitlines() if previous else []
+    for m in messages:
+        first = re.split(r"(?<=[.!?])\s", m["content"].strip(), maxsplit=1)[0]
+        lines.append(_line({"role": m["role"], "content": first}))
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return _truncate_tokens("\n".join(lines), max_tokens)
+
+def llm_summarizer(client=None, model: str = CONTEXT_SUMMARY_MODEL, max_tokens: int = CONTEXT_SUMMARY_TOKENS
+                   ) -> Callable[[str, List[Dict[str, Any]]], str]:
+    """summarize(previous, messages) backed by a chat model; falls back to extractive_summary on errors."""
+    def summarize(previous: str, messages: List[Dict[str, Any]]) -> str:
+        try:
+            c = client
+            if c is None:
+                from backend.core.llm_gateway import get_gateway
+                c = get_gateway().client
+            r = c.chat.completions.create(
+                model=model, temperature=0, max_tokens=max_tokens,
+                messages=[{"role": "system", "content": SUMMARY_PROMPT.format(words=int(max_tokens * 0.7))},
+                          {"role": "user", "content": f"Summary so far:\n{previous or '(none)'}\n\nNew messages:\n"
+                                                      + "\n".join(_line(m) for m in messages)}])
+            return (r.choices[0].message.content or "").strip() or extractive_summary(previous, messages, max_tokens)
+        except Exception as e:
+            logger.warning(f"Conversation summary fell back to extractive: {e}")
+            return extractive_summary(previous, messages, max_tokens)
+    return summarize
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _summary_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, CONTEXT_SUMMARY_WORKERS), thread_name_prefix="context-summary")
+        return _pool
+
+class ConversationMemory:
+    """
+    Context window for one conversation. `add` records a turn; `messages`,
+    `prompt_messages` and `transcript` give the bounded context.
+
+    persist=True writes turns and the summary to Supabase under
+    `conversation_id`; persist=False keeps everything in process (the
+    Streamlit session). background=False folds inline, which tests and
+    benchmarks use for determinism.
+    """
+    def __init__(self, conversation_id: Optional[str] = None, persist: bool = False, client=None,
+                 summarize: Optional[Callable[[str, List[Dict[str, Any]]], str]] = None,
+                 window_tokens: int = CONTEXT_WINDOW_TOKENS, fold_tokens: int = CONTEXT_FOLD_TOKENS,
+                 summary_tokens: int = CONTEXT_SUMMARY_TOKENS, background: bool = True):
+        if persist and conversation_id is None:
+            raise ValueError("persist=True needs a conversation_id")
+        self.conversation_id = conversation_id
+        self.persist = persist
+        self.summarize = summarize or llm_summarizer(client, max_tokens=summary_tokens)
+        self.window_tokens = window_tokens
+        self.fold_tokens = max(1, fold_tokens)
+        self.summary_tokens = summary_tokens
+        self.background = background
+        self.summary = ""
+        self.through_id: Optional[int] = None
+        self.summarized_count = 0
+        # unsummarized turns, oldest first: {"role", "content", "tokens", "id"} (chat_messages id, once known)
+        self._turns: List[Dict[str, Any]] = []
+        self._tokens = 0
+        self._folding: Optional[Future] = None
+        self._lock = threading.RLock()
+        self.metrics = {"turns": 0, "folds": 0, "folded_turns": 0, "fold_errors": 0}
+        if persist:
+            self._load()
+
+    # ---- persistence ----
+    def _load(self):
+        from backend.db import supabase_client as db
+        row = db.get_conversation_summary(self.conversation_id) or {}
+        self.summary = row.get("summary") or ""
+        self.through_id = row.get("through_id")
+        self.summarized_count = row.get("message_count") or 0
+        recent = db.get_recent_messages(self.conversation_id, limit=CONTEXT_LOAD_MAX_MESSAGES)
+        for m in recent:
+            if self.through_id is None or m["id"] > self.through_id:
+                self._append(m.get("sender") or "user", m.get("message_text") or "", m["id"])
+
+    def _last_id(self, batch: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        chat_messages id of the batch's last turn: the new through_id once the
+        batch is folded. Turns added in this process were queued for a bulk
+        insert, so their ids are read back (the rows after the newest known id).
+        """
+        known = [i for i, m in enumerate(batch) if m["id"] is not None]
+        missing = batch[known[-1] + 1:] if known else batch
+        if missing:
+            from backend.db import supabase_client as db
+            after = batch[known[-1]]["id"] if known else self.through_id
+            rows = db.get_messages(self.conversation_id, after_id=after, limit=len(missing)).data or []
+            for m, row in zip(missing, rows):
+                m["id"] = row["id"]
+        return batch[-1]["id"] if batch[-1]["id"] is not None else self.through_id
+
+    # ---- turns ----
+    def _append(self, role: str, content: str, message_id: Optional[int] = None):
+        tokens = count_tokens(content) + 4  # role and message framing
+        self._turns.append({"role": role, "content": content, "tokens": tokens, "id": message_id})
+        self._tokens += tokens
+        self.metrics["turns"] += 1
+
+    def add(self, role: str, content: str):
+        with self._lock:
+            self._append(role, content)
+        if self.persist:
+            from backend.db import supabase_client as db
+            db.add_message(self.conversation_id, role, content)
+        self._maybe_fold()
+
+    def _maybe_fold(self):
+        with self._lock:
+            if self._folding is not None and not self._folding.done():
+                return
+            if self._tokens <= self.window_tokens + self.fold_tokens:
+                return
+            # fold the oldest turns until the rest fits the window; the newest turn always stays verbatim
+            n, rest = 0, self._tokens
+            while n < len(self._turns) - 1 and rest > self.window_tokens:
+                rest -= self._turns[n]["tokens"]
+                n += 1
+            if n == 0:
+                return
+            batch, previous = list(self._turns[:n]), self.summary
+            if self.background:
+                self._folding = _summary_pool().submit(self._fold, previous, batch)
+        if not self.background:
+            self._fold(previous, batch)
+
+    def _fold(self, previous: str, batch: List[Dict[str, Any]]):
+        try:
+            summary = self.summarize(previous, batch)
+            through_id = self._last_id(batch) if self.persist else None
+        except Exception as e:
+            with self._lock:
+                self._folding = None
+            self.metrics["fold_errors"] += 1
+            logger.warning(f"Conversation {self.conversation_id}: summary update failed: {e}")
+            return
+        with self._lock:
+            # turns are only appended meanwhile, so the folded batch is still at the head
+            del self._turns[:len(batch)]
+            self._tokens -= sum(m["tokens"] for m in batch)
+            self.summary = summary
+            self.through_id = through_id
+            self.summarized_count += len(batch)
+            self.metrics["folds"] += 1
+            self.metrics["folded_turns"] += len(batch)
+            count = self.summarized_count
+            self._folding = None
+        if self.persist:
+            from backend.db import supabase_client as db
+            db.save_conversation_summary(self.conversation_id, summary, through_id, count)
+        # turns added during the fold may already call for the next one
+        self._maybe_fold()
+
+    def wait(self):
+        """Blocks until running summary updates, including follow-up folds, have finished."""
+        while True:
+            future = self._folding
+            if future is None:
+                return
+            future.result()
+            if self._folding is future:
+                return
+
+    # ---- context ----
+    def messages(self, max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """Unsummarized turns, oldest first; with `max_tokens`, only the newest that fit."""
+        with self._lock:
+            turns = list(self._turns)
+        if max_tokens is not None:
+            kept, total = [], 0
+            for m in reversed(turns):
+                if kept and total + m["tokens"] > max_tokens:
+                    break
+                kept.append(m)
+                total += m["tokens"]
+            turns = kept[::-1]
+        return [{"role": m["role"], "content": m["content"]} for m in turns]
+
+    def prompt_messages(self, system: Optional[str] = None, max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """Chat-completions messages: the system prompt, the summary as context, then the recent turns."""
+        out = [{"role": "system", "content": system}] if system else []
+        if self.summary:
+            out.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return out + self.messages(max_tokens)
+
+    def transcript(self, max_tokens: Optional[int] = None) -> str:
+        """Plain-text context: the summary (if any) followed by the recent turns."""
+        lines = [f"Earlier in the conversation: {self.summary}", ""] if self.summary else []
+        return "\n".join(lines + [_line(m) for m in self.messages(max_tokens)])
+
+    def context_tokens(self) -> int:
+        with self._lock:
+            return self._tokens + (count_tokens(self.summary) if self.summary else 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.metrics, "window_turns": len(self._turns), "window_tokens": self._tokens,
+                    "summary_tokens": count_tokens(self.summary) if self.summary else 0,
+                    "summarized_turns": self.summarized_count, "through_id": self.through_id}
+
+_memories: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+_memories_lock = threading.Lock()
+
+def get_conversation_memory(conversation_id: str) -> ConversationMemory:
+    """Persistent memory for a conversation, shared within the process (least recently used evicted)."""
+    with _memories_lock:
+        memory = _memories.get(conversation_id)
+        if memory is None:
+            memory = _memories[conversation_id] = ConversationMemory(conversation_id, persist=True)
+            while len(_memories) > CONTEXT_MAX_CONVERSATIONS:
+                _memories.popitem(last=False)
+        _memories.move_to_end(conversation_id)
+        return memory
+
+if __name__ == "__main__":
+    # python -m backend.core.conversation_memory [turns]: prompt size per turn, full history vs bounded context
+    import sys
+    import time
+    import random
+
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    rng = random.Random(0)
+    asks = ["Do you have a 2-bed in Chelsea under $5,000 a month?", "Is the unit at 36 W 36th St pet friendly?",
+            "My kitchen sink is leaking again, can someone come Tuesday?", "When is my renewal notice due?",
+            "Can I get a 24-month option with a free month?", "Which of those is closest to the subway?"]
+    memory = ConversationMemory(background=False, summarize=lambda prev, msgs: extractive_summary(prev, msgs))
+    history: List[Dict[str, str]] = []
+    print(f"{'turn':>6} {'full history':>13} {'bounded':>8}   (prompt tokens)")
+    t0 = time.perf_counter()
+    for i in range(1, turns + 1):
+        user = rng.choice(asks)
+        reply = "Sure — " + " ".join(rng.choice(asks).split()[:12]) + ". " + "Here are the details you asked for. " * rng.randint(1, 4)
+        for role, text in (("user", user), ("assistant", reply)):
+            history.append({"role": role, "content": text})
+            memory.add(role, text)
+        if i in (1, 10, 50, 100, 200, turns):
+            full = sum(count_tokens(m["content"]) + 4 for m in history)
+            print(f"{i:6d} {full:13d} {memory.context_tokens():8d}")
+    print(f"{turns} turns recorded in {time.perf_counter() - t0:.2f} s; {memory.stats()}")
@@ -0,0 +1,156 @@
+"""
+Persistent embedding cache.
+
+Embeddings are keyed by (model, sha256 of whitespace-normalized text) and kept
+as float32 blobs in a local SQLite file, so templated lease clauses and repeated
+queries skip the embeddings API across uploads and process restarts.
+The cache is size-bounded with least-recently-used eviction.
+"""
+
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import List, Optional, Dict, Any
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite"))
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "500000"))
+
+_WS = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    return _WS.sub(" ", text).strip()
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+def _to_blob(vec: List[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+def _from_blob(blob: bytes) -> List[float]:
+    a = array("f")
+    a.frombytes(blob)
+    return a.tolist()
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [cache_key(model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            uniq = list(dict.fromkeys(keys))
+            # stay under SQLite's bound-parameter limit
+            for start in range(0, len(uniq), 500):
+                part = uniq[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part).fetchall()
+                for k, blob in rows:
+                    found[k] = _from_blob(blob)
+                if rows:
+                    now = time.time()
+                    self._conn.executemany("UPDATE embeddings SET last_used=? WHERE key=?",
+                                           [(now, k) for k, _ in rows])
+            self._conn.commit()
+            out = [found.get(k) for k in keys]
+            hit = sum(1 for v in out if v is not None)
+            self.hits += hit
+            self.misses += len(out) - hit
+        return out
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        now = time.time()
+        rows = [(cache_key(model, t), model, _to_blob(e), now) for t, e in zip(texts, embeddings)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings(key, model, vec, last_used) VALUES (?,?,?,?)", rows
+            )
+            self._size += self._conn.total_changes - before
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (overflow,)
+                )
+                self._size -= overflow
+                self.evictions += overflow
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = threading.Lock()
+
+def get_cache() -> EmbeddingCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+def embed_with_cache(client, texts: List[str], model: str, cache: Optional[EmbeddingCache] = None) -> List[List[float]]:
+    """
+    Returns one embedding per text, calling the embeddings API only for texts
+    that are not already cached (each distinct miss is sent once).
+    """
+    cache = cache or get_cache()
+    out, missing = _lookup(cache, texts, model)
+    if missing:
+        resp = client.embeddings.create(model=model, input=missing)
+        out = _fill(cache, texts, model, out, missing, resp)
+    return out
+
+async def aembed_with_cache(aclient, texts: List[str], model: str, cache: Optional[EmbeddingCache] = None) -> List[List[float]]:
+    """
+    embed_with_cache for async clients (e.g. the LLM gateway's `aclient`).
+    The SQLite reads and writes run on a worker thread, off the event loop.
+    """
+    cache = cache or await asyncio.to_thread(get_cache)
+    out, missing = await asyncio.to_thread(_lookup, cache, texts, model)
+    if missing:
+        resp = await aclient.embeddings.create(model=model, input=missing)
+        out = await asyncio.to_thread(_fill, cache, texts, model, out, missing, resp)
+    return out
+
+def _lookup(cache: EmbeddingCache, texts: List[str], model: str):
+    out = cache.get_many(model, texts)
+    missing = list(dict.fromkeys(normalize_text(t) for t, v in zip(texts, out) if v is None))
+    return out, missing
+
+def _fill(cache: EmbeddingCache, texts: List[str], model: str, out, missing: List[str], resp) -> List[List[float]]:
+    fresh = [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+    cache.put_many(model, missing, fresh)
+    by_text = dict(zip(missing, fresh))
+    return [v if v is not None else by_text[normalize_text(t)] for t, v in zip(texts, out)]
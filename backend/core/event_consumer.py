@@ -0,0 +1,209 @@
+"""
+Consumer workers for the buildwise.events stream.
+
+Workers join a Redis consumer group, so each event is handled by one
+worker in the group, and running more workers (threads or processes)
+scales a group out. Each worker loop works as follows:
+
+- Reclaims entries left pending by crashed or stuck workers for longer
+  than EVENT_RECLAIM_IDLE_MS (XPENDING + XCLAIM).
+- Reads up to EVENT_CONSUMER_BATCH new entries (XREADGROUP ... >).
+- Dispatches the batch to the handlers registered for each event_type
+  on a thread pool.
+- XACKs the entries whose handlers all succeeded, in one call.
+
+A failed entry stays pending and is retried once it has been idle long
+enough to reclaim. After EVENT_MAX_DELIVERIES attempts, or when it cannot
+be parsed at all, it is copied to the dead-letter stream with the error
+and acknowledged.
+
+    consumer = EventConsumer("vendor-dispatch")
+    @consumer.on("doma.triage.created")
+    def dispatch(evt): ...
+    consumer.start()
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from backend.core.notifications import REDIS_URL, STREAM, EVENT_STREAM_MAXLEN, connect_redis
+
+logger = logging.getLogger("buildwise")
+
+EVENT_CONSUMER_BATCH = int(os.getenv("EVENT_CONSUMER_BATCH", "64"))
+EVENT_CONSUMER_BLOCK_MS = int(os.getenv("EVENT_CONSUMER_BLOCK_MS", "1000"))
+EVENT_CONSUMER_WORKERS = int(os.getenv("EVENT_CONSUMER_WORKERS", "8"))
+EVENT_MAX_DELIVERIES = int(os.getenv("EVENT_MAX_DELIVERIES", "5"))
+EVENT_RECLAIM_IDLE_MS = int(os.getenv("EVENT_RECLAIM_IDLE_MS", "60000"))
+DEAD_LETTER_STREAM = os.getenv("EVENT_DEAD_LETTER_STREAM", STREAM + ".dead")
+
+Handler = Callable[[Dict[str, Any]], Any]
+
+def _s(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+class EventConsumer:
+    def __init__(self, group: str, consumer: Optional[str] = None, client=None, stream: str = STREAM,
+                 batch_size: int = EVENT_CONSUMER_BATCH, block_ms: int = EVENT_CONSUMER_BLOCK_MS,
+                 workers: int = EVENT_CONSUMER_WORKERS, max_deliveries: int = EVENT_MAX_DELIVERIES,
+                 reclaim_idle_ms: int = EVENT_RECLAIM_IDLE_MS, dead_letter_stream: str = DEAD_LETTER_STREAM):
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}-{id(self):x}"
+        self.client = client if client is not None else connect_redis(REDIS_URL)
+        self.stream = stream
+        self.batch_size = max(1, batch_size)
+        self.block_ms = block_ms
+        self.max_deliveries = max(1, max_deliveries)
+        self.reclaim_idle_ms = reclaim_idle_ms
+        self.dead_letter_stream = dead_letter_stream
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"events-{group}")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._group_ready = False
+        self.metrics = {"processed": 0, "acked": 0, "failed": 0, "reclaimed": 0, "dead_lettered": 0, "batches": 0}
+
+    # ---- registration ----
+    def on(self, event_type: str) -> Callable[[Handler], Handler]:
+        """Decorator registering a handler for `event_type` ("*" receives every event)."""
+        def register(fn: Handler) -> Handler:
+            self.register(event_type, fn)
+            return fn
+        return register
+
+    def register(self, event_type: str, fn: Handler):
+        self._handlers.setdefault(event_type, []).append(fn)
+
+    def handlers_for(self, event_type: str) -> List[Handler]:
+        return self._handlers.get(event_type, []) + self._handlers.get("*", [])
+
+    # ---- group ----
+    def ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            # "0": a new group also sees events published before any worker started
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    # ---- processing ----
+    def _handle(self, entry_id, fields: Dict[Any, Any], deliveries: int) -> Tuple[Any, Optional[str], bool]:
+        """Runs the entry's handlers; returns (entry id, error or None, whether retrying is pointless)."""
+        try:
+            evt = json.loads(_s(fields.get(b"data", fields.get("data", b""))))
+        except ValueError as e:
+            return entry_id, f"unparseable event: {e}", True
+        try:
+            for fn in self.handlers_for(evt.get("event_type", "")):
+                fn(evt)
+            return entry_id, None, False
+        except Exception as e:
+            logger.warning(f"Event {_s(entry_id)} failed in group {self.group} "
+                           f"(delivery {deliveries}/{self.max_deliveries}): {e}")
+            return entry_id, "".join(traceback.format_exception_only(type(e), e)).strip(), False
+
+    def _dead_letter(self, entry_id, fields: Dict[Any, Any], error: str, deliveries: int):
+        self.client.xadd(self.dead_letter_stream, {
+            **{_s(k): _s(v) for k, v in fields.items()},
+            "source_id": _s(entry_id), "group": self.group, "error": error, "deliveries": deliveries,
+        }, maxlen=EVENT_STREAM_MAXLEN, approximate=True)
+        self.metrics["dead_lettered"] += 1
+
+    def _process(self, entries: List[Tuple[Any, Dict[Any, Any], int]]):
+        """Handles (id, fields, times delivered) entries concurrently and acks the finished ones."""
+        if not entries:
+            return
+        fields_by_id = {_s(e[0]): (e[1], e[2]) for e in entries}
+        done = []
+        for entry_id, error, fatal in self._pool.map(lambda e: self._handle(*e), entries):
+            fields, deliveries = fields_by_id[_s(entry_id)]
+            self.metrics["processed"] += 1
+            if error is None:
+                done.append(entry_id)
+                continue
+            self.metrics["failed"] += 1
+            if fatal or deliveries >= self.max_deliveries:
+                self._dead_letter(entry_id, fields, error, deliveries)
+                done.append(entry_id)
+        if done:
+            self.metrics["acked"] += self.client.xack(self.stream, self.group, *done)
+        self.metrics["batches"] += 1
+
+    def reclaim(self) -> int:
+        """Takes over entries idle in other (presumably dead) consumers and processes them."""
+        pending = self.client.xpending_range(self.stream, self.group, min="-", max="+",
+                                             count=self.batch_size, idle=self.reclaim_idle_ms)
+        if not pending:
+            return 0
+        deliveries = {_s(p["message_id"]): int(p["times_delivered"]) for p in pending}
+        claimed = self.client.xclaim(self.stream, self.group, self.consumer, self.reclaim_idle_ms,
+                                     [p["message_id"] for p in pending])
+        # XCLAIM counts as a delivery
+        entries = [(entry_id, fields, deliveries.get(_s(entry_id), 0) + 1) for entry_id, fields in claimed if fields]
+        self.metrics["reclaimed"] += len(entries)
+        self._process(entries)
+        return len(entries)
+
+    def poll(self, block_ms: Optional[int] = None) -> int:
+        """One iteration: reclaim, then read and process one batch; returns entries handled."""
+        self.ensure_group()
+        handled = self.reclaim()
+        reply = self.client.xreadgroup(self.group, self.consumer, {self.stream: ">"}, count=self.batch_size,
+                                       block=self.block_ms if block_ms is None else block_ms)
+        entries = [(entry_id, fields, 1) for _, messages in (reply or []) for entry_id, fields in messages]
+        self._process(entries)
+        return handled + len(entries)
+
+    # ---- lifecycle ----
+    def run(self):
+        logger.info(f"Event consumer {self.consumer} joined group {self.group} on {self.stream}")
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Event consumer {self.consumer} poll failed: {e}")
+                self._group_ready = False
+                self._stop.wait(1.0)
+
+    def start(self) -> "EventConsumer":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name=f"events-{self.group}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"group": self.group, "consumer": self.consumer, **self.metrics}
+
+if __name__ == "__main__":
+    # python -m backend.core.event_consumer: one worker per DOMA consumer group
+    from backend.agents.doma import event_handlers
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    triage = EventConsumer(event_handlers.TRIAGE_GROUP)
+    renewal = EventConsumer(event_handlers.RENEWAL_GROUP)
+    event_handlers.register(triage, renewal)
+    for c in (triage, renewal):
+        c.start()
+    try:
+        while True:
+            time.sleep(30)
+            logger.info(f"Event consumers: {triage.stats()} {renewal.stats()}")
+    except KeyboardInterrupt:
+        for c in (triage, renewal):
+            c.stop(timeout=5)
@@ -1,54 +1,326 @@
 import os
+import json
+import time
+import hashlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Iterable, Iterator, Callable, Optional, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
-from pinecone import Pinecone
-from backend.loaders.pdf_loader import load_pdf
+from backend.loaders.pdf_loader import iter_pdf_pages
 from backend.loaders.word_loader import load_docx
-from backend.loaders.csv_excel_loader import load_csv_excel
-from backend.loaders.chunker import chunk_text
-import sys
-
-print(sys.path)
+from backend.loaders.csv_excel_loader import iter_table_sections, TABULAR_EXTENSIONS
+from backend.loaders.chunker import iter_chunk_spans, count_tokens
+from backend.core.embedding_cache import embed_with_cache, get_cache
+from backend.core.llm_gateway import get_gateway
+from backend.rag.bm25 import get_sparse_index
+from backend.core.answer_cache import get_answer_cache
+from backend.utils.local_vector_store import VECTOR_STORE, get_store
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index(os.getenv("PINECONE_INDEX"))
+# embedding requests share the gateway's connection pool, concurrency and rate limits
+client = get_gateway().client
+if VECTOR_STORE == "local":
+    index = get_store()
+else:
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index = pc.Index(os.getenv("PINECONE_INDEX"))
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+# OpenAI caps a single embeddings request at 2048 inputs; the token budget keeps
+# each request well under the per-request limit and evens out batch latency.
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "60000"))
+EMBED_BATCH_MAX_INPUTS = int(os.getenv("EMBED_BATCH_MAX_INPUTS", "2048"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+INGEST_MAX_IN_FLIGHT = int(os.getenv("INGEST_MAX_IN_FLIGHT", "4"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+# tags document chunks in the shared index, which also holds conversation memory vectors
+CHUNK_KIND = "chunk"
+INGEST_MANIFEST_DIR = os.getenv("INGEST_MANIFEST_DIR", os.path.join(".cache", "manifests"))
 
-def load_file(file_path: str) -> str:
+def load_file(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Yields (page_number, text) sections; page_number is None for unpaginated formats."""
     if file_path.endswith(".pdf"):
-        return load_pdf(file_path)
+        return iter_pdf_pages(file_path)
     elif file_path.endswith(".docx"):
-        return load_docx(file_path)
-    elif file_path.endswith(".csv") or file_path.endswith(".xlsx"):
-        return load_csv_excel(file_path)
+        return iter([(None, load_docx(file_path))])
+    elif file_path.lower().endswith(TABULAR_EXTENSIONS):
+        return iter_table_sections(file_path)
     else:
         raise ValueError("Unsupported file type!")
 
-def embed_and_upsert(file_path: str):
-    raw_text = load_file(file_path)
-    chunks = chunk_text(raw_text, chunk_size=500, overlap=50)
-
-    for i, chunk in enumerate(chunks):
-        embedding = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=chunk
-        ).data[0].embedding
-
-        index.upsert(
-            vectors=[{
-                "id": f"{os.path.basename(file_path)}-{i}",
-                "values": embedding,
-                "metadata": {
-                    "text": chunk,
-                    "source": os.path.basename(file_path)
-                }
-            }]
-        )
-        print(f"Upserted chunk {i}")
-
-    print("✅ Ingestion complete!")
+def pack_batches(items: Iterable[Dict[str, Any]],
+                 max_tokens: int = EMBED_BATCH_TOKENS,
+                 max_inputs: int = EMBED_BATCH_MAX_INPUTS) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Groups chunk records ({"id", "text", "metadata"}) into embedding requests
+    that stay under the token budget and the per-request input cap.
+    """
+    batch, batch_tokens = [], 0
+    for item in items:
+        n = count_tokens(item["text"])
+        if batch and (batch_tokens + n > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += n
+    if batch:
+        yield batch
+
+def chunk_id(source: str, text: str, page: Optional[int] = None) -> str:
+    # content-addressed, so an unchanged chunk keeps its vector id across re-uploads;
+    # the page is part of the key so identical text on two pages keeps both citations
+    key = text if page is None else f"{page}\x00{text}"
+    return f"{source}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}"
+
+def _manifest_path(source: str) -> str:
+    return os.path.join(INGEST_MANIFEST_DIR, f"{source}.json")
+
+def load_manifest(source: str) -> Dict[str, Any]:
+    try:
+        with open(_manifest_path(source), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"source": source, "chunk_ids": [], "complete": True}
+
+def save_manifest(source: str, chunk_ids: List[str], complete: bool = True):
+    """
+    Records the source's chunk ids. complete=False marks a checkpoint taken
+    mid-file: the previous ids plus those written so far, so a resumed run
+    skips them and still deletes whatever the finished file no longer has.
+    """
+    os.makedirs(INGEST_MANIFEST_DIR, exist_ok=True)
+    path = _manifest_path(source)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "chunk_ids": chunk_ids, "complete": complete,
+                   "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}, f)
+    os.replace(tmp, path)
+
+def delete_vectors(ids: List[str]) -> int:
+    requests = 0
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        index.delete(ids=ids[start:start + UPSERT_BATCH_SIZE])
+        requests += 1
+    return requests
+
+def delete_legacy_vectors(source: str) -> int:
+    """
+    Deletes the `{source}-{i}` vectors written before chunk ids were content
+    hashes. Those ids were numbered from 0 without gaps, so probing stops at
+    the first page with none left. Returns the number of delete requests.
+    """
+    requests = 0
+    for start in itertools.count(0, UPSERT_BATCH_SIZE):
+        found = list(index.fetch(ids=[f"{source}-{i}" for i in range(start, start + UPSERT_BATCH_SIZE)]).vectors)
+        if not found:
+            return requests
+        index.delete(ids=found)
+        requests += 1
+
+class _StageTimer:
+    """Thread-safe accumulator of seconds spent per ingest stage."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings: Dict[str, float] = {"load": 0.0, "chunk": 0.0, "embed": 0.0, "upsert": 0.0, "sparse": 0.0}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+def _embed_and_upsert_batch(batch: List[Dict[str, Any]], timer: _StageTimer) -> Dict[str, int]:
+    t0 = time.perf_counter()
+    embeddings = embed_with_cache(client, [item["text"] for item in batch], EMBED_MODEL)
+    timer.add("embed", time.perf_counter() - t0)
+
+    vectors = [
+        {"id": item["id"], "values": emb, "metadata": item["metadata"]}
+        for item, emb in zip(batch, embeddings)
+    ]
+    t0 = time.perf_counter()
+    upserts = 0
+    for start in range(0, len(vectors), UPSERT_BATCH_SIZE):
+        index.upsert(vectors=vectors[start:start + UPSERT_BATCH_SIZE])
+        upserts += 1
+    timer.add("upsert", time.perf_counter() - t0)
+    return {"vectors": len(vectors), "upsert_requests": upserts}
+
+def run_batches(batches: Iterable[List[Dict[str, Any]]], timer: _StageTimer,
+                max_in_flight: int = INGEST_MAX_IN_FLIGHT,
+                on_batch: Optional[Callable[[int], None]] = None,
+                on_written: Optional[Callable[[List[str]], None]] = None) -> Dict[str, int]:
+    """
+    Embeds and upserts batches on a thread pool, keeping at most
+    `max_in_flight` batches outstanding so memory stays bounded.
+    `on_batch` is called with the running vector count after each batch,
+    `on_written` with the ids of each batch once it is upserted.
+    """
+    stats = {"vectors": 0, "embed_batches": 0, "upsert_requests": 0}
+    batch_ids: Dict[Any, List[str]] = {}
+
+    def _collect(done):
+        for fut in done:
+            res = fut.result()
+            ids = batch_ids.pop(fut)
+            stats["vectors"] += res["vectors"]
+            stats["upsert_requests"] += res["upsert_requests"]
+            stats["embed_batches"] += 1
+            if on_written:
+                on_written(ids)
+            if on_batch:
+                on_batch(stats["vectors"])
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        in_flight = set()
+        for batch in batches:
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                _collect(done)
+            fut = pool.submit(_embed_and_upsert_batch, batch, timer)
+            batch_ids[fut] = [item["id"] for item in batch]
+            in_flight.add(fut)
+        _collect(wait(in_flight).done)
+    return stats
+
+def _record(cid: str, source: str, page: Optional[int], text: str, building: Optional[str] = None) -> Dict[str, Any]:
+    metadata = {"kind": CHUNK_KIND, "text": text, "source": source}
+    if page is not None:
+        metadata["page"] = page
+    if building:
+        metadata["building"] = building
+    return {"id": cid, "text": text, "metadata": metadata}
+
+def _iter_chunks(file_path: str, source: str, timer: _StageTimer) -> Iterator[Tuple[str, Optional[int], str]]:
+    """Yields (chunk id, page, text) for every chunk of the file, in order, duplicates included."""
+    sections = load_file(file_path)
+    tabular = file_path.lower().endswith(TABULAR_EXTENSIONS)
+    while True:
+        t0 = time.perf_counter()
+        section = next(sections, None)
+        timer.add("load", time.perf_counter() - t0)
+        if section is None:
+            return
+        page, text = section
+        t0 = time.perf_counter()
+        if tabular and count_tokens(text) <= CHUNK_MAX_TOKENS:
+            # table sections are packed from whole rows to the chunk budget already
+            chunks = [text]
+        else:
+            chunks = [text[start:end] for start, end in
+                      iter_chunk_spans(text, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)]
+        chunks = [(chunk_id(source, chunk, page), page, chunk) for chunk in chunks]
+        timer.add("chunk", time.perf_counter() - t0)
+        yield from chunks
+
+def embed_and_upsert(file_path: str, incremental: bool = True,
+                     progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                     building: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Loads, chunks, embeds and upserts one document.
+
+    Chunk ids are content hashes recorded in a per-source manifest. In
+    incremental mode only chunks missing from the previous manifest are
+    embedded and upserted; with incremental=False every chunk is rewritten.
+    Either way, vectors for chunks that disappeared are deleted. A source
+    without a manifest first has its old sequentially numbered vectors
+    deleted (delete_legacy_vectors).
+    `progress(done, total)` reports chunks written as batches complete.
+    The manifest is checkpointed after every batch, so a job resumed after
+    a crash re-embeds only the chunks not yet written.
+    `building` is stored in each chunk's metadata for filtered retrieval;
+    changing it for a document needs incremental=False to rewrite its chunks.
+
+    CSV/XLSX files are streamed: rows are read, chunked, embedded and
+    upserted as they go, so `total` is None until the last batch. The
+    BM25 postings are built in the same pass, one part of
+    SPARSE_PART_CHUNKS chunks at a time (rag/bm25.py). Ingestion itself
+    holds the chunk ids, the batches in flight and the current part's
+    texts. The finished parts, with their chunk metadata, stay resident
+    in the sparse index, as every indexed document's postings do.
+
+    Returns added/kept/removed counts plus per-stage timings in seconds;
+    embed/upsert timings are summed across worker threads, `total` is wall clock.
+    """
+    started = time.perf_counter()
+    timer = _StageTimer()
+    source = os.path.basename(file_path)
+    manifest = load_manifest(source)
+    previous = set(manifest["chunk_ids"])
+    # a checkpoint left by an interrupted run: its writes have not reached the sparse index or answer cache
+    resumed = not manifest.get("complete", True)
+    legacy_deletes = 0
+    if not os.path.exists(_manifest_path(source)):
+        t0 = time.perf_counter()
+        legacy_deletes = delete_legacy_vectors(source)
+        timer.add("upsert", time.perf_counter() - t0)
+    streaming = file_path.lower().endswith(TABULAR_EXTENSIONS)
+    n_chunks = 0
+
+    # identical chunks (repeated boilerplate, repeated rows) collapse onto one vector
+    seen: Dict[str, None] = {}
+    # the document's BM25 postings are built in the same pass; committed below only if its chunks changed
+    sparse = get_sparse_index()
+    sparse_writer = sparse.writer(source)
+
+    def unique_chunks() -> Iterator[Tuple[str, Optional[int], str]]:
+        nonlocal n_chunks
+        for cid, page, text in _iter_chunks(file_path, source, timer):
+            n_chunks += 1
+            if cid not in seen:
+                seen[cid] = None
+                t0 = time.perf_counter()
+                sparse_writer.add(cid, text, _record(cid, source, page, text, building)["metadata"])
+                timer.add("sparse", time.perf_counter() - t0)
+                yield cid, page, text
+
+    if streaming:
+        to_write = ((cid, page, text) for cid, page, text in unique_chunks() if not incremental or cid not in previous)
+        total = None
+    else:
+        by_id = {cid: (page, text) for cid, page, text in unique_chunks()}
+        to_write = [(cid, *by_id[cid]) for cid in by_id if not incremental or cid not in previous]
+        total = len(to_write)
+    records = (_record(cid, source, page, text, building=building) for cid, page, text in to_write)
+    if progress:
+        progress(0, total)
+    on_batch = (lambda done: progress(done, total)) if progress else None
+    written: List[str] = []
+
+    def checkpoint(ids: List[str]):
+        written.extend(ids)
+        save_manifest(source, list(previous.union(written)), complete=False)
+
+    stats = run_batches(pack_batches(records), timer, on_batch=on_batch, on_written=checkpoint)
+    if progress and streaming:
+        progress(stats["vectors"], stats["vectors"])
+
+    added = [cid for cid in seen if cid not in previous]
+    kept = len(seen) - len(added)
+    removed = sorted(previous.difference(seen))
+    t0 = time.perf_counter()
+    stats["delete_requests"] = legacy_deletes + delete_vectors(removed)
+    timer.add("upsert", time.perf_counter() - t0)
+    save_manifest(source, list(seen))
+
+    # the sparse (BM25) segments are swapped in per document, only when its chunks changed
+    t0 = time.perf_counter()
+    if added or removed or resumed or not incremental or not sparse.has_document(source):
+        sparse_writer.commit()
+    timer.add("sparse", time.perf_counter() - t0)
+    if added or removed or resumed:
+        # cached lease answers may quote chunks that just changed
+        get_answer_cache().invalidate_source(source)
+
+    timings = {k: round(v, 4) for k, v in timer.timings.items()}
+    timings["total"] = round(time.perf_counter() - started, 4)
+    print(f"✅ Ingestion complete! {source}: +{len(added)} ={kept} -{len(removed)} chunks, "
+          f"{stats['embed_batches']} embed batches / {stats['upsert_requests']} upsert requests in {timings['total']}s")
+    return {"source": source, "chunks": n_chunks, "added": len(added), "kept": kept,
+            "removed": len(removed), **stats, "timings": timings,
+            "embedding_cache": get_cache().stats()}
 
 # Example usage:
 if __name__ == "__main__":
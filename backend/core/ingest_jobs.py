@@ -0,0 +1,147 @@
+"""
+Background ingestion jobs for /upload_docs.
+
+Each upload becomes a job whose files are ingested on a bounded thread pool.
+Job state (per-file status and chunk progress) is persisted as JSON so the
+status endpoint can report progress and unfinished jobs are resumed on startup.
+Resuming is cheap: ingestion checkpoints its manifest after every batch, so
+a resumed file re-embeds only the chunks not yet written, and embeddings are cached.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Collection
+
+INGEST_JOB_DIR = os.getenv("INGEST_JOB_DIR", os.path.join(".cache", "jobs"))
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+
+logger = logging.getLogger("buildwise")
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+class IngestJobQueue:
+    def __init__(self, job_dir: str = INGEST_JOB_DIR, workers: int = INGEST_JOB_WORKERS):
+        self.job_dir = job_dir
+        os.makedirs(job_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    # ---- persistence ----
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _save(self, job: Dict[str, Any]):
+        job["updated_at"] = _now()
+        tmp = self._path(job["job_id"]) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp, self._path(job["job_id"]))
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    # ---- public API ----
+    def submit(self, file_paths: List[str], building: Optional[str] = None,
+               rewrite: Collection[str] = ()) -> Dict[str, Any]:
+        """Queues `file_paths` for ingestion; paths in `rewrite` are ingested with incremental=False."""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "created_at": _now(),
+            "building": building,
+            "files": [
+                {"path": p, "name": os.path.basename(p), "status": "queued", "incremental": p not in rewrite,
+                 "chunks_total": None, "chunks_done": 0, "result": None, "error": None}
+                for p in file_paths
+            ],
+        }
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._save(job)
+        self._enqueue(job)
+        return self.status(job["job_id"])
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id) or self._load(job_id)
+            if job is None:
+                return None
+            job = json.loads(json.dumps(job))
+        total = sum(f["chunks_total"] or 0 for f in job["files"])
+        done = sum(f["chunks_done"] for f in job["files"])
+        job["progress"] = {
+            "files_done": sum(f["status"] in ("done", "failed") for f in job["files"]),
+            "files_total": len(job["files"]),
+            "chunks_done": done,
+            "chunks_total": total,
+        }
+        return job
+
+    def resume(self) -> int:
+        """Re-enqueues jobs that were queued or running when the process stopped."""
+        resumed = 0
+        for name in os.listdir(self.job_dir):
+            if not name.endswith(".json"):
+                continue
+            job = self._load(name[:-5])
+            if not job or job["status"] in ("done", "failed"):
+                continue
+            for f in job["files"]:
+                if f["status"] == "running":
+                    f["status"], f["chunks_done"] = "queued", 0
+            with self._lock:
+                self._jobs[job["job_id"]] = job
+                self._save(job)
+            self._enqueue(job)
+            resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} ingestion job(s)")
+        return resumed
+
+    # ---- workers ----
+    def _enqueue(self, job: Dict[str, Any]):
+        for i, f in enumerate(job["files"]):
+            if f["status"] == "queued":
+                self._pool.submit(self._run_file, job["job_id"], i)
+
+    def _update(self, job_id: str, i: int, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["files"][i].update(fields)
+            states = {f["status"] for f in job["files"]}
+            if states <= {"done", "failed"}:
+                job["status"] = "failed" if states == {"failed"} else "done"
+            elif states & {"running", "done", "failed"}:
+                job["status"] = "running"
+            self._save(job)
+
+    def _run_file(self, job_id: str, i: int):
+        from backend.core.ingest import embed_and_upsert
+
+        job = self._jobs[job_id]
+        path = job["files"][i]["path"]
+        self._update(job_id, i, status="running", started_at=_now())
+
+        def progress(done: int, total: int):
+            self._update(job_id, i, chunks_done=done, chunks_total=total)
+
+        try:
+            result = embed_and_upsert(path, incremental=job["files"][i].get("incremental", True),
+                                      progress=progress, building=job.get("building"))
+            self._update(job_id, i, status="done", result=result, finished_at=_now())
+        except Exception as e:
+            logger.error(f"Ingestion of {path} failed: {e}")
+            self._update(job_id, i, status="failed", error=str(e), finished_at=_now())
+
+job_queue = IngestJobQueue()
@@ -0,0 +1,107 @@
+"""
+Server-side inventory store.
+
+Inventories are loaded once (from the repo CSVs or an upload) and kept in
+memory as immutable, versioned snapshots, each with its ranking index built.
+/via/run then references an inventory by id/version instead of shipping rows.
+Row updates create a new version copy-on-write; older versions stay readable
+until they fall out of the retention window. A full replace always wins; a
+row update fails with a conflict if another version landed after the one it
+was based on, so concurrent updates are never silently lost.
+"""
+
+import os
+import time
+import threading
+from typing import List, Dict, Any, Optional
+
+from backend.agents.via.match_rank_agent import MatchRankAgent
+
+DEFAULT_INVENTORY_ID = "default"
+INVENTORY_KEEP_VERSIONS = int(os.getenv("INVENTORY_KEEP_VERSIONS", "3"))
+
+class InventorySnapshot:
+    def __init__(self, inventory_id: str, version: int, rows: List[Dict[str, Any]]):
+        self.inventory_id = inventory_id
+        self.version = version
+        self.rows = rows
+        self.created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.matcher = MatchRankAgent(inventory_rows=rows)
+
+    def info(self) -> Dict[str, Any]:
+        return {"inventory_id": self.inventory_id, "version": self.version,
+                "rows": len(self.rows), "created_at": self.created_at}
+
+class InventoryStore:
+    def __init__(self, keep_versions: int = INVENTORY_KEEP_VERSIONS):
+        self.keep_versions = keep_versions
+        self._lock = threading.Lock()
+        self._default_lock = threading.Lock()
+        self._versions: Dict[str, List[InventorySnapshot]] = {}
+
+    def _add(self, inventory_id: str, rows: List[Dict[str, Any]], base_version: Optional[int] = None) -> InventorySnapshot:
+        """
+        Appends `rows` as the next version. With `base_version` (the version the
+        rows were derived from) it fails if another update landed meanwhile;
+        without it, it replaces whatever is current (last writer wins).
+        """
+        # build outside the lock: indexing a large inventory takes a while
+        snap = InventorySnapshot(inventory_id, 0, rows)
+        with self._lock:
+            history = self._versions.setdefault(inventory_id, [])
+            latest = history[-1].version if history else 0
+            if base_version is not None and latest != base_version:
+                raise ValueError(f"Concurrent update of inventory '{inventory_id}' "
+                                 f"(version {latest}, update based on {base_version}), retry")
+            snap.version = latest + 1
+            history.append(snap)
+            del history[:-self.keep_versions]
+        return snap
+
+    def put(self, inventory_id: str, rows: List[Dict[str, Any]]) -> InventorySnapshot:
+        """Replaces the inventory with `rows` as a new version."""
+        return self._add(inventory_id, [dict(r, id=str(r.get("id", i))) for i, r in enumerate(rows)])
+
+    def update_rows(self, inventory_id: str, upserts: List[Dict[str, Any]],
+                    delete_ids: Optional[List[str]] = None) -> InventorySnapshot:
+        """
+        New version with rows upserted by id (fields merged) and `delete_ids` removed.
+        Raises ValueError if another version was added after the one it started from.
+        """
+        base = self.get(inventory_id)
+        by_id = {r["id"]: r for r in base.rows}
+        for r in upserts:
+            rid = str(r["id"])
+            by_id[rid] = {**by_id.get(rid, {}), **r, "id": rid}
+        for rid in delete_ids or []:
+            by_id.pop(str(rid), None)
+        return self._add(inventory_id, list(by_id.values()), base_version=base.version)
+
+    def get(self, inventory_id: str = DEFAULT_INVENTORY_ID, version: Optional[int] = None) -> InventorySnapshot:
+        if inventory_id == DEFAULT_INVENTORY_ID and DEFAULT_INVENTORY_ID not in self._versions:
+            with self._default_lock:
+                if DEFAULT_INVENTORY_ID not in self._versions:
+                    self.load_default()
+        with self._lock:
+            history = self._versions.get(inventory_id)
+            if not history:
+                raise KeyError(f"Unknown inventory '{inventory_id}'")
+            if version is None:
+                return history[-1]
+            for snap in history:
+                if snap.version == version:
+                    return snap
+        raise KeyError(f"Inventory '{inventory_id}' has no version {version}")
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"inventory_id": k, "versions": [s.version for s in v], **v[-1].info()}
+                    for k, v in self._versions.items()]
+
+    def load_default(self) -> InventorySnapshot:
+        """Loads the repo datasets (temp_files/*.csv) as the 'default' inventory, via the prebuilt snapshot."""
+        from backend.loaders.csv_excel_loader import inventory_records
+        from backend.loaders.inventory_snapshot import load_inventory_snapshot
+        return self.put(DEFAULT_INVENTORY_ID, inventory_records(load_inventory_snapshot()))
+
+store = InventoryStore()
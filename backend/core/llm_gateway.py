@@ -0,0 +1,282 @@
+"""
+Shared gateway for every OpenAI chat and embedding call.
+
+One AsyncOpenAI client with a pooled HTTP connection runs on a dedicated
+event-loop thread. Each request passes three limits:
+
+- a global concurrency semaphore
+- a per-model concurrency semaphore
+- token buckets for requests and tokens per minute, so bursts queue
+  instead of tripping 429s
+
+429, 5xx and connection errors are retried with full-jitter exponential
+backoff, honouring Retry-After.
+
+Callers use a client-shaped facade:
+
+    llm = get_gateway()
+    llm.client.chat.completions.create(...)          # sync code (agents, ingest)
+    await llm.aclient.chat.completions.create(...)   # async endpoints
+
+Async callers await on their own loop, so no worker thread is held while the
+request is in flight. `stream=True` chat requests return an iterator (sync)
+or async iterator of chunks; the limits are held until the stream finishes and
+retries only happen before the first chunk.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import queue
+from typing import List, Dict, Any, Optional
+
+import httpx
+
+logger = logging.getLogger("buildwise")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "16"))
+# per-model overrides, e.g. "gpt-4o-mini=24,text-embedding-3-small=8"
+LLM_MODEL_LIMITS = {
+    k.strip(): int(v) for k, v in
+    (item.split("=", 1) for item in os.getenv("LLM_MODEL_LIMITS", "").split(",") if "=" in item)
+}
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "3000"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# assumed completion size when a chat request sets no max_tokens
+LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "512"))
+
+# marks the end of a streamed response
+_END = object()
+
+class TokenBucket:
+    """Async token bucket: `capacity` tokens, refilled continuously at `rate` per second."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Waits until `amount` tokens are available and takes them; returns seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:  # FIFO: later callers queue behind a large request
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    from backend.loaders.chunker import count_tokens
+    if "messages" in kwargs:
+        prompt = sum(count_tokens(m.get("content") or "") if isinstance(m.get("content"), str) else 0
+                     for m in kwargs["messages"])
+        return prompt + int(kwargs.get("max_tokens") or LLM_DEFAULT_COMPLETION_TOKENS)
+    inputs = kwargs.get("input")
+    return sum(count_tokens(t) for t in ([inputs] if isinstance(inputs, str) else inputs or []))
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class LLMGateway:
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self._start_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._global_sem: Optional[asyncio.Semaphore] = None
+        self._model_sems: Dict[str, asyncio.Semaphore] = {}
+        self._requests: Optional[TokenBucket] = None
+        self._tokens: Optional[TokenBucket] = None
+        self.metrics = {"requests": 0, "retries": 0, "failures": 0, "in_flight": 0, "throttled_seconds": 0.0}
+        self.client = _SyncClient(self)
+        self.aclient = _AsyncClient(self)
+
+    # ---- event loop ----
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                from openai import AsyncOpenAI
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+
+                async def _init():
+                    self._http = httpx.AsyncClient(
+                        limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                            max_keepalive_connections=LLM_MAX_CONNECTIONS),
+                        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0),
+                    )
+                    # retries are handled here, with backoff shared across all callers
+                    self._client = AsyncOpenAI(api_key=self.api_key or os.getenv("OPENAI_API_KEY"),
+                                               http_client=self._http, max_retries=0)
+                    self._global_sem = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+                    self._requests = TokenBucket(LLM_REQUESTS_PER_MINUTE / 60.0, max(1.0, LLM_REQUESTS_PER_MINUTE / 60.0))
+                    self._tokens = TokenBucket(LLM_TOKENS_PER_MINUTE / 60.0, LLM_TOKENS_PER_MINUTE / 60.0)
+
+                asyncio.run_coroutine_threadsafe(_init(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    def call(self, kind: str, **kwargs):
+        """Blocking call from sync code."""
+        if kwargs.get("stream"):
+            return self._iter_stream(kind, kwargs)
+        return self._submit(self._request(kind, kwargs)).result()
+
+    async def acall(self, kind: str, **kwargs):
+        """Awaitable from any event loop; the request itself runs on the gateway loop."""
+        if kwargs.get("stream"):
+            return self._aiter_stream(kind, kwargs)
+        return await asyncio.wrap_future(self._submit(self._request(kind, kwargs)))
+
+    def _iter_stream(self, kind: str, kwargs: Dict[str, Any]):
+        chunks: "queue.Queue" = queue.Queue()
+        future = self._submit(self._stream(kind, kwargs, chunks.put))
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _END:
+                    break
+                yield chunk
+            future.result()  # re-raises a failed request
+        finally:
+            future.cancel()  # consumer stopped early: close the upstream stream
+
+    async def _aiter_stream(self, kind: str, kwargs: Dict[str, Any]):
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        future = self._submit(self._stream(kind, kwargs, lambda c: loop.call_soon_threadsafe(chunks.put_nowait, c)))
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is _END:
+                    break
+                yield chunk
+            await asyncio.wrap_future(future)
+        finally:
+            future.cancel()
+
+    # ---- request path (gateway loop) ----
+    def _model_sem(self, model: str) -> asyncio.Semaphore:
+        if model not in self._model_sems:
+            self._model_sems[model] = asyncio.Semaphore(LLM_MODEL_LIMITS.get(model, LLM_MODEL_CONCURRENCY))
+        return self._model_sems[model]
+
+    async def _request(self, kind: str, kwargs: Dict[str, Any]):
+        async with self._global_sem, self._model_sem(kwargs.get("model", "")):
+            self.metrics["in_flight"] += 1
+            try:
+                return await self._with_retries(kind, kwargs)
+            finally:
+                self.metrics["in_flight"] -= 1
+
+    async def _stream(self, kind: str, kwargs: Dict[str, Any], emit):
+        """Opens a streaming request and hands every chunk to `emit`, then _END."""
+        try:
+            async with self._global_sem, self._model_sem(kwargs.get("model", "")):
+                self.metrics["in_flight"] += 1
+                try:
+                    stream = await self._with_retries(kind, kwargs)
+                    try:
+                        async for chunk in stream:
+                            emit(chunk)
+                    finally:
+                        await stream.close()  # releases the connection when the consumer went away
+                finally:
+                    self.metrics["in_flight"] -= 1
+        finally:
+            emit(_END)
+
+    async def _with_retries(self, kind: str, kwargs: Dict[str, Any]):
+        from openai import RateLimitError, APIStatusError, APIConnectionError, APITimeoutError
+
+        endpoint = self._client.chat.completions if kind == "chat" else self._client.embeddings
+        tokens = _estimate_tokens(kwargs)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = await self._requests.acquire(1)
+            waited += await self._tokens.acquire(tokens)
+            self.metrics["throttled_seconds"] += waited
+            self.metrics["requests"] += 1
+            try:
+                return await endpoint.create(**kwargs)
+            except (RateLimitError, APIConnectionError, APITimeoutError, APIStatusError) as e:
+                retryable = not isinstance(e, APIStatusError) or isinstance(e, RateLimitError) or e.status_code >= 500
+                if not retryable or attempt == LLM_MAX_RETRIES:
+                    self.metrics["failures"] += 1
+                    raise
+                # full jitter; a server-provided Retry-After is a floor
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                delay = max(delay, _retry_after(e) or 0.0)
+                self.metrics["retries"] += 1
+                logger.warning(f"LLM {kind} {kwargs.get('model')} failed ({type(e).__name__}), "
+                               f"retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "throttled_seconds": round(self.metrics["throttled_seconds"], 3)}
+
+    def close(self):
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._http.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+# ---- OpenAI-client-shaped facades ----
+class _Endpoint:
+    def __init__(self, gateway: LLMGateway, kind: str, is_async: bool):
+        self._gateway, self._kind, self._async = gateway, kind, is_async
+
+    def create(self, **kwargs):
+        if self._async:
+            return self._gateway.acall(self._kind, **kwargs)
+        return self._gateway.call(self._kind, **kwargs)
+
+class _Chat:
+    def __init__(self, gateway: LLMGateway, is_async: bool):
+        self.completions = _Endpoint(gateway, "chat", is_async)
+
+class _SyncClient:
+    def __init__(self, gateway: LLMGateway):
+        self.chat = _Chat(gateway, False)
+        self.embeddings = _Endpoint(gateway, "embeddings", False)
+
+class _AsyncClient:
+    def __init__(self, gateway: LLMGateway):
+        self.chat = _Chat(gateway, True)
+        self.embeddings = _Endpoint(gateway, "embeddings", True)
+
+_default_gateway: Optional[LLMGateway] = None
+_default_lock = threading.Lock()
+
+def get_gateway() -> LLMGateway:
+    global _default_gateway
+    with _default_lock:
+        if _default_gateway is None:
+            _default_gateway = LLMGateway()
+        return _default_gateway
@@ -0,0 +1,207 @@
+"""
+In-process stand-in for the subset of redis-py used by the event bus and
+its consumers: streams (XADD with MAXLEN, XRANGE, XLEN), consumer groups
+(XGROUP CREATE, XREADGROUP with blocking, XACK, XPENDING, XCLAIM) and
+non-transactional pipelines.
+
+Replies mirror redis-py without decode_responses (ids and fields are
+bytes). Selected with REDIS_URL=memory://, which gives one shared
+instance per process, so the API and in-process consumer workers can run
+without a Redis server in development and tests.
+"""
+
+import time
+import bisect
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    from redis.exceptions import ResponseError
+except Exception:  # redis-py not installed
+    class ResponseError(Exception):
+        pass
+
+def _b(value) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+def _parse_id(entry_id) -> Tuple[int, int]:
+    ms, _, seq = _b(entry_id).decode().partition("-")
+    return int(ms), int(seq or 0)
+
+def _format_id(key: Tuple[int, int]) -> bytes:
+    return f"{key[0]}-{key[1]}".encode()
+
+class _Group:
+    def __init__(self, last: Tuple[int, int]):
+        self.last = last
+        # entry id -> [consumer, last delivery (ms), times delivered]
+        self.pending: Dict[Tuple[int, int], List[Any]] = {}
+
+class _Stream:
+    def __init__(self):
+        self.keys: List[Tuple[int, int]] = []
+        self.fields: Dict[Tuple[int, int], Dict[bytes, bytes]] = {}
+        self.groups: Dict[bytes, _Group] = {}
+
+class MemoryRedis:
+    def __init__(self):
+        self._streams: Dict[bytes, _Stream] = {}
+        self._cond = threading.Condition()
+
+    def ping(self) -> bool:
+        return True
+
+    def pipeline(self, transaction: bool = False) -> "_Pipeline":
+        return _Pipeline(self)
+
+    def _stream(self, name, create: bool = False) -> Optional[_Stream]:
+        name = _b(name)
+        if create and name not in self._streams:
+            self._streams[name] = _Stream()
+        return self._streams.get(name)
+
+    # ---- streams ----
+    def xadd(self, name, fields: Dict[Any, Any], id="*", maxlen: Optional[int] = None, approximate: bool = True) -> bytes:
+        with self._cond:
+            stream = self._stream(name, create=True)
+            now = int(time.time() * 1000)
+            last = stream.keys[-1] if stream.keys else (0, 0)
+            key = (now, 0) if now > last[0] else (last[0], last[1] + 1)
+            stream.keys.append(key)
+            stream.fields[key] = {_b(k): _b(v) for k, v in fields.items()}
+            if maxlen is not None and len(stream.keys) > maxlen:
+                for old in stream.keys[:len(stream.keys) - maxlen]:
+                    del stream.fields[old]
+                del stream.keys[:len(stream.keys) - maxlen]
+            self._cond.notify_all()
+            return _format_id(key)
+
+    def xlen(self, name) -> int:
+        with self._cond:
+            stream = self._stream(name)
+            return len(stream.keys) if stream else 0
+
+    def xrange(self, name, min="-", max="+", count: Optional[int] = None) -> List[Tuple[bytes, Dict[bytes, bytes]]]:
+        with self._cond:
+            stream = self._stream(name)
+            if stream is None:
+                return []
+            lo = 0 if min == "-" else bisect.bisect_left(stream.keys, _parse_id(min))
+            hi = len(stream.keys) if max == "+" else bisect.bisect_right(stream.keys, _parse_id(max))
+            keys = stream.keys[lo:hi][:count]
+            return [(_format_id(k), dict(stream.fields[k])) for k in keys]
+
+    # ---- consumer groups ----
+    def xgroup_create(self, name, groupname, id="$", mkstream: bool = False) -> bool:
+        with self._cond:
+            stream = self._stream(name, create=mkstream)
+            if stream is None:
+                raise ResponseError("ERR The XGROUP subcommand requires the key to exist")
+            if _b(groupname) in stream.groups:
+                raise ResponseError("BUSYGROUP Consumer Group name already exists")
+            last = (stream.keys[-1] if stream.keys else (0, 0)) if id == "$" else _parse_id(id)
+            stream.groups[_b(groupname)] = _Group(last)
+            return True
+
+    def _group(self, name, groupname) -> Tuple[_Stream, _Group]:
+        stream = self._stream(name)
+        group = stream.groups.get(_b(groupname)) if stream else None
+        if group is None:
+            raise ResponseError(f"NOGROUP No such consumer group '{groupname}' for key name '{name}'")
+        return stream, group
+
+    def xreadgroup(self, groupname, consumername, streams: Dict[Any, Any], count: Optional[int] = None,
+                   block: Optional[int] = None, noack: bool = False):
+        # BLOCK 0 waits indefinitely, as in Redis
+        deadline = None if block is None else float("inf") if block == 0 else time.monotonic() + block / 1000.0
+        with self._cond:
+            while True:
+                out = []
+                for name, start in streams.items():
+                    stream, group = self._group(name, groupname)
+                    now = int(time.time() * 1000)
+                    if _b(start) == b">":
+                        lo = bisect.bisect_right(stream.keys, group.last)
+                        keys = stream.keys[lo:lo + count if count else None]
+                        if keys:
+                            group.last = keys[-1]
+                        for k in keys:
+                            if not noack:
+                                group.pending[k] = [_b(consumername), now, 1]
+                    else:  # re-read this consumer's pending entries
+                        after = _parse_id(start)
+                        keys = sorted(k for k, p in group.pending.items() if p[0] == _b(consumername) and k > after)
+                        keys = keys[:count] if count else keys
+                    if keys:
+                        out.append([_b(name), [(_format_id(k), dict(stream.fields[k])) for k in keys if k in stream.fields]])
+                if out or deadline is None:
+                    return out
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(None if remaining == float("inf") else remaining)
+
+    def xack(self, name, groupname, *ids) -> int:
+        with self._cond:
+            _, group = self._group(name, groupname)
+            return sum(group.pending.pop(_parse_id(i), None) is not None for i in ids)
+
+    def xpending_range(self, name, groupname, min="-", max="+", count: int = 100,
+                       consumername=None, idle: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._cond:
+            _, group = self._group(name, groupname)
+            now = int(time.time() * 1000)
+            out = []
+            for k in sorted(group.pending):
+                consumer, delivered_at, times = group.pending[k]
+                if consumername is not None and consumer != _b(consumername):
+                    continue
+                if idle is not None and now - delivered_at < idle:
+                    continue
+                out.append({"message_id": _format_id(k), "consumer": consumer,
+                            "time_since_delivered": now - delivered_at, "times_delivered": times})
+                if len(out) >= count:
+                    break
+            return out
+
+    def xclaim(self, name, groupname, consumername, min_idle_time: int, message_ids: List[Any]):
+        with self._cond:
+            stream, group = self._group(name, groupname)
+            now = int(time.time() * 1000)
+            out = []
+            for i in message_ids:
+                k = _parse_id(i)
+                entry = group.pending.get(k)
+                if entry is None or now - entry[1] < min_idle_time:
+                    continue
+                if k not in stream.fields:  # trimmed away while pending
+                    del group.pending[k]
+                    continue
+                group.pending[k] = [_b(consumername), now, entry[2] + 1]
+                out.append((_format_id(k), dict(stream.fields[k])))
+            return out
+
+class _Pipeline:
+    def __init__(self, client: MemoryRedis):
+        self._client = client
+        self._ops: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, command):
+        def queue(*args, **kwargs):
+            self._ops.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> List[Any]:
+        ops, self._ops = self._ops, []
+        return [getattr(self._client, command)(*args, **kwargs) for command, args, kwargs in ops]
+
+_shared: Optional[MemoryRedis] = None
+_shared_lock = threading.Lock()
+
+def get_memory_redis() -> MemoryRedis:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = MemoryRedis()
+        return _shared
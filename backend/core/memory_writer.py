@@ -0,0 +1,161 @@
+"""
+Background writer for conversation memory (query and answer embeddings).
+
+The orchestrators log every user input and agent response to the vector
+index. That logging used to run in the request path: two embedding calls
+and two upserts per chat turn. Records are now queued and a worker thread
+drains them in batches. One embeddings request covers the whole batch,
+identical texts are deduplicated by the embedding cache, and one bulk
+upsert writes the batch. A batch is flushed when it reaches
+MEMORY_WRITER_BATCH_SIZE records or MEMORY_WRITER_FLUSH_SECONDS after its
+first record, whichever comes first.
+
+The queue is bounded. When it is full, `submit` either drops the record
+at once ("drop") or waits up to MEMORY_WRITER_BLOCK_SECONDS and then drops
+it ("block"). Memory logging is best effort and must never hold up a
+response indefinitely.
+"""
+
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+from backend.core.embedding_cache import embed_with_cache
+from backend.core.llm_gateway import get_gateway
+
+logger = logging.getLogger("buildwise")
+
+# same model as ingestion: the index is 1536-dimensional, text-embedding-3-large vectors (3072) are rejected
+MEMORY_EMBED_MODEL = os.getenv("MEMORY_EMBED_MODEL", os.getenv("EMBED_MODEL", "text-embedding-3-small"))
+MEMORY_WRITER_BATCH_SIZE = int(os.getenv("MEMORY_WRITER_BATCH_SIZE", "64"))
+MEMORY_WRITER_FLUSH_SECONDS = float(os.getenv("MEMORY_WRITER_FLUSH_SECONDS", "0.5"))
+MEMORY_WRITER_MAX_QUEUE = int(os.getenv("MEMORY_WRITER_MAX_QUEUE", "10000"))
+MEMORY_WRITER_OVERFLOW = os.getenv("MEMORY_WRITER_OVERFLOW", "drop")  # drop | block
+MEMORY_WRITER_BLOCK_SECONDS = float(os.getenv("MEMORY_WRITER_BLOCK_SECONDS", "0.05"))
+# Pinecone accepts at most 100 vectors per upsert request
+MEMORY_UPSERT_BATCH = int(os.getenv("MEMORY_UPSERT_BATCH", "100"))
+
+def _default_upsert(vectors: List[Dict[str, Any]]):
+    # imported lazily: the client connects to the index at import time
+    from backend.utils.pinecone_client import upsert_vectors
+    upsert_vectors(vectors)
+
+class MemoryWriter:
+    def __init__(self, client=None, upsert=None, embed_model: str = MEMORY_EMBED_MODEL,
+                 batch_size: int = MEMORY_WRITER_BATCH_SIZE, flush_seconds: float = MEMORY_WRITER_FLUSH_SECONDS,
+                 max_queue: int = MEMORY_WRITER_MAX_QUEUE, overflow: str = MEMORY_WRITER_OVERFLOW,
+                 block_seconds: float = MEMORY_WRITER_BLOCK_SECONDS):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"overflow must be 'drop' or 'block', got {overflow!r}")
+        self.client = client or get_gateway().client
+        self.upsert = upsert or _default_upsert
+        self.embed_model = embed_model
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        # updated by callers (submitted/dropped) and the worker (the rest)
+        self._metrics_lock = threading.Lock()
+        self.metrics = {"submitted": 0, "dropped": 0, "written": 0, "failed": 0, "batches": 0, "last_flush_ms": 0.0}
+        self._worker = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str, metadata: Optional[Dict[str, Any]] = None, vector_id: Optional[str] = None) -> bool:
+        """Queues one record for embedding and upsert; False if it was dropped under backpressure."""
+        record = {"id": vector_id or str(uuid.uuid4()), "text": text, "metadata": metadata or {}}
+        try:
+            if self._closed:
+                raise queue.Full
+            if self.overflow == "block":
+                self._queue.put(record, timeout=self.block_seconds)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+        self._count(submitted=1)
+        return True
+
+    def _count(self, **deltas):
+        with self._metrics_lock:
+            for k, v in deltas.items():
+                self.metrics[k] += v
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch, stop = [record], False
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        t0 = time.perf_counter()
+        try:
+            embeddings = embed_with_cache(self.client, [r["text"] for r in batch], self.embed_model)
+            vectors = [{"id": r["id"], "values": e, "metadata": r["metadata"]} for r, e in zip(batch, embeddings)]
+            for i in range(0, len(vectors), MEMORY_UPSERT_BATCH):
+                self.upsert(vectors[i:i + MEMORY_UPSERT_BATCH])
+            self._count(written=len(batch))
+        except Exception as e:
+            self._count(failed=len(batch))
+            logger.warning(f"Memory writer dropped a batch of {len(batch)} records: {e}")
+        finally:
+            with self._metrics_lock:
+                self.metrics["batches"] += 1
+                self.metrics["last_flush_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every record queued so far has been written (or dropped on error)."""
+        self._queue.join()
+
+    def close(self, timeout: Optional[float] = None):
+        """Stops accepting records, writes what is queued and stops the worker."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        return {**metrics, "queued": self._queue.qsize(), "max_queue": self._queue.maxsize,
+                "overflow": self.overflow}
+
+_default_writer: Optional[MemoryWriter] = None
+_default_lock = threading.Lock()
+
+def get_memory_writer() -> MemoryWriter:
+    global _default_writer
+    with _default_lock:
+        if _default_writer is None:
+            _default_writer = MemoryWriter()
+        return _default_writer
+
+def close(timeout: Optional[float] = 10):
+    """Writes queued memory records and stops the shared writer, if one was started; called on shutdown."""
+    with _default_lock:
+        writer = _default_writer
+    if writer is not None:
+        writer.close(timeout=timeout)
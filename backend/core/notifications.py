@@ -1,13 +1,265 @@
-import json, time, uuid
-from typing import Dict, Any, Optional
+"""
+Event bus for domain events (buildwise.events).
+
+`publish_event` only appends to an in-memory buffer, so request handlers
+never wait on Redis. A background thread drains the buffer. It sends up
+to EVENT_BUS_BATCH_SIZE events per Redis pipeline, XADDs with approximate
+MAXLEN trimming, and flushes when the batch fills or every
+EVENT_BUS_FLUSH_SECONDS.
+
+While Redis is unreachable, batches go to an append-only JSON-lines spool
+file. The worker retries the connection every EVENT_BUS_RETRY_SECONDS.
+On reconnect it replays the spool ahead of newer events, so the stream
+keeps publish order.
+
+When the buffer is full, the publisher spools the whole buffer together
+with the new event, in order. If the worker has a batch in flight, those
+events are older than the spill but may still fail and be spooled
+themselves. So a spill made during a flight goes to a side file, which
+the worker appends to the spool after the batch has been delivered or
+spooled.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional
 
 try:
     import redis  # optional
-    r = redis.Redis.from_url("redis://localhost:6379/0")
 except Exception:
-    r = None
+    redis = None
+
+logger = logging.getLogger("buildwise")
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+STREAM = os.getenv("EVENT_STREAM", "buildwise.events")
+EVENT_STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "100000"))
+EVENT_BUS_BATCH_SIZE = int(os.getenv("EVENT_BUS_BATCH_SIZE", "256"))
+EVENT_BUS_FLUSH_SECONDS = float(os.getenv("EVENT_BUS_FLUSH_SECONDS", "0.05"))
+EVENT_BUS_MAX_BUFFER = int(os.getenv("EVENT_BUS_MAX_BUFFER", "50000"))
+EVENT_BUS_RETRY_SECONDS = float(os.getenv("EVENT_BUS_RETRY_SECONDS", "5"))
+EVENT_SPOOL_PATH = os.getenv("EVENT_SPOOL_PATH", os.path.join(".cache", "events.spool.jsonl"))
+
+def connect_redis(url: str = REDIS_URL, **kwargs):
+    """redis-py client for `url`; memory:// gives the shared in-process stand-in."""
+    if url.startswith("memory://"):
+        from backend.core.memory_redis import get_memory_redis
+        return get_memory_redis()
+    if redis is None:
+        raise RuntimeError("redis is not installed")
+    return redis.Redis.from_url(url, **kwargs)
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class EventBus:
+    def __init__(self, redis_url: Optional[str] = REDIS_URL, stream: str = STREAM, maxlen: int = EVENT_STREAM_MAXLEN,
+                 batch_size: int = EVENT_BUS_BATCH_SIZE, flush_seconds: float = EVENT_BUS_FLUSH_SECONDS,
+                 max_buffer: int = EVENT_BUS_MAX_BUFFER, retry_seconds: float = EVENT_BUS_RETRY_SECONDS,
+                 spool_path: str = EVENT_SPOOL_PATH, client=None):
+        self.redis_url = redis_url
+        self.stream = stream
+        self.maxlen = maxlen
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.retry_seconds = retry_seconds
+        self.spool_path = spool_path
+        self._client = client
+        self._owns_client = client is None
+        self._next_connect = 0.0
+        self._buffer: deque = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._spool_lock = threading.Lock()
+        self._closed = False
+        self._latencies: deque = deque(maxlen=1000)
+        self.metrics = {"published": 0, "flushed": 0, "spooled": 0, "replayed": 0, "flushes": 0, "flush_errors": 0}
+        self._merge_overflow()  # left behind if the process died with a batch in flight
+        self._worker = threading.Thread(target=self._run, name="event-bus", daemon=True)
+        self._worker.start()
+
+    # ---- producer side ----
+    def publish(self, evt: Dict[str, Any]):
+        with self._cond:
+            self.metrics["published"] += 1
+            if len(self._buffer) < self.max_buffer:
+                self._buffer.append(evt)
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify()
+                return
+            # buffer full (Redis far behind or down): persist rather than drop, the
+            # buffered events first so the spool stays in publish order
+            events = list(self._buffer)
+            events.append(evt)
+            self._buffer.clear()
+            self._spool(events, overflow=self._in_flight > 0)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until everything published so far has reached Redis or the spool."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._buffer or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join(timeout)
+
+    # ---- worker ----
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._buffer and not self._closed:
+                    self._cond.wait(self.flush_seconds)
+                if not self._buffer and self._closed:
+                    return
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._in_flight = len(batch)
+            try:
+                if batch:
+                    self._deliver(batch)
+                elif self._has_spool():
+                    self._deliver([])  # idle: try to drain the spool
+            finally:
+                with self._cond:
+                    # the batch is in Redis or the spool: events spilled meanwhile go after it
+                    self._merge_overflow()
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+    def _connect(self):
+        if self._client is not None:
+            return self._client
+        if not self.redis_url or time.monotonic() < self._next_connect:
+            return None
+        try:
+            client = connect_redis(self.redis_url, socket_connect_timeout=1, socket_timeout=2)
+            client.ping()
+            self._client = client
+            logger.info(f"Event bus connected to {self.redis_url}")
+        except Exception as e:
+            self._next_connect = time.monotonic() + self.retry_seconds
+            logger.warning(f"Event bus cannot reach Redis ({e}); spooling to {self.spool_path}")
+        return self._client
+
+    def _xadd_all(self, client, events: List[Dict[str, Any]]):
+        for start in range(0, len(events), self.batch_size):
+            pipe = client.pipeline(transaction=False)
+            for evt in events[start:start + self.batch_size]:
+                pipe.xadd(self.stream, {"data": json.dumps(evt)}, maxlen=self.maxlen, approximate=True)
+            pipe.execute()
+
+    def _deliver(self, batch: List[Dict[str, Any]]):
+        t0 = time.perf_counter()
+        client = self._connect()
+        if client is None:
+            self._spool(batch)
+            return
+        try:
+            if self._has_spool():
+                self._replay(client)
+            if batch:
+                self._xadd_all(client, batch)
+                self.metrics["flushed"] += len(batch)
+                self.metrics["flushes"] += 1
+                self._latencies.append((time.perf_counter() - t0) * 1000)
+        except Exception as e:
+            self.metrics["flush_errors"] += 1
+            logger.warning(f"Event bus flush failed ({e}); spooling {len(batch)} events")
+            if self._owns_client:  # reconnect (and back off) on the next flush
+                self._client = None
+                self._next_connect = time.monotonic() + self.retry_seconds
+            self._spool(batch)
+
+    # ---- spool ----
+    def _has_spool(self) -> bool:
+        if os.path.exists(self.spool_path + ".replay"):
+            return True
+        return os.path.exists(self.spool_path) and os.path.getsize(self.spool_path) > 0
+
+    def _spool(self, events: List[Dict[str, Any]], overflow: bool = False):
+        if not events:
+            return
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        path = self.spool_path + ".overflow" if overflow else self.spool_path
+        with self._spool_lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(evt) + "\n" for evt in events))
+            self.metrics["spooled"] += len(events)
+
+    def _merge_overflow(self):
+        """Appends events spilled while a batch was in flight to the spool."""
+        overflow = self.spool_path + ".overflow"
+        with self._spool_lock:
+            if not os.path.exists(overflow):
+                return
+            with open(overflow, "rb") as src, open(self.spool_path, "ab") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(overflow)
+
+    def _replay(self, client):
+        """Sends the spooled events, oldest first, then removes the spool."""
+        replaying = self.spool_path + ".replay"
+        with self._spool_lock:
+            # a previous replay that died midway is resent first (at-least-once)
+            if not os.path.exists(replaying):
+                os.replace(self.spool_path, replaying)
+        events = []
+        with open(replaying, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # torn final line from a crash mid-append
+        self._xadd_all(client, events)
+        os.remove(replaying)
+        self.metrics["replayed"] += len(events)
+        logger.info(f"Event bus replayed {len(events)} spooled events")
+        if self._has_spool():
+            self._replay(client)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = list(self._latencies)
+        spool_files = [p for p in (self.spool_path, self.spool_path + ".replay", self.spool_path + ".overflow")
+                       if os.path.exists(p)]
+        return {
+            **self.metrics,
+            "queue_depth": len(self._buffer) + self._in_flight,
+            "redis_connected": self._client is not None,
+            "spool_bytes": sum(os.path.getsize(p) for p in spool_files),
+            "flush_latency_ms": {
+                "last": round(latencies[-1], 3) if latencies else 0.0,
+                "p50": round(_percentile(latencies, 0.50), 3),
+                "p95": round(_percentile(latencies, 0.95), 3),
+            },
+        }
+
+_default_bus: Optional[EventBus] = None
+_default_lock = threading.Lock()
 
-STREAM = "buildwise.events"
+def get_event_bus() -> EventBus:
+    global _default_bus
+    with _default_lock:
+        if _default_bus is None:
+            _default_bus = EventBus()
+        return _default_bus
 
 def publish_event(event_type: str, payload: Dict[str, Any], actor: str, conv_id: Optional[str]=None):
     evt = {
@@ -18,6 +270,5 @@ def publish_event(event_type: str, payload: Dict[str, Any], actor: str, conv_id:
         "payload": payload,
         "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
     }
-    if r:
-        r.xadd(STREAM, {"data": json.dumps(evt)})
+    get_event_bus().publish(evt)
     return evt
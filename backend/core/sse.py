@@ -0,0 +1,35 @@
+"""
+Server-Sent Events helpers for streaming endpoints.
+
+A streaming endpoint yields (event, data) pairs from an async generator;
+`sse_response` frames them as `event: <name>\\ndata: <json>\\n\\n` and turns an
+exception raised mid-stream into a final `error` event, because the 200
+status and headers have already been sent by then.
+"""
+
+import json
+import logging
+from typing import Any, AsyncIterator, Tuple
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger("buildwise")
+
+def format_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _frames(events: AsyncIterator[Tuple[str, Any]]):
+    try:
+        async for event, data in events:
+            yield format_event(event, data)
+    except Exception as e:
+        logger.exception("Streaming response failed")
+        yield format_event("error", {"detail": str(e)})
+
+def sse_response(events: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    return StreamingResponse(
+        _frames(events),
+        media_type="text/event-stream",
+        # keeps reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,179 @@
+"""
+SQLite stand-in for the subset of supabase-py used by the data-access
+layer: table(...).select/insert/upsert with eq/neq/gt/gte/lt/lte/in_ filters,
+order, limit and maybe_single, returning responses with `.data`.
+
+Selected with SUPABASE_URL=sqlite:///path/to.db (or sqlite:// for an
+in-memory database), so the API and tests run without a Supabase project.
+The schema mirrors the hosted tables: users and conversations have uuid
+ids, chat_messages has an increasing integer id that keyset pagination
+relies on.
+"""
+
+import uuid
+import sqlite3
+import datetime as dt
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+SCHEMA = {
+    "users": """CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY, email TEXT UNIQUE, name TEXT, phone TEXT, created_at TEXT)""",
+    "conversations": """CREATE TABLE IF NOT EXISTS conversations (
+        id TEXT PRIMARY KEY, user_id TEXT, created_at TEXT)""",
+    "chat_messages": """CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT, sender TEXT, message_text TEXT, timestamp TEXT)""",
+    # rolling summary of a conversation's messages up to through_id (backend/core/conversation_memory.py)
+    "conversation_summaries": """CREATE TABLE IF NOT EXISTS conversation_summaries (
+        conversation_id TEXT PRIMARY KEY, summary TEXT, through_id INTEGER, message_count INTEGER, updated_at TEXT)""",
+}
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS conversations_user ON conversations (user_id)",
+    "CREATE INDEX IF NOT EXISTS chat_messages_conversation ON chat_messages (conversation_id, id)",
+]
+# columns filled on insert when missing: uuid ids and creation timestamps
+_DEFAULTS = {"users": ("id", "created_at"), "conversations": ("id", "created_at"), "chat_messages": ("timestamp",),
+             "conversation_summaries": ("updated_at",)}
+
+_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+def _now() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat()
+
+class APIResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"APIResponse(data={self.data!r}, count={self.count!r})"
+
+class _Query:
+    def __init__(self, db: "SQLiteSupabase", table: str):
+        if table not in db.columns:
+            raise ValueError(f"unknown table {table!r}")
+        self._db = db
+        self._table = table
+        self._rows: Optional[List[Dict[str, Any]]] = None
+        self._on_conflict: Optional[str] = None
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._single = False
+
+    def _col(self, column: str) -> str:
+        if column not in self._db.columns[self._table]:
+            raise ValueError(f"unknown column {self._table}.{column}")
+        return column
+
+    # ---- operations ----
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        return self
+
+    def insert(self, rows) -> "_Query":
+        self._rows = [rows] if isinstance(rows, dict) else list(rows)
+        return self
+
+    def upsert(self, rows, on_conflict: str = "") -> "_Query":
+        self._on_conflict = ",".join(self._col(c.strip()) for c in on_conflict.split(",") if c.strip()) or "id"
+        return self.insert(rows)
+
+    # ---- filters and modifiers ----
+    def __getattr__(self, name):
+        if name not in _OPS:
+            raise AttributeError(name)
+        def where(column: str, value: Any) -> "_Query":
+            self._filters.append((self._col(column), _OPS[name], value))
+            return self
+        return where
+
+    def in_(self, column: str, values: List[Any]) -> "_Query":
+        self._filters.append((self._col(column), "IN", list(values)))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self._order.append((self._col(column), desc))
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._limit = int(n)
+        return self
+
+    def maybe_single(self) -> "_Query":
+        self._single = True
+        return self
+
+    # ---- execution ----
+    def execute(self) -> APIResponse:
+        if self._rows is not None:
+            return APIResponse(self._db._insert(self._table, self._rows, self._on_conflict))
+        sql, args = f"SELECT * FROM {self._table}", []
+        if self._filters:
+            clauses = []
+            for col, op, value in self._filters:
+                if op == "IN":
+                    clauses.append(f"{col} IN ({', '.join('?' * len(value)) or 'NULL'})")
+                    args.extend(value)
+                else:
+                    clauses.append(f"{col} {op} ?")
+                    args.append(value)
+            sql += " WHERE " + " AND ".join(clauses)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(f"{c} {'DESC' if d else 'ASC'}" for c, d in self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+        rows = self._db._query(sql, args)
+        if self._single:
+            if len(rows) > 1:
+                raise ValueError("maybe_single() matched more than one row")
+            return APIResponse(rows[0] if rows else None)
+        return APIResponse(rows)
+
+class SQLiteSupabase:
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            for ddl in list(SCHEMA.values()) + INDEXES:
+                self._conn.execute(ddl)
+            self.columns = {t: [r[1] for r in self._conn.execute(f"PRAGMA table_info({t})")] for t in SCHEMA}
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def _query(self, sql: str, args: List[Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, args)]
+
+    def _insert(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> List[Dict[str, Any]]:
+        out = []
+        with self._lock:
+            # one transaction per call, like a single bulk insert request
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    row = dict(row)
+                    for col in _DEFAULTS.get(table, ()):
+                        if row.get(col) is None:
+                            row[col] = str(uuid.uuid4()) if col == "id" else _now()
+                    cols = [c for c in row if c in self.columns[table]]
+                    if len(cols) != len(row):
+                        raise ValueError(f"unknown columns for {table}: {sorted(set(row) - set(cols))}")
+                    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+                    if on_conflict:
+                        sql += f" ON CONFLICT ({on_conflict}) DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in cols)
+                    cur = self._conn.execute(sql + " RETURNING *", [row[c] for c in cols])
+                    out.append(dict(cur.fetchone()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return out
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,53 +1,403 @@
-from supabase import create_client, Client
-import os
-
 """
 Supabase connection and helper functions.
+
+The client is created on first use rather than at import, so importing
+this module needs neither credentials nor network. SUPABASE_URL may point
+at a SQLite file instead (sqlite:///path/to.db, or sqlite:// in memory)
+for offline runs and tests; see backend/db/sqlite_supabase.py.
+
+- Message inserts are buffered. add_message queues the row, and a
+  background writer sends queued rows as one bulk insert per
+  MESSAGE_WRITER_BATCH_SIZE rows or every MESSAGE_WRITER_FLUSH_SECONDS.
+  Reads of a conversation with queued rows wait for that conversation's
+  rows first, so callers still read their own writes.
+- History is read with keyset pagination on chat_messages.id: a page is
+  `id > after_id ORDER BY id LIMIT n`, which costs the same on the
+  thousandth page as on the first. get_recent_messages reads only the
+  last N messages for prompt context.
+- get_user and get_conversations go through a TTL read-through cache.
+  The create_* helpers invalidate the entries they affect.
 """
 
+import os
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+logger = logging.getLogger("buildwise")
+
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+MESSAGE_WRITER_BATCH_SIZE = int(os.getenv("MESSAGE_WRITER_BATCH_SIZE", "200"))
+MESSAGE_WRITER_FLUSH_SECONDS = float(os.getenv("MESSAGE_WRITER_FLUSH_SECONDS", "0.25"))
+MESSAGE_WRITER_MAX_QUEUE = int(os.getenv("MESSAGE_WRITER_MAX_QUEUE", "10000"))
+MESSAGE_WRITER_RETRIES = int(os.getenv("MESSAGE_WRITER_RETRIES", "3"))
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", "100"))
+DB_CACHE_TTL_SECONDS = float(os.getenv("DB_CACHE_TTL_SECONDS", "30"))
+DB_CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "10000"))
+
+def connect_supabase(url: Optional[str] = SUPABASE_URL, key: Optional[str] = SUPABASE_KEY):
+    """supabase-py client for `url`; sqlite:// URLs give the local stand-in."""
+    if url and url.startswith("sqlite://"):
+        from backend.db.sqlite_supabase import SQLiteSupabase
+        # sqlite:///relative.db, sqlite:////abs/path.db, or sqlite:// for in-memory
+        return SQLiteSupabase(url[len("sqlite:///"):] if url.startswith("sqlite:///") else ":memory:")
+    from supabase import create_client
+    return create_client(url, key)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = connect_supabase()
+        return _client
+
+def __getattr__(name):
+    # `supabase_client.supabase` predates get_client(); it now connects on first access
+    if name == "supabase":
+        return get_client()
+    raise AttributeError(name)
+
+# ---- read-through cache ----
+class TTLCache:
+    """Small thread-safe LRU whose entries expire after `ttl` seconds."""
+    def __init__(self, ttl: float = DB_CACHE_TTL_SECONDS, max_entries: int = DB_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0}
+
+    def get_or_load(self, key, load: Callable[[], Any]):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.metrics["hits"] += 1
+                return entry[1]
+            self.metrics["misses"] += 1
+        value = load()
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.metrics, "entries": len(self._data), "ttl_seconds": self.ttl}
+
+user_cache = TTLCache()
+conversation_cache = TTLCache()
+
+# ---- buffered message writes ----
+class _Flush:
+    """Queue marker for a waiting reader; set once every row queued before it is written."""
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = False
+
+class MessageWriter:
+    """
+    Queues chat_messages rows and bulk-inserts them from a worker thread.
+
+    Unlike conversation-memory logging, messages are data, so `add` blocks
+    when the queue is full instead of dropping. A failed bulk insert is
+    retried MESSAGE_WRITER_RETRIES times with backoff before the batch is
+    logged and counted as failed.
+
+    `flush` queues a marker and waits only for the rows ahead of it, never
+    for rows added later. With a conversation id it also returns as soon
+    as that conversation has no queued rows, so a reader is not held up by
+    other conversations' writes.
+    """
+    def __init__(self, client=None, table: str = "chat_messages",
+                 batch_size: int = MESSAGE_WRITER_BATCH_SIZE, flush_seconds: float = MESSAGE_WRITER_FLUSH_SECONDS,
+                 max_queue: int = MESSAGE_WRITER_MAX_QUEUE, retries: int = MESSAGE_WRITER_RETRIES):
+        self._client = client
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.retries = max(0, retries)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._pending: Dict[Any, int] = {}
+        # guards _pending and the markers; notified after every batch
+        self._cond = threading.Condition()
+        self._closed = False
+        self.metrics = {"submitted": 0, "written": 0, "failed": 0, "batches": 0, "last_flush_ms": 0.0}
+        self._worker = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._worker.start()
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else get_client()
+
+    def add(self, row: Dict[str, Any]):
+        if self._closed:
+            raise RuntimeError("message writer is closed")
+        with self._cond:
+            key = row.get("conversation_id")
+            self._pending[key] = self._pending.get(key, 0) + 1
+        self._queue.put(row)
+        self.metrics["submitted"] += 1
+
+    def pending(self, conversation_id=None) -> int:
+        with self._cond:
+            return sum(self._pending.values()) if conversation_id is None else self._pending.get(conversation_id, 0)
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                return
+            if isinstance(row, _Flush):
+                self._release([row])
+                continue
+            batch, stop, markers = [row], False, []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                if isinstance(row, _Flush):
+                    # a reader is waiting: write now instead of at the deadline
+                    markers.append(row)
+                    break
+                batch.append(row)
+            self._write(batch)
+            self._release(markers)
+            if stop:
+                return
 
+    def _release(self, markers: List[_Flush]):
+        with self._cond:
+            for m in markers:
+                m.done = True
+            self._cond.notify_all()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        t0 = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.client.table(self.table).insert(batch).execute()
+                    self.metrics["written"] += len(batch)
+                    break
+                except Exception as e:
+                    if attempt == self.retries:
+                        self.metrics["failed"] += len(batch)
+                        logger.error(f"Message writer lost a batch of {len(batch)} rows: {e}")
+                    else:
+                        time.sleep(min(2.0, 0.1 * 2 ** attempt))
+        finally:
+            self.metrics["batches"] += 1
+            self.metrics["last_flush_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            with self._cond:
+                for row in batch:
+                    key = row.get("conversation_id")
+                    self._pending[key] -= 1
+                    if not self._pending[key]:
+                        del self._pending[key]
+                self._cond.notify_all()
+
+    def flush(self, conversation_id=None):
+        """
+        Blocks until every row queued so far (only those of `conversation_id`,
+        if given) has been written or given up on.
+        """
+        if self._closed:
+            self._worker.join()
+            return
+        if conversation_id is not None and not self.pending(conversation_id):
+            return
+        marker = _Flush()
+        self._queue.put(marker)
+        with self._cond:
+            while not marker.done and self._worker.is_alive():
+                if conversation_id is not None and not self._pending.get(conversation_id):
+                    return
+                self._cond.wait(0.1)
+
+    def close(self, timeout: Optional[float] = None):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "queued": self._queue.qsize(), "max_queue": self._queue.maxsize}
+
+_writer: Optional[MessageWriter] = None
+_writer_lock = threading.Lock()
+
+def get_message_writer() -> MessageWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MessageWriter()
+        return _writer
+
+def _read_your_writes(conversation_id):
+    if _writer is not None:
+        _writer.flush(conversation_id)
+
+def close():
+    """Writes queued messages; called on shutdown."""
+    if _writer is not None:
+        _writer.close(timeout=10)
+
+# ---- users ----
 def create_user(email, name, phone):
-    return supabase.table("users").insert({
+    res = get_client().table("users").insert({
         "email": email,
         "name": name,
         "phone": phone
     }).execute()
+    user_cache.invalidate(email)
+    return res
 
 def get_user(email):
-    return (
-        supabase
+    return user_cache.get_or_load(email, lambda: (
+        get_client()
         .table("users")
         .select("*")
         .eq("email", email)
         .maybe_single()   # ✅ DO NOT USE single() !
         .execute()
-    )
+    ))
 
+# ---- conversations ----
 def create_conversation(user_id):
-    return supabase.table("conversations").insert({
+    res = get_client().table("conversations").insert({
         "user_id": user_id
     }).execute()
+    conversation_cache.invalidate(user_id)
+    return res
 
 def get_conversations(user_id):
-    return supabase.table("conversations").select("*").eq("user_id", user_id).execute()
+    return conversation_cache.get_or_load(
+        user_id, lambda: get_client().table("conversations").select("*").eq("user_id", user_id).execute())
 
+# ---- messages ----
 def add_message(conversation_id, sender, message_text):
-    return supabase.table("chat_messages").insert({
+    """Queues the message for the next bulk insert."""
+    get_message_writer().add({
         "conversation_id": conversation_id,
         "sender": sender,
         "message_text": message_text
-    }).execute()
+    })
+
+def get_messages(conversation_id, after_id: Optional[int] = None, limit: int = MESSAGES_PAGE_SIZE):
+    """One page of a conversation, oldest first; pass the last row's id as `after_id` for the next page."""
+    _read_your_writes(conversation_id)
+    q = get_client().table("chat_messages").select("*").eq("conversation_id", conversation_id)
+    if after_id is not None:
+        q = q.gt("id", after_id)
+    return q.order("id").limit(limit).execute()
+
+def iter_messages(conversation_id, page_size: int = MESSAGES_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """Every message of a conversation, oldest first, fetched page by page."""
+    after_id = None
+    while True:
+        rows = get_messages(conversation_id, after_id=after_id, limit=page_size).data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]["id"]
 
-def get_messages(conversation_id):
-    return (
-        supabase
+def get_recent_messages(conversation_id, limit: int = 20) -> List[Dict[str, Any]]:
+    """The last `limit` messages, oldest first: the context window for a new turn."""
+    _read_your_writes(conversation_id)
+    rows = (
+        get_client()
         .table("chat_messages")
         .select("*")
         .eq("conversation_id", conversation_id)
-        .order("timestamp")
+        .order("id", desc=True)
+        .limit(limit)
+        .execute()
+    ).data or []
+    return rows[::-1]
+
+# ---- conversation summaries ----
+def get_conversation_summary(conversation_id) -> Optional[Dict[str, Any]]:
+    """The stored rolling summary ({summary, through_id, message_count, ...}) or None."""
+    res = (
+        get_client()
+        .table("conversation_summaries")
+        .select("*")
+        .eq("conversation_id", conversation_id)
+        .maybe_single()
         .execute()
     )
+    return res.data if res is not None else None
+
+def save_conversation_summary(conversation_id, summary: str, through_id: Optional[int], message_count: int):
+    return get_client().table("conversation_summaries").upsert({
+        "conversation_id": conversation_id,
+        "summary": summary,
+        "through_id": through_id,
+        "message_count": message_count
+    }, on_conflict="conversation_id").execute()
+
+def stats() -> Dict[str, Any]:
+    return {"message_writer": _writer.stats() if _writer is not None else None,
+            "user_cache": user_cache.stats(), "conversation_cache": conversation_cache.stats()}
+
+if __name__ == "__main__":
+    # python -m backend.db.supabase_client [turns]: per-row inserts and full reads vs buffered inserts and keyset reads
+    import sys
+    import tempfile
+    from backend.db.sqlite_supabase import SQLiteSupabase
+
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    db = SQLiteSupabase(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    _client = db
+
+    t0 = time.perf_counter()
+    for i in range(turns):
+        # previous pattern: one insert request per message, whole history read every turn
+        db.table("chat_messages").insert({"conversation_id": "old", "sender": "user", "message_text": f"turn {i}"}).execute()
+        db.table("chat_messages").select("*").eq("conversation_id", "old").order("timestamp").execute()
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in range(turns):
+        add_message("new", "user", f"turn {i}")
+        get_recent_messages("new", limit=20)
+    t_new = time.perf_counter() - t0
+    writer = get_message_writer()
+    writer.flush()
+    print(f"{turns} turns, per-row insert + full history: {t_old:6.2f} s")
+    print(f"{turns} turns, buffered insert + last 20:     {t_new:6.2f} s  ({t_old / t_new:.1f}x)")
+
+    # without a read each turn, the writer batches
+    t0 = time.perf_counter()
+    for i in range(turns):
+        add_message("bulk", "user", f"turn {i}")
+    writer.flush()
+    print(f"{turns} messages queued and bulk-inserted:    {time.perf_counter() - t0:6.2f} s  {writer.stats()}")
+    assert [m["message_text"] for m in iter_messages("bulk", page_size=97)] == [f"turn {i}" for i in range(turns)]
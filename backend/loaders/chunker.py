@@ -1,4 +1,128 @@
-from typing import List
+import re
+from typing import List, Iterator, Tuple, NamedTuple
+
+try:
+    import tiktoken  # optional, exact counts for the OpenAI embedding models
+    _enc = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _enc = None
+
+# Fallback when tiktoken is unavailable: words and punctuation marks,
+# a close (slightly low) approximation of cl100k token counts for prose.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    if _enc is not None:
+        return len(_enc.encode(text, disallowed_special=()))
+    return len(_TOKEN_RE.findall(text))
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """count_tokens for many texts at once (tiktoken's threaded batch encoder, or one regex pass per text)."""
+    if _enc is not None:
+        return [len(t) for t in _enc.encode_batch(texts, disallowed_special=())]
+    return [len(_TOKEN_RE.findall(t)) for t in texts]
+
+# Break strengths: the chunker prefers to cut at the strongest boundary
+# that still leaves the chunk reasonably full.
+HEADING, PARAGRAPH, CLAUSE, WORD = 3, 2, 1, 0
+
+# Heading and paragraph breaks may start with trailing spaces of the previous
+# line, so that after a sentence end they match before the clause break would.
+_BOUNDARY_RE = re.compile(
+    r"(?P<heading>[ \t]*\n\s*(?=(?:ARTICLE|Article|SECTION|Section|§)\s*[\dIVXLC]"
+    r"|\d+(?:\.\d+)*[.)]?[ \t]+[A-Z]"
+    r"|[A-Z][A-Z0-9 ,&'()-]{3,80}\n))"
+    r"|(?P<paragraph>[ \t]*\n[ \t]*\n\s*)"
+    r"|(?P<clause>(?<=[.;:!?])\s+)"
+)
+
+class _Segment(NamedTuple):
+    start: int
+    end: int
+    strength: int  # strength of the break before this segment
+    tokens: int
+
+def _split_words(text: str, start: int, end: int, strength: int, max_tokens: int) -> Iterator[_Segment]:
+    # a single clause longer than a chunk: fall back to word boundaries
+    piece_start, piece_tokens = start, 0
+    for m in re.finditer(r"\S+", text[start:end]):
+        w_start, w_end = start + m.start(), start + m.end()
+        n = count_tokens(m.group())
+        if piece_tokens and piece_tokens + n > max_tokens // 2:
+            yield _Segment(piece_start, prev_end, strength, piece_tokens)
+            piece_start, piece_tokens, strength = w_start, 0, WORD
+        piece_tokens += n
+        prev_end = w_end
+    if piece_tokens:
+        yield _Segment(piece_start, prev_end, strength, piece_tokens)
+
+def _segments(text: str, max_tokens: int) -> Iterator[_Segment]:
+    pos, strength = 0, HEADING
+    for m in _BOUNDARY_RE.finditer(text):
+        if m.start() > pos:
+            yield from _emit(text, pos, m.start(), strength, max_tokens)
+        pos = m.end()
+        strength = HEADING if m.group("heading") is not None else PARAGRAPH if m.group("paragraph") is not None else CLAUSE
+    if pos < len(text):
+        yield from _emit(text, pos, len(text), strength, max_tokens)
+
+def _emit(text: str, start: int, end: int, strength: int, max_tokens: int) -> Iterator[_Segment]:
+    # trim whitespace so spans never start or end on it
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start == end:
+        return
+    n = count_tokens(text[start:end])
+    if n <= max_tokens:
+        yield _Segment(start, end, strength, n)
+    else:
+        yield from _split_words(text, start, end, strength, max_tokens)
+
+def _best_cut(window: List[_Segment], next_strength: int, min_tokens: float) -> int:
+    """Index to cut the window at: the strongest boundary past min_tokens, latest on ties."""
+    best = (next_strength, len(window))
+    acc = 0
+    for i, seg in enumerate(window):
+        if i and acc >= min_tokens and seg.strength > next_strength:
+            best = max(best, (seg.strength, i))
+        acc += seg.tokens
+    return best[1]
+
+def iter_chunk_spans(text: str, max_tokens: int = 400, overlap_tokens: int = 40,
+                     min_fill: float = 0.5) -> Iterator[Tuple[int, int]]:
+    """
+    Yields (start, end) character offsets of chunks of `text`, each at most
+    `max_tokens` tokens (unless a single word is longer). Chunks break at
+    headings, paragraphs or clause ends where possible and repeat up to
+    `overlap_tokens` of trailing clauses from the previous chunk, never
+    across a heading. Slice the source with text[start:end] to materialize.
+    """
+    window: List[_Segment] = []
+    total = 0
+    for seg in _segments(text, max_tokens):
+        while window and total + seg.tokens > max_tokens:
+            cut = _best_cut(window, seg.strength, max_tokens * min_fill)
+            emitted, rest = window[:cut], window[cut:]
+            yield emitted[0].start, emitted[-1].end
+
+            carry, acc = [], 0
+            next_strength = rest[0].strength if rest else seg.strength
+            if overlap_tokens and next_strength < HEADING:
+                for s in reversed(emitted[1:]):
+                    if acc + s.tokens > overlap_tokens:
+                        break
+                    carry.insert(0, s)
+                    acc += s.tokens
+            rest_tokens = sum(s.tokens for s in rest)
+            if acc + rest_tokens + seg.tokens > max_tokens:
+                carry, acc = [], 0
+            window, total = carry + rest, acc + rest_tokens
+        window.append(seg)
+        total += seg.tokens
+    if window:
+        yield window[0].start, window[-1].end
 
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
     words = text.split()
@@ -10,3 +134,32 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]
         chunks.append(" ".join(chunk))
         start += chunk_size - overlap
     return chunks
+
+# Micro-benchmark: python -m backend.loaders.chunker
+if __name__ == "__main__":
+    import time
+
+    clause = ("The Tenant shall pay the Base Rent in equal monthly installments in advance on the first day "
+              "of each calendar month; late payments accrue a fee of five percent. ")
+    sections = []
+    for n in range(1, 401):
+        body = "\n".join(clause * (1 + n % 4) for _ in range(3))
+        sections.append(f"SECTION {n}. TERMS AND CONDITIONS\n{body}\n")
+    doc = "\n\n".join(sections)
+    print(f"document: {len(doc):,} chars, {count_tokens(doc):,} tokens "
+          f"({'tiktoken' if _enc is not None else 'regex estimate'})")
+
+    t0 = time.perf_counter()
+    words = chunk_text(doc, chunk_size=500, overlap=50)
+    t_words = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    spans = list(iter_chunk_spans(doc, max_tokens=400, overlap_tokens=40))
+    t_spans = time.perf_counter() - t0
+
+    w_tokens = [count_tokens(c) for c in words]
+    s_tokens = [count_tokens(doc[s:e]) for s, e in spans]
+    heading_starts = sum(doc[s:e].startswith("SECTION") for s, e in spans)
+    print(f"word chunker : {len(words):4d} chunks in {t_words * 1000:8.1f} ms, "
+          f"tokens/chunk max {max(w_tokens)} min {min(w_tokens)}")
+    print(f"span chunker : {len(spans):4d} chunks in {t_spans * 1000:8.1f} ms, "
+          f"tokens/chunk max {max(s_tokens)} min {min(s_tokens)}, {heading_starts} start at a heading")
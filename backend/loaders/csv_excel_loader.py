@@ -2,11 +2,214 @@
 
 import pandas as pd
 import os
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from backend.loaders.chunker import count_tokens_batch
+from backend.loaders.normalize import to_number, to_list, to_bool, infer_kinds, normalize_frame, rows_to_text
 
 BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../temp_files'))
 
+TABULAR_EXTENSIONS = (".csv", ".xlsx")
+# rows parsed per DataFrame while streaming a sheet
+TABLE_READ_ROWS = int(os.getenv("TABLE_READ_ROWS", "10000"))
+# token budget of one ingestion section; matches the ingest chunk size so rows are not split
+TABLE_SECTION_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+
+def _iter_xlsx(file_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+    # read_only streams rows from the sheet XML instead of building the whole workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h) if h is not None else f"column_{i + 1}" for i, h in enumerate(header)]
+        buf, offset = [], 0
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            buf.append(row[:len(columns)])
+            if len(buf) >= chunksize:
+                # the index continues across chunks, as with pd.read_csv(chunksize=...)
+                yield pd.DataFrame(buf, columns=columns, index=range(offset, offset + len(buf)))
+                buf, offset = [], offset + len(buf)
+        if buf:
+            yield pd.DataFrame(buf, columns=columns, index=range(offset, offset + len(buf)))
+    finally:
+        wb.close()
+
+def iter_table(file_path: str, chunksize: int = TABLE_READ_ROWS) -> Iterator[pd.DataFrame]:
+    """A CSV or XLSX sheet as consecutive DataFrames of up to `chunksize` rows."""
+    if file_path.lower().endswith(".xlsx"):
+        yield from _iter_xlsx(file_path, chunksize)
+    else:
+        with pd.read_csv(file_path, chunksize=chunksize) as reader:
+            yield from reader
+
+def iter_normalized(file_path: str, chunksize: int = TABLE_READ_ROWS) -> Iterator[pd.DataFrame]:
+    """iter_table with currency/percent columns parsed; column kinds come from the first chunk."""
+    kinds = None
+    for df in iter_table(file_path, chunksize):
+        if kinds is None:
+            kinds = infer_kinds(df)
+        yield normalize_frame(df, kinds)
+
+def iter_table_sections(file_path: str, max_tokens: int = TABLE_SECTION_TOKENS,
+                        chunksize: int = TABLE_READ_ROWS) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Yields (None, text) sections of whole rows, one "column: value; ..."
+    line per row, packed up to `max_tokens` (a longer row is a section of
+    its own). Only one read chunk is held in memory at a time.
+    """
+    lines: List[str] = []
+    tokens = 0
+    for df in iter_normalized(file_path, chunksize):
+        batch = [line for line in rows_to_text(df) if line]
+        for line, n in zip(batch, count_tokens_batch(batch)):
+            n += 1
+            if lines and tokens + n > max_tokens:
+                yield None, "\n".join(lines)
+                lines, tokens = [], 0
+            lines.append(line)
+            tokens += n
+    if lines:
+        yield None, "\n".join(lines)
+
+def load_csv_excel(file_path: str) -> str:
+    """A CSV or XLSX sheet as text for ingestion: one "column: value; ..." line per row, money and percentages parsed."""
+    return "\n".join(text for _, text in iter_table_sections(file_path))
+
 def load_building_data():
     return pd.read_csv(os.path.join(BASE_PATH, "building_data.csv"))
 
 def load_unit_data():
     return pd.read_csv(os.path.join(BASE_PATH, "unit_data.csv"))
+
+# ---- inventory normalization (same column conventions as the Streamlit app) ----
+
+BUILDING_COLMAP = {
+    "building_id": "building_id", "Building ID": "building_id", "bldg_id": "building_id",
+    "Property Address": "address", "Address": "address", "Building Address": "address",
+    "Neighborhood": "neighborhood", "Area": "neighborhood", "area": "neighborhood", "Borough": "neighborhood",
+    "Transit": "transit", "Near Transit": "transit",
+    "Pets": "pets", "Pet Friendly": "pets",
+}
+
+UNIT_COLMAP = {
+    "Unit ID": "unit_id", "unique_id": "unit_id", "ID": "unit_id", "id": "unit_id",
+    "building_id": "building_id", "Building ID": "building_id",
+    "Monthly Rent": "rent", "Rent": "rent", "Price": "rent", "Asking Rent": "rent", "Annual Rent": "annual_rent",
+    "Square Feet": "sqft", "SQFT": "sqft", "Size (SF)": "sqft", "Size": "sqft",
+    "Floor": "floor", "Suite": "suite", "Unit": "suite",
+    "Amenities": "amenities", "Amenity": "amenities",
+    "Rent/SF/Year": "ppsf_year", "$PSF/Yr": "ppsf_year", "$/SF/Yr": "ppsf_year",
+    "Property Address": "address", "Address": "address",
+}
+
+INVENTORY_COLUMNS = ["id", "address", "neighborhood", "sqft", "rent", "ppsf_year", "floor", "suite",
+                     "amenities", "near_transit", "pet_friendly"]
+
+def normalize_buildings(df_b: pd.DataFrame) -> pd.DataFrame:
+    df = df_b.rename(columns={k: v for k, v in BUILDING_COLMAP.items() if k in df_b.columns}).copy()
+    if "building_id" not in df.columns: df["building_id"] = df.index.astype(str)
+    if "address" not in df.columns: df["address"] = ""
+    if "neighborhood" not in df.columns: df["neighborhood"] = ""
+    df["neighborhood"] = df["neighborhood"].fillna("").astype(str)
+    df["near_transit"] = df["transit"].astype(str).str.len().gt(0) if "transit" in df.columns else False
+    df["pet_friendly"] = to_bool(df["pets"]) if "pets" in df.columns else False
+    return df[["building_id", "address", "neighborhood", "near_transit", "pet_friendly"]]
+
+def normalize_units(df_u: pd.DataFrame) -> pd.DataFrame:
+    df = df_u.rename(columns={k: v for k, v in UNIT_COLMAP.items() if k in df_u.columns}).copy()
+    if "unit_id" not in df.columns: df["unit_id"] = df.index.astype(str)
+    for c in ("rent", "sqft", "ppsf_year", "annual_rent"):
+        if c in df.columns: df[c] = to_number(df[c])
+    if "amenities" in df.columns: df["amenities"] = to_list(df["amenities"])
+    else: df["amenities"] = [[] for _ in range(len(df))]
+    if {"rent", "ppsf_year", "sqft"}.issubset(df.columns):
+        need = df["rent"].isna() & df["ppsf_year"].notna() & df["sqft"].notna()
+        df.loc[need, "rent"] = (df["ppsf_year"] * df["sqft"] / 12.0).round(0)
+    if "annual_rent" in df.columns and "rent" in df.columns:
+        need = df["rent"].isna() & df["annual_rent"].notna()
+        df.loc[need, "rent"] = (df["annual_rent"] / 12.0).round(0)
+    return df
+
+def build_inventory(df_u: pd.DataFrame, df_b: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Normalizes unit (and optional building) tables and joins them into inventory columns."""
+    M = normalize_units(df_u)
+    if df_b is not None:
+        B = normalize_buildings(df_b)
+        key = "building_id" if "building_id" in M.columns else "address" if "address" in M.columns else None
+        if key:
+            M = M.merge(B.drop(columns=[c for c in ("building_id", "address") if c != key]),
+                        on=key, how="left", suffixes=("", "_b"))
+    M["id"] = M["unit_id"].astype(str)
+    if "ppsf_year" not in M.columns: M["ppsf_year"] = None
+    if "rent" in M.columns and "sqft" in M.columns:
+        need = M["ppsf_year"].isna() & M["rent"].notna() & M["sqft"].notna()
+        M.loc[need, "ppsf_year"] = (M["rent"] * 12.0 / M["sqft"]).round(2)
+    for k in INVENTORY_COLUMNS:
+        if k not in M.columns:
+            M[k] = [[] for _ in range(len(M))] if k == "amenities" else False if k in ("near_transit", "pet_friendly") else None
+    M["neighborhood"] = M["neighborhood"].fillna("")
+    M["near_transit"] = M["near_transit"].fillna(False).astype(bool)
+    M["pet_friendly"] = M["pet_friendly"].fillna(False).astype(bool)
+    return M[INVENTORY_COLUMNS]
+
+def inventory_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """DataFrame rows as JSON-safe dicts (NaN becomes None)."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def load_inventory_rows() -> List[Dict[str, Any]]:
+    return inventory_records(build_inventory(load_unit_data(), load_building_data()))
+
+def iter_inventory_records(unit_path: str, building_path: Optional[str] = None,
+                           chunksize: int = TABLE_READ_ROWS) -> Iterator[List[Dict[str, Any]]]:
+    """Inventory records for a unit sheet of any size, one list per read chunk; the building sheet is read whole."""
+    df_b = next(iter_table(building_path, chunksize=1 << 30), None) if building_path else None
+    for df_u in iter_table(unit_path, chunksize):
+        yield inventory_records(build_inventory(df_u, df_b))
+
+if __name__ == "__main__":
+    # python -m backend.loaders.csv_excel_loader [rows]: streaming a synthetic rent roll into ingestion sections
+    import sys
+    import time
+    import tempfile
+    import threading
+    from backend.loaders.normalize import _synthetic_units
+
+    def load_csv_excel_whole(file_path: str) -> str:
+        # the pre-streaming loader: read, parse and render the whole sheet at once
+        df = pd.read_csv(file_path)
+        return "\n".join(rows_to_text(normalize_frame(df, infer_kinds(df))))
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    path = os.path.join(tempfile.mkdtemp(), "rent_roll.csv")
+    for start in range(0, n, 50_000):
+        # written in pieces so generating the file does not inflate the RSS baseline
+        part = _synthetic_units(min(50_000, n - start), seed=start)
+        part["unique_id"] += start
+        part.to_csv(path, mode="a", header=start == 0, index=False)
+    print(f"{n:,} rows, {os.path.getsize(path) / 1e6:.0f} MB CSV")
+
+    def rss_mb() -> float:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+    peak = [rss_mb()]
+    def sample():
+        while True:
+            peak[0] = max(peak[0], rss_mb())
+            time.sleep(0.02)
+    threading.Thread(target=sample, daemon=True).start()
+
+    # streamed first: RSS rarely shrinks, so the whole-file peak would hide it
+    for name, fn in [
+        ("streamed sections", lambda: sum(1 for _ in iter_table_sections(path))),
+        ("whole file", lambda: load_csv_excel_whole(path)),
+    ]:
+        start = peak[0] = rss_mb()
+        t0 = time.perf_counter()
+        fn()
+        print(f"{name:18s} {time.perf_counter() - t0:6.2f} s  RSS +{peak[0] - start:6.1f} MB")
@@ -0,0 +1,115 @@
+# backend/loaders/inventory_snapshot.py
+
+"""
+Prebuilt inventory snapshots.
+
+The repo inventory is built by reading the unit and building CSVs,
+normalizing them and joining them (csv_excel_loader.build_inventory).
+That happens once per set of source files. The result is written as an
+uncompressed Arrow IPC file named after a hash of the sources' contents,
+and later loads memory-map that file instead of re-parsing anything.
+Editing either CSV changes the hash, which triggers a rebuild.
+
+Hashes are memoized per (path, size, mtime), so checking for a fresh
+snapshot costs two stat() calls.
+"""
+
+import os
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from backend.loaders.csv_excel_loader import BASE_PATH, build_inventory
+
+INVENTORY_SNAPSHOT_DIR = os.getenv("INVENTORY_SNAPSHOT_DIR", os.path.join(".cache", "inventory"))
+# bump when build_inventory's output changes, so old snapshots are not reused
+SNAPSHOT_FORMAT = "2"
+
+UNIT_CSV = os.path.join(BASE_PATH, "unit_data.csv")
+BUILDING_CSV = os.path.join(BASE_PATH, "building_data.csv")
+
+_hash_memo: Dict[str, Tuple[int, int, str]] = {}
+_hash_lock = threading.Lock()
+
+def file_hash(path: str) -> str:
+    st = os.stat(path)
+    with _hash_lock:
+        memo = _hash_memo.get(path)
+        if memo and memo[:2] == (st.st_size, st.st_mtime_ns):
+            return memo[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _hash_lock:
+        _hash_memo[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+def source_fingerprint(unit_path: str = UNIT_CSV, building_path: Optional[str] = BUILDING_CSV) -> str:
+    """Identifies the snapshot for these source files (raises OSError if one is missing)."""
+    parts = [SNAPSHOT_FORMAT, file_hash(unit_path), file_hash(building_path) if building_path else ""]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    out = df.copy()
+    out["amenities"] = [[str(a) for a in v] if isinstance(v, list) else [] for v in out["amenities"]]
+    for c in out.columns:
+        # mixed-type object columns (e.g. Floor "E3" next to 12) are stored as text
+        if c != "amenities" and out[c].dtype == object:
+            out[c] = out[c].map(lambda v: None if v is None or (isinstance(v, float) and v != v) else str(v))
+    return pa.Table.from_pandas(out, preserve_index=False)
+
+def _from_arrow(table: pa.Table) -> pd.DataFrame:
+    df = table.drop_columns(["amenities"]).to_pandas()
+    # list columns come back as numpy arrays; the ranking code expects lists
+    df["amenities"] = table.column("amenities").to_pylist()
+    return df[table.column_names]
+
+def build_snapshot(unit_path: str = UNIT_CSV, building_path: Optional[str] = BUILDING_CSV,
+                   snapshot_dir: str = INVENTORY_SNAPSHOT_DIR) -> str:
+    """Normalizes and joins the sources and writes the snapshot; returns its path."""
+    fingerprint = source_fingerprint(unit_path, building_path)
+    path = os.path.join(snapshot_dir, f"inventory-{fingerprint}.arrow")
+    df = build_inventory(pd.read_csv(unit_path), pd.read_csv(building_path) if building_path else None)
+    table = _to_arrow(df)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return path
+
+def snapshot_table(unit_path: str = UNIT_CSV, building_path: Optional[str] = BUILDING_CSV,
+                   snapshot_dir: str = INVENTORY_SNAPSHOT_DIR) -> pa.Table:
+    """The inventory as a memory-mapped Arrow table, building the snapshot first if the sources changed."""
+    path = os.path.join(snapshot_dir, f"inventory-{source_fingerprint(unit_path, building_path)}.arrow")
+    if not os.path.exists(path):
+        path = build_snapshot(unit_path, building_path, snapshot_dir)
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+def load_inventory_snapshot(unit_path: str = UNIT_CSV, building_path: Optional[str] = BUILDING_CSV,
+                            snapshot_dir: str = INVENTORY_SNAPSHOT_DIR) -> pd.DataFrame:
+    return _from_arrow(snapshot_table(unit_path, building_path, snapshot_dir))
+
+if __name__ == "__main__":
+    # python -m backend.loaders.inventory_snapshot: CSV build vs snapshot load
+    import time
+    from backend.loaders.csv_excel_loader import load_unit_data, load_building_data
+
+    t0 = time.perf_counter()
+    build_inventory(load_unit_data(), load_building_data())
+    t1 = time.perf_counter()
+    path = build_snapshot()
+    t2 = time.perf_counter()
+    df = load_inventory_snapshot()
+    t3 = time.perf_counter()
+    source_fingerprint()
+    t4 = time.perf_counter()
+    print(f"csv read + normalize + join: {(t1 - t0) * 1000:8.2f} ms")
+    print(f"snapshot build:              {(t2 - t1) * 1000:8.2f} ms  -> {path}")
+    print(f"snapshot load (mmap):        {(t3 - t2) * 1000:8.2f} ms  ({len(df)} rows)")
+    print(f"freshness check:             {(t4 - t3) * 1000:8.3f} ms")
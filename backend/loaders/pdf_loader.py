@@ -1,8 +1,79 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
 from PyPDF2 import PdfReader
 
-def load_pdf(path: str) -> str:
+# Below this many pages a process pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Upper bound on pages being extracted (or extracted and not yet consumed) at once
+PDF_MAX_PAGES_IN_FLIGHT = int(os.getenv("PDF_MAX_PAGES_IN_FLIGHT", "64"))
+
+# one pool per worker count, shared by every extraction; started on first use
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # spawn, not fork: ingestion runs on worker threads, and a forked child
+            # can inherit locks another thread was holding at the time
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+def _drop_pool(workers: int, pool: ProcessPoolExecutor):
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _extract_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    # runs in a worker process; each worker opens its own reader
     reader = PdfReader(path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+def iter_pdf_pages(path: str, workers: Optional[int] = None,
+                   max_pages_in_flight: int = PDF_MAX_PAGES_IN_FLIGHT) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page_number, text) in page order, 1-based.
+    Large documents are split into page ranges extracted on a shared process
+    pool, with at most `max_pages_in_flight` pages outstanding.
+    """
+    reader = PdfReader(path)
+    n_pages = len(reader.pages)
+    workers = PDF_WORKERS if workers is None else workers
+
+    if workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+        for i, page in enumerate(reader.pages):
+            yield i + 1, page.extract_text() or ""
+        return
+
+    per_task = max(1, max_pages_in_flight // (workers * 2))
+    max_tasks = max(1, max_pages_in_flight // per_task)
+    pool = _get_pool(workers)
+    pending = deque()
+    next_start = 0
+    try:
+        while next_start < n_pages or pending:
+            while next_start < n_pages and len(pending) < max_tasks:
+                end = min(next_start + per_task, n_pages)
+                pending.append(pool.submit(_extract_range, path, next_start, end))
+                next_start = end
+            yield from pending.popleft().result()
+    except BrokenProcessPool:
+        # a worker died; the next document gets a fresh pool
+        _drop_pool(workers, pool)
+        raise
+    finally:
+        # the pool outlives this document: don't leave its abandoned ranges queued
+        for fut in pending:
+            fut.cancel()
+
+def load_pdf(path: str) -> str:
+    return "\n".join(text for _, text in iter_pdf_pages(path))
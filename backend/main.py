@@ -18,6 +18,7 @@ except Exception:
 from backend.api import chat, upload
 from backend.api.via import router as via_router
 from backend.api.doma import router as doma_router
+from backend.api.inventory import router as inventory_router
 
 # Load env
 load_dotenv()
@@ -72,7 +73,7 @@ def startup_index_init():
                 logger.info(f"Creating Pinecone index '{index_name}' (v3 serverless)...")
                 pc.create_index(
                     name=index_name,
-                    dimension=1536,            # text-embedding-3-large
+                    dimension=1536,            # text-embedding-3-small (EMBED_MODEL)
                     metric="cosine",
                     spec=ServerlessSpec(cloud="aws", region=region),
                 )
@@ -90,11 +91,47 @@ def startup_index_init():
         logger.error(f"Pinecone init failed: {e}")
         raise
 
+# Load and index the repo inventory once, before the first /via/run
+@app.on_event("startup")
+def startup_inventory_load():
+    from backend.core.inventory_store import store
+    try:
+        logger.info(f"Inventory loaded: {store.load_default().info()}")
+    except Exception as e:
+        logger.warning(f"Default inventory not loaded: {e}")
+
+# Resume ingestion jobs interrupted by a restart
+@app.on_event("startup")
+def startup_resume_ingest_jobs():
+    from backend.core.ingest_jobs import job_queue
+    job_queue.resume()
+
+# Write queued conversation memory, then close the shared LLM gateway's connection pool
+@app.on_event("shutdown")
+def shutdown_llm_gateway():
+    from backend.core import memory_writer
+    from backend.core.llm_gateway import get_gateway
+    memory_writer.close()
+    get_gateway().close()
+
+# Push buffered events to Redis (or the spool) before exiting
+@app.on_event("shutdown")
+def shutdown_event_bus():
+    from backend.core.notifications import get_event_bus
+    get_event_bus().close(timeout=10)
+
+# Bulk-insert chat messages still queued for Supabase
+@app.on_event("shutdown")
+def shutdown_message_writer():
+    from backend.db import supabase_client
+    supabase_client.close()
+
 # Include routers
 app.include_router(chat.router)
 app.include_router(upload.router)
 app.include_router(via_router)
 app.include_router(doma_router)
+app.include_router(inventory_router)
 
 # Health
 @app.get("/")
@@ -104,3 +141,8 @@ def root():
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/health/events")
+def event_bus_stats():
+    from backend.core.notifications import get_event_bus
+    return get_event_bus().stats()
@@ -1,70 +1,38 @@
 """
 Orchestrator:
 - Accepts raw user input from Streamlit or FastAPI.
-- Logs input embedding to Pinecone (optional RAG).
-- Uses OpenAI embeddings for semantic enrichment.
 - Delegates main processing to AgentManager (OKA + ADA flow).
-- Logs response embedding for memory or search.
+- Queues input and response for background embedding into Pinecone
+  (memory for search), off the request path.
 - Returns structured final answer to the front-end.
 """
 
-import uuid
-
 # ✅ Always use absolute imports for safe Cloud deployment
 from backend.agents.agent_manager import AgentManager
-from backend.utils.pinecone_client import upsert_vector, query_vector
-from openai import OpenAI
+from backend.core.memory_writer import get_memory_writer
 
 class Orchestrator:
     def __init__(self):
         self.agent_manager = AgentManager()
-        self.client = OpenAI()
+        self.memory = get_memory_writer()
 
     def handle_chat_request(self, user_input: str) -> str:
         """
         Orchestrator Flow:
-        1. Create embedding for user input.
-        2. Store input in Pinecone (optional).
-        3. Run AgentManager (OKA → ADA if needed).
-        4. Create embedding for agent response.
-        5. Store response in Pinecone (optional).
-        6. Return final structured response.
+        1. Queue user input for memory logging (embedded + upserted in the background).
+        2. Run AgentManager (OKA → ADA if needed).
+        3. Queue the agent response for memory logging.
+        4. Return final structured response.
         """
 
-        # ✅ Step 1: Embed user query
-        embedding = self.client.embeddings.create(
-            model="text-embedding-3-large",
-            input=user_input
-        ).data[0].embedding
-
-        # ✅ Step 2: Save query embedding
-        upsert_vector(
-            vector_id=str(uuid.uuid4()),   # unique ID for this input
-            embedding=embedding,
-            metadata={
-                "type": "user_input",
-                "query": user_input
-            }
-        )
+        # ✅ Step 1: Log user query (fire-and-forget)
+        self.memory.submit(user_input, {"type": "user_input", "query": user_input})
 
-        # ✅ Step 3: Run full AgentManager flow
+        # ✅ Step 2: Run full AgentManager flow
         agent_response = self.agent_manager.handle_request(user_input)
 
-        # ✅ Step 4: Embed the agent response
-        response_embedding = self.client.embeddings.create(
-            model="text-embedding-3-large",
-            input=agent_response
-        ).data[0].embedding
-
-        # ✅ Step 5: Save response embedding
-        upsert_vector(
-            vector_id=str(uuid.uuid4()),   # unique ID for this response
-            embedding=response_embedding,
-            metadata={
-                "type": "agent_response",
-                "answer": agent_response
-            }
-        )
+        # ✅ Step 3: Log the agent response (fire-and-forget)
+        self.memory.submit(agent_response, {"type": "agent_response", "answer": agent_response})
 
-        # ✅ Step 6: Return final output
+        # ✅ Step 4: Return final output
         return agent_response
@@ -0,0 +1,116 @@
+"""
+Approximate nearest-neighbour search over a float32 matrix.
+
+Rows are expected to be L2-normalized so the dot product is cosine similarity.
+The matrix may be a np.memmap: searches read it in row blocks (exact) or only
+the rows of the probed clusters (IVF), so it never has to fit in RAM.
+"""
+
+import numpy as np
+from typing import List, Optional, Tuple
+
+SEARCH_BLOCK_ROWS = 65536
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(ids) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+def exact_search(matrix: np.ndarray, queries: np.ndarray, k: int, ids: Optional[np.ndarray] = None,
+                 mask: Optional[np.ndarray] = None, block: int = SEARCH_BLOCK_ROWS) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Brute-force top-k for each query over all rows, only the sorted row ids
+    `ids`, or the rows where the boolean `mask` is set (scanned in contiguous
+    blocks, cheaper than `ids` when most rows qualify).
+    """
+    queries = np.atleast_2d(queries)
+    n = len(matrix) if ids is None else len(ids)
+    best = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n)) if ids is None else ids[start:start + block]
+        part = np.asarray(matrix[start:start + len(rows)] if ids is None else matrix[rows])
+        scores = queries @ part.T
+        if mask is not None and ids is None:
+            keep = mask[start:start + len(rows)]
+            rows, scores = rows[keep], scores[:, keep]
+        for q in range(len(queries)):
+            best[q] = _top_k(np.concatenate([best[q][0], rows]), np.concatenate([best[q][1], scores[q]]), k)
+    return best
+
+class IVFIndex:
+    """
+    Inverted-file index: rows are clustered around `nlist` centroids (spherical
+    k-means on a sample) and a query only scans the `nprobe` closest clusters.
+    The index stores centroids and row ids grouped by cluster; vectors stay in
+    the caller's matrix.
+    """
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, list_ids: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.list_ids = list_ids
+
+    @property
+    def size(self) -> int:
+        return len(self.list_ids)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, nlist: Optional[int] = None, iters: int = 10,
+              train_per_list: int = 64, seed: int = 0, block: int = SEARCH_BLOCK_ROWS) -> "IVFIndex":
+        n = len(matrix)
+        nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, min(n, nlist * train_per_list), replace=False))
+        train = np.asarray(matrix[sample], dtype=np.float32)
+        centroids = train[rng.choice(len(train), nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            order = np.argsort(assign, kind="stable")
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)])[filled]
+            centroids[filled] = np.add.reduceat(train[order], starts, axis=0)
+            empty = np.flatnonzero(counts == 0)
+            centroids[empty] = train[rng.choice(len(train), len(empty))]
+            centroids = normalize(centroids)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, block):
+            part = np.asarray(matrix[start:start + block], dtype=np.float32)
+            assign[start:start + len(part)] = np.argmax(part @ centroids.T, axis=1)
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        return cls(centroids, offsets, list_ids)
+
+    def search(self, matrix: np.ndarray, queries: np.ndarray, k: int, nprobe: int = 8,
+               allowed: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k per query among the probed clusters; `allowed` is a boolean row mask."""
+        queries = np.atleast_2d(queries)
+        nprobe = min(nprobe, len(self.centroids))
+        cscores = queries @ self.centroids.T
+        probes = np.argpartition(-cscores, nprobe - 1, axis=1)[:, :nprobe]
+        out = []
+        for q, probe in zip(queries, probes):
+            cand = np.concatenate([self.list_ids[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+            if allowed is not None:
+                cand = cand[allowed[cand]]
+            # sorted ids read the (possibly memory-mapped) matrix front to back
+            cand = np.sort(cand)
+            out.append(_top_k(cand, np.asarray(matrix[cand]) @ q, k) if len(cand)
+                       else (cand, np.empty(0, dtype=np.float32)))
+        return out
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, offsets=self.offsets, list_ids=self.list_ids)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as z:
+            return cls(z["centroids"], z["offsets"], z["list_ids"])
@@ -0,0 +1,268 @@
+"""
+Sparse BM25 index over lease chunks, for exact-term lookups ("late fee",
+"Section 14.2") that dense similarity tends to miss.
+
+The index is split into segments per source document. Ingestion replaces
+a document's segments whenever its chunks change, so updates cost one document,
+not the corpus. A SegmentWriter builds a document's postings while its chunks
+stream past, one part of SPARSE_PART_CHUNKS chunks at a time, so a large
+spreadsheet never needs all of its chunk texts in hand at once. Each part is
+persisted as a small .npz file (term list and CSR postings with uint32 doc
+ids / uint16 term frequencies, plus the chunk ids and metadata), and cold
+start just loads the parts.
+"""
+
+import os
+import re
+import glob
+import json
+import math
+import hashlib
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+
+SPARSE_INDEX_DIR = os.getenv("SPARSE_INDEX_DIR", os.path.join(".cache", "bm25"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# chunks per segment part while a document is being written
+SPARSE_PART_CHUNKS = int(os.getenv("SPARSE_PART_CHUNKS", "2000"))
+
+# words, plus dotted numbers kept whole so "14.2" matches "Section 14.2"
+_TOKEN_RE = re.compile(r"\d+(?:\.\d+)+|\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i if in is it its my of on or our shall "
+    "that the their them there this to was we what when where which who will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+def matches_filter(metadata: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """Evaluates a Pinecone-style metadata filter against one chunk's metadata."""
+    for field, cond in (flt or {}).items():
+        if field == "$and":
+            if not all(matches_filter(metadata, c) for c in cond): return False
+            continue
+        if field == "$or":
+            if not any(matches_filter(metadata, c) for c in cond): return False
+            continue
+        value = metadata.get(field)
+        for op, arg in (cond.items() if isinstance(cond, dict) else [("$eq", cond)]):
+            if op == "$eq" and not value == arg: return False
+            if op == "$ne" and not value != arg: return False
+            if op == "$in" and value not in arg: return False
+            if op == "$nin" and value in arg: return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if not isinstance(value, (int, float)): return False
+                if op == "$gt" and not value > arg: return False
+                if op == "$gte" and not value >= arg: return False
+                if op == "$lt" and not value < arg: return False
+                if op == "$lte" and not value <= arg: return False
+    return True
+
+def _pack(strings: Iterable[str]) -> np.ndarray:
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+def _unpack(buf: np.ndarray) -> List[str]:
+    return buf.tobytes().decode("utf-8").split("\n") if len(buf) else []
+
+class _Segment:
+    """Postings for one part of a source document."""
+    def __init__(self, source: str, ids: List[str], lengths: np.ndarray, terms: List[str],
+                 offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray, metadata: List[Dict[str, Any]]):
+        self.source = source
+        self.ids = ids
+        self.lengths = lengths
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.metadata = metadata
+        self.term_row = dict(zip(terms, range(len(terms))))
+
+    @classmethod
+    def build(cls, source: str, chunks: List[Tuple[str, str, Dict[str, Any]]]) -> "_Segment":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for d, (_, text, _) in enumerate(chunks):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for t, tf in Counter(tokens).items():
+                postings.setdefault(t, []).append((d, tf))
+        terms = sorted(postings)
+        counts = [len(postings[t]) for t in terms]
+        flat = [p for t in terms for p in postings[t]]
+        return cls(
+            source,
+            [cid for cid, _, _ in chunks],
+            np.array(lengths, dtype=np.uint32),
+            terms,
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            np.array([d for d, _ in flat], dtype=np.uint32),
+            np.array([min(tf, 65535) for _, tf in flat], dtype=np.uint16),
+            [meta for _, _, meta in chunks],
+        )
+
+    def df(self) -> Dict[str, int]:
+        return dict(zip(self.terms, np.diff(self.offsets).tolist()))
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, source=_pack([self.source]), ids=_pack(self.ids), lengths=self.lengths,
+                     terms=_pack(self.terms), offsets=self.offsets, docs=self.docs, tfs=self.tfs,
+                     metadata=np.frombuffer(json.dumps(self.metadata).encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "_Segment":
+        with np.load(path) as z:
+            return cls(_unpack(z["source"])[0], _unpack(z["ids"]), z["lengths"], _unpack(z["terms"]),
+                       z["offsets"], z["docs"], z["tfs"], json.loads(z["metadata"].tobytes().decode("utf-8")))
+
+class SegmentWriter:
+    """
+    Builds a document's segment parts from chunks as they arrive; nothing is
+    visible to searches until `commit`, which swaps all parts in at once.
+    """
+    def __init__(self, index: "BM25Index", source: str, part_chunks: int = SPARSE_PART_CHUNKS):
+        self.index = index
+        self.source = source
+        self.part_chunks = max(1, part_chunks)
+        self.parts: List[_Segment] = []
+        self._pending: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    def add(self, cid: str, text: str, metadata: Dict[str, Any]):
+        self._pending.append((cid, text, metadata))
+        if len(self._pending) >= self.part_chunks:
+            self._flush()
+
+    def _flush(self):
+        if self._pending or not self.parts:
+            self.parts.append(_Segment.build(self.source, self._pending))
+            self._pending = []
+
+    def commit(self):
+        self._flush()
+        self.index._replace(self.source, self.parts)
+
+class BM25Index:
+    def __init__(self, path: str = SPARSE_INDEX_DIR, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segments: Dict[str, List[_Segment]] = {}
+        self._df: Counter = Counter()
+        self._n_docs = 0
+        self._total_len = 0
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".npz"):
+                self._add(_Segment.load(os.path.join(path, name)))
+
+    def _segment_prefix(self, source: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(source.encode("utf-8")).hexdigest()[:24])
+
+    def _segment_path(self, source: str, part: int = 0) -> str:
+        # part 0 keeps the single-segment file name of earlier indexes
+        return self._segment_prefix(source) + (f"-{part:05d}" if part else "") + ".npz"
+
+    def _segment_files(self, source: str) -> List[str]:
+        prefix = self._segment_prefix(source)
+        return glob.glob(prefix + ".npz") + glob.glob(prefix + "-*.npz")
+
+    def _add(self, seg: _Segment):
+        self._segments.setdefault(seg.source, []).append(seg)
+        self._df.update(seg.df())
+        self._n_docs += len(seg.ids)
+        self._total_len += int(seg.lengths.sum())
+
+    def _drop(self, source: str):
+        for seg in self._segments.pop(source, []):
+            self._df.subtract(seg.df())
+            for t in seg.terms:
+                if self._df[t] <= 0:
+                    del self._df[t]
+            self._n_docs -= len(seg.ids)
+            self._total_len -= int(seg.lengths.sum())
+
+    def _replace(self, source: str, parts: List[_Segment]):
+        paths = [self._segment_path(source, i) for i in range(len(parts))]
+        for seg, path in zip(parts, paths):
+            seg.save(path)
+        for stale in set(self._segment_files(source)).difference(paths):
+            os.remove(stale)
+        with self._lock:
+            self._drop(source)
+            for seg in parts:
+                self._add(seg)
+
+    def __len__(self) -> int:
+        return self._n_docs
+
+    def has_document(self, source: str) -> bool:
+        return source in self._segments
+
+    def writer(self, source: str, part_chunks: int = SPARSE_PART_CHUNKS) -> SegmentWriter:
+        """A writer that replaces the document's postings on commit."""
+        return SegmentWriter(self, source, part_chunks)
+
+    def update_document(self, source: str, chunks: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """Replaces the document's postings with `chunks` as (chunk id, text, metadata)."""
+        w = self.writer(source)
+        for cid, text, metadata in chunks:
+            w.add(cid, text, metadata)
+        w.commit()
+
+    def remove_document(self, source: str):
+        with self._lock:
+            self._drop(source)
+        for path in self._segment_files(source):
+            os.remove(path)
+
+    def search(self, query: str, top_k: int = 10, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks by BM25 score: dicts with the chunk metadata plus id and score."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            segments = [seg for parts in self._segments.values() for seg in parts]
+            n, avgdl = self._n_docs, self._total_len / max(self._n_docs, 1)
+            idf = {t: math.log(1 + (n - self._df[t] + 0.5) / (self._df[t] + 0.5)) for t in terms if self._df[t]}
+        source_cond = {"source": filter["source"]} if filter and "source" in filter else None
+        hits: List[Tuple[float, str, Dict[str, Any]]] = []
+        for seg in segments:
+            if source_cond and not matches_filter({"source": seg.source}, source_cond):
+                continue
+            scores = None
+            for t, w in idf.items():
+                row = seg.term_row.get(t)
+                if row is None:
+                    continue
+                docs = seg.docs[seg.offsets[row]:seg.offsets[row + 1]]
+                tf = seg.tfs[seg.offsets[row]:seg.offsets[row + 1]].astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * seg.lengths[docs] / avgdl)
+                if scores is None:
+                    scores = np.zeros(len(seg.ids), dtype=np.float32)
+                scores[docs] += w * tf * (self.k1 + 1) / (tf + norm)
+            if scores is None:
+                continue
+            for d in np.flatnonzero(scores):
+                if filter and not matches_filter(seg.metadata[d], filter):
+                    continue
+                hits.append((float(scores[d]), seg.ids[d], seg.metadata[d]))
+        # ties by chunk id, so the order does not depend on the order segments were loaded in
+        hits.sort(key=lambda h: (-h[0], h[1]))
+        return [{**meta, "id": cid, "score": score} for score, cid, meta in hits[:top_k]]
+
+_default_index: Optional[BM25Index] = None
+_default_lock = threading.Lock()
+
+def get_sparse_index() -> BM25Index:
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = BM25Index()
+        return _default_index
@@ -1,14 +1,260 @@
+"""
+Lease chunk retrieval.
+
+Retriever embeds queries (batched, through the embedding cache) and asks a
+vector backend for the top-k chunks, optionally restricted by metadata
+(source file, page, building). Backends:
+
+- "pinecone": the shared index via utils/pinecone_client.query_vector
+- "local":    the in-process memory-mapped store (utils/local_vector_store),
+              exact search or IVF, for offline runs and tests
+
+The backend is picked with RETRIEVER_BACKEND. Filters use Pinecone's syntax
+({"field": value} or {"field": {"$in": [...], "$gte": ...}}) on both backends.
+The index also holds conversation memory vectors, so dense queries are
+restricted to kind == RETRIEVER_KIND ("chunk", set at ingestion); set it
+empty for an index ingested before chunks were tagged. Matches without
+text are dropped either way.
+
+With hybrid retrieval on (RETRIEVER_HYBRID, the default), the dense results
+are fused with the BM25 index built at ingestion (rag/bm25.py) by reciprocal
+rank fusion, so exact clause numbers and terms are found even when cosine
+similarity ranks them low.
+"""
+
 import os
-import pinecone
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence, Union
+
+import numpy as np
+
+from backend.core.embedding_cache import embed_with_cache, aembed_with_cache
+from backend.core.llm_gateway import get_gateway
+from backend.rag.ann import normalize
+from backend.rag.bm25 import BM25Index, get_sparse_index
+from backend.utils.local_vector_store import LocalVectorStore, get_store
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "pinecone")
+RETRIEVER_TOP_K = int(os.getenv("RETRIEVER_TOP_K", "5"))
+RETRIEVER_QUERY_CONCURRENCY = int(os.getenv("RETRIEVER_QUERY_CONCURRENCY", "8"))
+RETRIEVER_HYBRID = os.getenv("RETRIEVER_HYBRID", "1") == "1"
+RETRIEVER_KIND = os.getenv("RETRIEVER_KIND", "chunk")
+# candidates taken from each ranking before fusion, and the RRF damping constant
+RETRIEVER_FUSION_DEPTH = int(os.getenv("RETRIEVER_FUSION_DEPTH", "30"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+PageFilter = Union[int, Sequence[int], Dict[str, Any]]
+
+def build_filter(source: Optional[Union[str, Sequence[str]]] = None,
+                 page: Optional[PageFilter] = None,
+                 building: Optional[Union[str, Sequence[str]]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Metadata filter for the common lease lookups. Strings/ints match exactly,
+    lists match any value, and a page dict is passed through as a range,
+    e.g. {"$gte": 3, "$lte": 7}.
+    """
+    flt = {}
+    for field, value in (("source", source), ("page", page), ("building", building)):
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            flt[field] = value
+        elif isinstance(value, (list, tuple, set)):
+            flt[field] = {"$in": list(value)}
+        else:
+            flt[field] = {"$eq": value}
+    return flt or None
+
+def _match_dict(id_: str, score: float, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {**(metadata or {}), "id": id_, "score": float(score)}
+
+class PineconeBackend:
+    name = "pinecone"
+
+    def __init__(self, concurrency: int = RETRIEVER_QUERY_CONCURRENCY):
+        from backend.utils.pinecone_client import query_vector
+        self._query_vector = query_vector
+        # Pinecone takes one vector per query request: fan a batch out concurrently
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="retrieve")
+
+    def query(self, vectors: np.ndarray, top_k: int, filter: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        def one(vec):
+            resp = self._query_vector(vec.tolist(), top_k=top_k, include_metadata=True, filter=filter)
+            matches = resp.matches if hasattr(resp, "matches") else resp["matches"]
+            return [_match_dict(m.id, m.score, m.metadata) if hasattr(m, "id")
+                    else _match_dict(m["id"], m["score"], m.get("metadata")) for m in matches]
+        return list(self._pool.map(one, vectors))
+
+class LocalANNBackend:
+    """
+    Queries the local vector store (utils/local_vector_store) directly, so a
+    whole batch of query vectors shares one pass over the memory-mapped
+    matrix: exact search, or IVF once build_ann() has run.
+    """
+    name = "local"
+
+    def __init__(self, store: Optional[LocalVectorStore] = None):
+        self.store = store if store is not None else get_store()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def add(self, ids: List[str], vectors: Sequence[Sequence[float]], metadatas: Optional[List[Dict[str, Any]]] = None):
+        metadatas = metadatas or [{} for _ in ids]
+        self.store.upsert(vectors=[{"id": i, "values": v, "metadata": m} for i, v, m in zip(ids, vectors, metadatas)])
+
+    def build_ann(self, nlist: Optional[int] = None):
+        return self.store.build_ann(nlist=nlist)
 
+    def query(self, vectors: np.ndarray, top_k: int, filter: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        return [[_match_dict(m["id"], m["score"], m.get("metadata")) for m in matches]
+                for matches in self.store.query_many(vectors, top_k, filter)]
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict[str, Any]]], top_k: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuses ranked result lists by id: score = sum of 1 / (k + rank) over the
+    lists an item appears in. Each result records its rank in every list.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for name, results in rankings.items():
+        for rank, r in enumerate(results, start=1):
+            item = fused.setdefault(r["id"], {**r, "score": 0.0, "ranks": {}})
+            item["score"] += 1.0 / (k + rank)
+            item["ranks"][name] = rank
+    return sorted(fused.values(), key=lambda r: -r["score"])[:top_k]
+
+def make_backend(name: str = RETRIEVER_BACKEND):
+    if name == "pinecone":
+        return PineconeBackend()
+    if name == "local":
+        return LocalANNBackend()
+    raise ValueError(f"Unknown retriever backend '{name}'")
 
 class Retriever:
-    def __init__(self):
-        # ✅ Initialize your vector store connection here (e.g., Pinecone, Weaviate)
-        # For now, fake data
-        pass
-
-    def get_context(self, query: str) -> str:
-        # ✅ Replace with real similarity search
-        # For this example: return a dummy context
-        return f"Fake context related to '{query}'"
+    def __init__(self, backend=None, top_k: int = RETRIEVER_TOP_K, client=None, embed_model: str = EMBED_MODEL,
+                 hybrid: bool = RETRIEVER_HYBRID, sparse: Optional[BM25Index] = None, aclient=None,
+                 kind: Optional[str] = RETRIEVER_KIND):
+        self.backend = backend or make_backend()
+        self.top_k = top_k
+        self.embed_model = embed_model
+        self.client = client or get_gateway().client
+        self.aclient = aclient or get_gateway().aclient
+        self.hybrid = hybrid
+        self.sparse = sparse if sparse is not None else (get_sparse_index() if hybrid else None)
+        self.kind = kind
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """One embeddings request for every uncached query in the batch."""
+        return np.asarray(embed_with_cache(self.client, queries, self.embed_model), dtype=np.float32)
+
+    def retrieve_many(self, queries: List[str], top_k: Optional[int] = None,
+                      filter: Optional[Dict[str, Any]] = None, **filter_fields) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k chunks for each query: dicts with the chunk metadata (text,
+        source, page, ...) plus id and score. `source`, `page` and `building`
+        keyword arguments are shorthands merged into `filter` (see build_filter).
+        In hybrid mode the score is the RRF score and `ranks` gives the
+        chunk's dense/sparse rank.
+        """
+        if not queries:
+            return []
+        return self._search(queries, self.embed_queries(queries), top_k, filter, filter_fields)
+
+    async def aretrieve_many(self, queries: List[str], top_k: Optional[int] = None,
+                             filter: Optional[Dict[str, Any]] = None, **filter_fields) -> List[List[Dict[str, Any]]]:
+        """retrieve_many for async endpoints: awaits the embeddings, searches off the event loop."""
+        if not queries:
+            return []
+        vectors = np.asarray(await aembed_with_cache(self.aclient, queries, self.embed_model), dtype=np.float32)
+        return await asyncio.to_thread(self._search, queries, vectors, top_k, filter, filter_fields)
+
+    def _search(self, queries: List[str], vectors: np.ndarray, top_k: Optional[int],
+                filter: Optional[Dict[str, Any]], filter_fields: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        top_k = top_k or self.top_k
+        flt = {**(filter or {}), **(build_filter(**filter_fields) or {})} or None
+        if not self.hybrid or self.sparse is None or not len(self.sparse):
+            return self._dense(vectors, top_k, flt)
+        depth = max(top_k, RETRIEVER_FUSION_DEPTH)
+        dense = self._dense(vectors, depth, flt)
+        return [reciprocal_rank_fusion({"dense": d, "sparse": self.sparse.search(q, depth, flt)}, top_k)
+                for q, d in zip(queries, dense)]
+
+    def _dense(self, vectors: np.ndarray, top_k: int, flt: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        # the sparse index only ever holds ingested chunks; the vector index holds memory records too
+        if self.kind:
+            flt = {**(flt or {}), "kind": {"$eq": self.kind}}
+        return [[m for m in matches if m.get("text")] for matches in self.backend.query(vectors, top_k, flt)]
+
+    def retrieve(self, query: str, top_k: Optional[int] = None,
+                 filter: Optional[Dict[str, Any]] = None, **filter_fields) -> List[Dict[str, Any]]:
+        return self.retrieve_many([query], top_k, filter, **filter_fields)[0]
+
+    async def aretrieve(self, query: str, top_k: Optional[int] = None,
+                        filter: Optional[Dict[str, Any]] = None, **filter_fields) -> List[Dict[str, Any]]:
+        return (await self.aretrieve_many([query], top_k, filter, **filter_fields))[0]
+
+    def get_context(self, query: str, **kwargs) -> str:
+        return "\n\n".join(f"[{c.get('source', 'doc')} p{c.get('page', '?')}] {c.get('text', '')}"
+                           for c in self.retrieve(query, **kwargs))
+
+def latency_percentiles(search, queries: np.ndarray, warmup: int = 5) -> Dict[str, float]:
+    """Runs search(vector) once per query and reports latency percentiles in ms."""
+    for q in queries[:warmup]:
+        search(q)
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        search(q)
+        times.append((time.perf_counter() - t0) * 1000)
+    p50, p95, p99 = np.percentile(times, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3), "queries": len(times)}
+
+# Benchmark: python -m backend.rag.retriever [rows] [dim] [--pinecone]
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 100_000
+    dim = int(args[1]) if len(args) > 1 else 256
+    k, n_queries = 5, 200
+
+    # clustered synthetic vectors, so IVF recall is meaningful
+    rng = np.random.default_rng(0)
+    centers = normalize(rng.standard_normal((256, dim)))
+    labels = rng.integers(0, len(centers), n)
+    noise = lambda rows: 1.2 * rng.standard_normal((rows, dim)).astype(np.float32) / np.sqrt(dim)
+    data = normalize(centers[labels] + noise(n))
+    queries = normalize(centers[rng.integers(0, len(centers), n_queries)] + noise(n_queries))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local = LocalANNBackend(LocalVectorStore(tmp))
+        meta = [{"source": f"lease_{i % 500}.pdf", "page": i % 40 + 1, "building": f"B{i % 20}"} for i in range(n)]
+        t0 = time.perf_counter()
+        for s in range(0, n, 50_000):
+            local.add([str(i) for i in range(s, min(s + 50_000, n))], data[s:s + 50_000], meta[s:s + 50_000])
+        print(f"{n:,} x {dim}d vectors appended in {time.perf_counter() - t0:.2f}s")
+
+        truth = [set(m["id"] for m in local.query(q, k)[0]) for q in queries]
+        exact = latency_percentiles(lambda q: local.query(q, k), queries)
+        t0 = time.perf_counter()
+        local.build_ann()
+        t_build = time.perf_counter() - t0
+        ann = latency_percentiles(lambda q: local.query(q, k), queries)
+        recall = np.mean([len(truth[i] & set(m["id"] for m in local.query(q, k)[0])) / k for i, q in enumerate(queries)])
+        flt = build_filter(building="B3", page={"$lte": 10})
+        filtered = latency_percentiles(lambda q: local.query(q, k, flt), queries)
+
+        print(f"local exact      {exact}")
+        print(f"local ivf        {ann}  recall@{k} {recall:.3f}  (build {t_build:.2f}s, "
+              f"nlist {len(local.store.ivf.centroids)}, nprobe {local.store.nprobe})")
+        print(f"local filtered   {filtered}  (building=B3, page<=10)")
+
+    if "--pinecone" in sys.argv:
+        pine = PineconeBackend()
+        vecs = normalize(rng.standard_normal((50, 1536)))
+        print(f"pinecone         {latency_percentiles(lambda q: pine.query(q[None], k), vecs)}")
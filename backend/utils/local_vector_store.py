@@ -0,0 +1,337 @@
+"""
+Local vector store with the Pinecone index surface (upsert/query/delete/fetch).
+
+Set VECTOR_STORE=local to use it in place of Pinecone for offline runs and
+load tests. Layout under VECTOR_STORE_PATH:
+
+- vectors.f32   append-only float32 rows, memory-mapped for search
+- rows.sqlite   side table: id -> row offset + JSON metadata
+- ivf.npz       optional ANN index (build_ann), see rag/ann.py
+
+An upsert appends new rows and repoints the ids, so a replaced or deleted row
+becomes dead space until compact(). Vectors are stored L2-normalized (cosine
+metric), so fetch returns unit vectors. Search is a blocked NumPy matmul over
+the live rows, or IVF once built; metadata filters use Pinecone's syntax and
+run as SQL over the side table.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.rag.ann import IVFIndex, exact_search, normalize
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(".cache", "vector_store"))
+VECTOR_STORE_NPROBE = int(os.getenv("VECTOR_STORE_NPROBE", "8"))
+# Metadata fields with an SQL expression index, so filters on them skip the table scan
+VECTOR_STORE_INDEXED_FIELDS = [f for f in os.getenv("VECTOR_STORE_INDEXED_FIELDS", "source,page,building").split(",") if f]
+# A filter matching at most this many rows is answered exactly from the matching rows
+VECTOR_STORE_EXACT_MAX_ROWS = int(os.getenv("VECTOR_STORE_EXACT_MAX_ROWS", "20000"))
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+class _Response(dict):
+    """Dict with attribute access, like the Pinecone client's response objects."""
+    def __getattribute__(self, name):
+        # keys win over dict methods: a fetched vector's `.values` is its values, not dict.values
+        try:
+            return dict.__getitem__(self, name)
+        except KeyError:
+            return dict.__getattribute__(self, name)
+
+def _field_expr(field: str) -> str:
+    if not _FIELD_RE.match(field):
+        raise ValueError(f"Unsupported metadata field name '{field}'")
+    # literal path (not a bound parameter) so expression indexes can be used
+    return f"json_extract(metadata, '$.{field}')"
+
+def _filter_sql(flt: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    for field, cond in flt.items():
+        if field in ("$and", "$or"):
+            parts = [_filter_sql(c) for c in cond]
+            clauses.append("(" + f" {field[1:].upper()} ".join(p[0] for p in parts) + ")")
+            params += [v for p in parts for v in p[1]]
+            continue
+        col = _field_expr(field)
+        for op, arg in (cond.items() if isinstance(cond, dict) else [("$eq", cond)]):
+            if op in ("$in", "$nin"):
+                marks = ",".join("?" * len(arg)) or "NULL"
+                clauses.append(f"{col} {'NOT IN' if op == '$nin' else 'IN'} ({marks})")
+                params += list(arg)
+            elif op in _OPS:
+                clauses.append(f"{col} {_OPS[op]} ?")
+                params.append(arg)
+            else:
+                raise ValueError(f"Unsupported filter operator '{op}'")
+    return " AND ".join(clauses) or "1", params
+
+def _parse_vectors(vectors) -> Tuple[List[str], List[Sequence[float]], List[Dict[str, Any]]]:
+    # Pinecone accepts dicts or (id, values[, metadata]) tuples; last write of an id wins
+    latest: Dict[str, Tuple[Sequence[float], Dict[str, Any]]] = {}
+    for v in vectors:
+        if isinstance(v, dict):
+            latest[str(v["id"])] = (v["values"], v.get("metadata") or {})
+        else:
+            latest[str(v[0])] = (v[1], v[2] if len(v) > 2 else {})
+    return list(latest), [v for v, _ in latest.values()], [m for _, m in latest.values()]
+
+class LocalVectorStore:
+    def __init__(self, path: str = VECTOR_STORE_PATH, nprobe: int = VECTOR_STORE_NPROBE):
+        self.path = path
+        self.nprobe = nprobe
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._ivf_path = os.path.join(path, "ivf.npz")
+        self._conn = sqlite3.connect(os.path.join(path, "rows.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, metadata TEXT NOT NULL)"
+        )
+        for field in VECTOR_STORE_INDEXED_FIELDS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_rows_{field} ON rows({_field_expr(field)})")
+        self._conn.commit()
+
+        dim = self._conn.execute("SELECT value FROM settings WHERE key='dim'").fetchone()
+        self.dim: Optional[int] = int(dim[0]) if dim else None
+        # rows past the last committed upsert (a crash mid-write) are simply never live
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        self._rows = size // (4 * self.dim) if self.dim else 0
+        if self.dim and size % (4 * self.dim):
+            # drop a torn trailing row so appends stay aligned
+            os.truncate(self._vectors_path, self._rows * 4 * self.dim)
+        live = np.fromiter((r for (r,) in self._conn.execute("SELECT row FROM rows")), dtype=np.int64)
+        self._live = np.zeros(max(self._rows, 1024), dtype=bool)
+        self._live[live] = True
+        self._count = len(live)
+        self._matrix = None
+        # filter -> matching rows, valid until the next write
+        self._filter_cache: Dict[str, np.ndarray] = {}
+        self.ivf = IVFIndex.load(self._ivf_path) if os.path.exists(self._ivf_path) else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None or len(self._matrix) != self._rows:
+            self._matrix = (np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+                            if self._rows else np.empty((0, self.dim or 0), dtype=np.float32))
+        return self._matrix
+
+    def _rows_for_ids(self, ids: List[str]) -> Dict[str, int]:
+        found = {}
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            marks = ",".join("?" * len(part))
+            found.update(self._conn.execute(f"SELECT id, row FROM rows WHERE id IN ({marks})", part).fetchall())
+        return found
+
+    # ---- Pinecone index surface ----
+    def upsert(self, vectors, namespace: Optional[str] = None, **_) -> Dict[str, int]:
+        ids, values, metadatas = _parse_vectors(vectors)
+        if not ids:
+            return {"upserted_count": 0}
+        mat = normalize(np.asarray(values, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = mat.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO settings(key, value) VALUES ('dim', ?)", (str(self.dim),))
+            if mat.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {mat.shape[1]} does not match index dimension {self.dim}")
+            start = self._rows
+            with open(self._vectors_path, "ab") as f:
+                f.write(mat.tobytes())
+            old = self._rows_for_ids(ids)
+            self._conn.executemany(
+                "INSERT INTO rows(id, row, metadata) VALUES (?,?,?) "
+                "ON CONFLICT(id) DO UPDATE SET row=excluded.row, metadata=excluded.metadata",
+                [(i, start + k, json.dumps(m)) for k, (i, m) in enumerate(zip(ids, metadatas))],
+            )
+            self._conn.commit()
+            self._filter_cache.clear()
+            self._rows += len(ids)
+            if self._rows > len(self._live):
+                self._live = np.concatenate([self._live, np.zeros(max(self._rows, len(self._live)), dtype=bool)])
+            self._live[list(old.values())] = False
+            self._live[start:self._rows] = True
+            self._count += len(ids) - len(old)
+        return {"upserted_count": len(ids)}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False,
+               namespace: Optional[str] = None, filter: Optional[Dict[str, Any]] = None, **_) -> Dict[str, Any]:
+        with self._lock:
+            if delete_all:
+                self._conn.execute("DELETE FROM rows")
+                self._conn.commit()
+                self._filter_cache.clear()
+                self._live[:] = False
+                self._count = 0
+                return {}
+            if filter:
+                where, params = _filter_sql(filter)
+                ids = [i for (i,) in self._conn.execute(f"SELECT id FROM rows WHERE {where}", params)]
+            old = self._rows_for_ids([str(i) for i in ids or []])
+            self._conn.executemany("DELETE FROM rows WHERE id=?", [(i,) for i in old])
+            self._conn.commit()
+            self._filter_cache.clear()
+            self._live[list(old.values())] = False
+            self._count -= len(old)
+        return {}
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None, **_) -> "_Response":
+        ids = [str(i) for i in ids]
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                marks = ",".join("?" * len(part))
+                found.update({i: (r, m) for i, r, m in self._conn.execute(
+                    f"SELECT id, row, metadata FROM rows WHERE id IN ({marks})", part)})
+            matrix = self.matrix
+        return _Response(vectors={i: _Response(id=i, values=matrix[r].tolist(), metadata=json.loads(m))
+                                  for i, (r, m) in found.items()}, namespace=namespace or "")
+
+    def query(self, vector: Optional[Sequence[float]] = None, top_k: int = 10, include_metadata: bool = False,
+              include_values: bool = False, filter: Optional[Dict[str, Any]] = None,
+              namespace: Optional[str] = None, id: Optional[str] = None, **_) -> "_Response":
+        if vector is None:
+            vector = self.fetch([id]).vectors[id].values
+        matches = self.query_many([vector], top_k, filter, include_metadata, include_values)[0]
+        return _Response(matches=matches, namespace=namespace or "")
+
+    def describe_index_stats(self, **_) -> "_Response":
+        return _Response(dimension=self.dim or 0, total_vector_count=self._count,
+                         namespaces={"": {"vector_count": self._count}},
+                         stored_rows=self._rows, ann=self.ivf is not None)
+
+    # ---- batch search and maintenance ----
+    def query_many(self, vectors: Sequence[Sequence[float]], top_k: int = 10, filter: Optional[Dict[str, Any]] = None,
+                   include_metadata: bool = True, include_values: bool = False) -> List[List["_Response"]]:
+        """One list of matches per query vector, sharing a single pass over the matrix."""
+        if not self._rows:
+            return [[] for _ in vectors]
+        queries = normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        allowed = None
+        with self._lock:
+            matrix, n = self.matrix, self._rows
+            live = self._live[:n].copy()
+            ivf = self.ivf
+            if filter:
+                key = json.dumps(filter, sort_keys=True, default=str)
+                allowed = self._filter_cache.get(key)
+                if allowed is None:
+                    where, params = _filter_sql(filter)
+                    allowed = np.sort(np.fromiter((r for (r,) in self._conn.execute(
+                        f"SELECT row FROM rows WHERE {where}", params)), dtype=np.int64))
+                    if len(self._filter_cache) >= 256:
+                        self._filter_cache.clear()
+                    self._filter_cache[key] = allowed
+        if allowed is not None and (ivf is None or len(allowed) <= VECTOR_STORE_EXACT_MAX_ROWS):
+            results = exact_search(matrix, queries, top_k, ids=allowed)
+        else:
+            # without dead rows or a filter every row qualifies
+            mask = live if self._count < n else None
+            if allowed is not None:
+                mask = np.zeros(n, dtype=bool)
+                mask[allowed] = True
+            if ivf is None:
+                results = exact_search(matrix, queries, top_k, mask=mask)
+            else:
+                results = ivf.search(matrix, queries, top_k, nprobe=self.nprobe, allowed=mask)
+                if n > ivf.size:
+                    # rows appended since the index was built
+                    tail = exact_search(matrix[ivf.size:], queries, top_k,
+                                        mask=None if mask is None else mask[ivf.size:])
+                    results = [_merge(a, (b[0] + ivf.size, b[1]), top_k) for a, b in zip(results, tail)]
+        return self._resolve(results, include_metadata, include_values)
+
+    def _resolve(self, results, include_metadata: bool, include_values: bool) -> List[List["_Response"]]:
+        rows = sorted({int(r) for ids, _ in results for r in ids})
+        by_row = {}
+        with self._lock:
+            for start in range(0, len(rows), 500):
+                part = rows[start:start + 500]
+                marks = ",".join("?" * len(part))
+                by_row.update({r: (i, m) for r, i, m in self._conn.execute(
+                    f"SELECT row, id, metadata FROM rows WHERE row IN ({marks})", part)})
+            matrix = self.matrix
+        out = []
+        for ids, scores in results:
+            matches = []
+            for r, s in zip(ids, scores):
+                if int(r) not in by_row:
+                    continue  # replaced or deleted while the search ran
+                i, m = by_row[int(r)]
+                match = _Response(id=i, score=float(s))
+                if include_metadata:
+                    match["metadata"] = json.loads(m)
+                if include_values:
+                    match["values"] = matrix[r].tolist()
+                matches.append(match)
+            out.append(matches)
+        return out
+
+    def build_ann(self, nlist: Optional[int] = None) -> IVFIndex:
+        """Trains the IVF index over the stored rows and persists it."""
+        with self._lock:
+            matrix = self.matrix
+        # rows appended while training are covered by the exact tail search
+        ivf = IVFIndex.build(matrix, nlist=nlist)
+        with self._lock:
+            ivf.save(self._ivf_path)
+            self.ivf = ivf
+        return ivf
+
+    def compact(self) -> int:
+        """Rewrites the vector file without dead rows; returns rows reclaimed. Drops the ANN index."""
+        with self._lock:
+            live = np.flatnonzero(self._live[:self._rows])
+            reclaimed = self._rows - len(live)
+            tmp = self._vectors_path + ".tmp"
+            matrix = self.matrix
+            with open(tmp, "wb") as f:
+                for start in range(0, len(live), 65536):
+                    f.write(np.asarray(matrix[live[start:start + 65536]]).tobytes())
+            new_row = {int(r): k for k, r in enumerate(live)}
+            # two passes keep row numbers unique while they are reassigned
+            self._conn.execute("UPDATE rows SET row = -row - 1")
+            self._conn.executemany("UPDATE rows SET row=? WHERE row=?", [(k, -r - 1) for r, k in new_row.items()])
+            self._matrix = None
+            os.replace(tmp, self._vectors_path)
+            self._conn.commit()
+            self._filter_cache.clear()
+            self._rows = len(live)
+            self._live = np.zeros(max(self._rows, 1024), dtype=bool)
+            self._live[:self._rows] = True
+            self.ivf = None
+            if os.path.exists(self._ivf_path):
+                os.remove(self._ivf_path)
+        return reclaimed
+
+def _merge(a, b, k: int):
+    ids, scores = np.concatenate([a[0], b[0]]), np.concatenate([a[1], b[1]])
+    order = np.argsort(-scores, kind="stable")[:k]
+    return ids[order], scores[order]
+
+_default_store: Optional[LocalVectorStore] = None
+_default_lock = threading.Lock()
+
+def get_store() -> LocalVectorStore:
+    # one instance per process: the live-row mask and row count are held in memory
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = LocalVectorStore()
+        return _default_store
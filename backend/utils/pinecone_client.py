@@ -1,29 +1,35 @@
-import pinecone
-import streamlit as st
-
-# ✅ Load secrets from Streamlit Cloud
-PINECONE_API_KEY = st.secrets["PINECONE_API_KEY"]
-PINECONE_INDEX = st.secrets["PINECONE_INDEX"]
-
-# ✅ Init Pinecone client (v3)
-pc = pinecone.Pinecone(api_key=PINECONE_API_KEY)
-
-# ✅ Check if index exists or create it
-existing_indexes = [index.name for index in pc.list_indexes()]
-
-if PINECONE_INDEX not in existing_indexes:
-    pc.create_index(
-        name=PINECONE_INDEX,
-        dimension=1536,     # Make sure this matches your embeddings dimension!
-        metric="cosine",
-        spec=pinecone.ServerlessSpec(
-            cloud="aws",
-            region="us-east-1"
+from backend.utils.local_vector_store import VECTOR_STORE, get_store
+
+if VECTOR_STORE == "local":
+    # ✅ Offline: same index surface on a local memory-mapped store
+    index = get_store()
+else:
+    import pinecone
+    import streamlit as st
+
+    # ✅ Load secrets from Streamlit Cloud
+    PINECONE_API_KEY = st.secrets["PINECONE_API_KEY"]
+    PINECONE_INDEX = st.secrets["PINECONE_INDEX"]
+
+    # ✅ Init Pinecone client (v3)
+    pc = pinecone.Pinecone(api_key=PINECONE_API_KEY)
+
+    # ✅ Check if index exists or create it
+    existing_indexes = [index.name for index in pc.list_indexes()]
+
+    if PINECONE_INDEX not in existing_indexes:
+        pc.create_index(
+            name=PINECONE_INDEX,
+            dimension=1536,     # Make sure this matches your embeddings dimension!
+            metric="cosine",
+            spec=pinecone.ServerlessSpec(
+                cloud="aws",
+                region="us-east-1"
+            )
         )
-    )
 
-# ✅ Connect to the index
-index = pc.Index(PINECONE_INDEX)
+    # ✅ Connect to the index
+    index = pc.Index(PINECONE_INDEX)
 
 # ✅ Function to upsert a vector
 def upsert_vector(vector_id: str, embedding: list[float], metadata: dict = None):
@@ -37,14 +43,23 @@ def upsert_vector(vector_id: str, embedding: list[float], metadata: dict = None)
     }]
     index.upsert(vectors=vectors)
 
+# ✅ Function to upsert many vectors in one request
+def upsert_vectors(vectors: list[dict]):
+    """
+    Upserts a batch of {"id", "values", "metadata"} vectors into Pinecone.
+    """
+    if vectors:
+        index.upsert(vectors=vectors)
+
 # ✅ Function to query a vector
-def query_vector(embedding: list[float], top_k: int = 5, include_metadata: bool = True):
+def query_vector(embedding: list[float], top_k: int = 5, include_metadata: bool = True, filter: dict = None):
     """
-    Queries Pinecone for the most similar vectors.
+    Queries Pinecone for the most similar vectors, optionally restricted by a metadata filter.
     """
     response = index.query(
         vector=embedding,
         top_k=top_k,
-        include_metadata=include_metadata
+        include_metadata=include_metadata,
+        filter=filter
     )
     return response
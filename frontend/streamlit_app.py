@@ -10,6 +10,12 @@ from openai import OpenAI
 # Make local imports possible
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from backend.agents.via.inventory_index import InventoryIndex
+from backend.agents.doma.service_triage_agent import ServiceTriageAgent
+from backend.loaders.inventory_snapshot import load_inventory_snapshot, source_fingerprint
+from backend.loaders.csv_excel_loader import build_inventory, inventory_records as inventory_records_of
+from backend.core.conversation_memory import ConversationMemory
+
 client = OpenAI()
 
 # ---------------------- Page ----------------------
@@ -37,6 +43,10 @@ def ss_get(key, default):
     return st.session_state[key]
 
 messages: List[Dict[str, str]] = ss_get("messages", [])
+# bounded prompt context for the chat: rolling summary + recent turns (the transcript above is display only)
+if "memory" not in st.session_state:  # not via ss_get: that would build a throwaway instance every rerun
+    st.session_state["memory"] = ConversationMemory(client=client)
+memory: ConversationMemory = st.session_state["memory"]
 mode: str = ss_get("mode", "VIA")
 inventory_df: Optional[pd.DataFrame] = ss_get("inventory_df", None)
 last_structured: Dict[str, Any] = ss_get("last_structured", {})
@@ -58,124 +68,23 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# ===================== Utilities =====================
-
-def _to_num(x):
-    if pd.isna(x): return None
-    if isinstance(x, (int, float)): return float(x)
-    s = str(x).lower().replace("$","").replace(",","").replace("sqft","").replace("/sf/yr","").replace("/sf/year","").strip()
-    try: return float(s)
-    except: return None
-
-def _to_list(v):
-    if isinstance(v, list): return v
-    if pd.isna(v): return []
-    try: return json.loads(v)
-    except: return [a.strip() for a in str(v).replace(";", ",").split(",") if a.strip()]
-
-def _bool_from_text(x):
-    s = str(x).lower()
-    return any(k in s for k in ["yes","true","1","allow","pet","friendly"])
-
 # ---------------------- Repo loaders ----------------------
-def _normalize_buildings(df_b: pd.DataFrame) -> pd.DataFrame:
-    colmap = {
-        "building_id":"building_id","Building ID":"building_id","ID":"building_id",
-        "Property Address":"address","Address":"address","Building Address":"address",
-        "Neighborhood":"neighborhood","Area":"neighborhood","Borough":"neighborhood",
-        "Transit":"transit","Near Transit":"transit",
-        "Pets":"pets","Pet Friendly":"pets",
-    }
-    df = df_b.rename(columns={k:v for k,v in colmap.items() if k in df_b.columns}).copy()
-
-    # required columns
-    if "building_id" not in df.columns:
-        df["building_id"] = df.index.astype(str)
-    if "address" not in df.columns:
-        df["address"] = ""
-    if "neighborhood" not in df.columns:
-        df["neighborhood"] = ""
-
-    # near_transit: only compute if column exists; otherwise False
-    if "transit" in df.columns:
-        df["near_transit"] = df["transit"].astype(str).str.len().gt(0)
-    else:
-        df["near_transit"] = False
-
-    # pet_friendly: only compute if column exists; otherwise False
-    def _bool_from_text(x):
-        s = str(x).lower()
-        return any(k in s for k in ["yes", "true", "1", "allow", "pet", "friendly"])
-
-    if "pets" in df.columns:
-        df["pet_friendly"] = df["pets"].apply(_bool_from_text)
-    else:
-        df["pet_friendly"] = False
-
-    return df[["building_id", "address", "neighborhood", "near_transit", "pet_friendly"]]
-def _normalize_units(df_u: pd.DataFrame) -> pd.DataFrame:
-    colmap = {
-        "Unit ID":"unit_id","unique_id":"unit_id","ID":"unit_id","id":"unit_id",
-        "building_id":"building_id","Building ID":"building_id",
-        "Monthly Rent":"rent","Rent":"rent","Price":"rent","Asking Rent":"rent","Annual Rent":"annual_rent",
-        "Square Feet":"sqft","SQFT":"sqft","Size (SF)":"sqft","Size":"sqft",
-        "Floor":"floor","Suite":"suite","Unit":"suite",
-        "Amenities":"amenities","Amenity":"amenities",
-        "Rent/SF/Year":"ppsf_year","$PSF/Yr":"ppsf_year","$/SF/Yr":"ppsf_year",
-        "Property Address":"address","Address":"address"
-    }
-    df = df_u.rename(columns={k:v for k,v in colmap.items() if k in df_u.columns}).copy()
-    if "unit_id" not in df.columns: df["unit_id"] = df.index.astype(str)
-    for c in ("rent","sqft","ppsf_year","annual_rent"):
-        if c in df.columns: df[c] = df[c].apply(_to_num)
-    if "amenities" in df.columns: df["amenities"] = df["amenities"].apply(_to_list)
-    else: df["amenities"] = [[] for _ in range(len(df))]
-    # derive rent if missing
-    if set(["rent","ppsf_year","sqft"]).issubset(df.columns):
-        need = df["rent"].isna() & df["ppsf_year"].notna() & df["sqft"].notna()
-        df.loc[need, "rent"] = (df["ppsf_year"] * df["sqft"] / 12.0).round(0)
-    if "annual_rent" in df.columns and "rent" in df.columns:
-        need = df["rent"].isna() & df["annual_rent"].notna()
-        df.loc[need, "rent"] = (df["annual_rent"] / 12.0).round(0)
-    return df
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _repo_inventory(fingerprint: str) -> Tuple[pd.DataFrame, List[Dict[str, Any]], InventoryIndex]:
+    # one copy per source-file fingerprint, shared by every session and rerun
+    df = load_inventory_snapshot()
+    rows = inventory_records_of(df)
+    return df, rows, InventoryIndex(rows, text_fields=("neighborhood","address"))
 
 def load_inventory_from_repo() -> pd.DataFrame:
-    b_path = os.path.join(os.path.dirname(__file__), "..", "temp_files", "building_data.csv")
-    u_path = os.path.join(os.path.dirname(__file__), "..", "temp_files", "unit_data.csv")
     try:
-        bdf = pd.read_csv(b_path)
-        udf = pd.read_csv(u_path)
+        bundle = _repo_inventory(source_fingerprint())
     except Exception as e:
         st.error(f"Could not read repo datasets: {e}")
         return pd.DataFrame()
-
-    B = _normalize_buildings(bdf)
-    U = _normalize_units(udf)
-
-    # primary join on building_id; fallback to address
-    if "building_id" in U.columns and "building_id" in B.columns:
-        M = U.merge(B, on="building_id", how="left", suffixes=("","_b"))
-    elif "address" in U.columns and "address" in B.columns:
-        M = U.merge(B, on="address", how="left", suffixes=("","_b"))
-    else:
-        M = U.copy()
-        for c in ["neighborhood","near_transit","pet_friendly"]:
-            if c not in M.columns:
-                M[c] = "" if c=="neighborhood" else False
-
-    M["id"] = M["unit_id"].astype(str)
-
-    if "ppsf_year" not in M.columns:
-        M["ppsf_year"] = None
-    need_ppsf = M["ppsf_year"].isna() & M["rent"].notna() & M["sqft"].notna()
-    M.loc[need_ppsf, "ppsf_year"] = (M["rent"]*12.0/M["sqft"]).round(2)
-
-    keep = ["id","address","neighborhood","sqft","rent","ppsf_year","floor","suite",
-            "amenities","near_transit","pet_friendly"]
-    for k in keep:
-        if k not in M.columns:
-            M[k] = None if k not in ("amenities","near_transit","pet_friendly") else ([] if k=="amenities" else False)
-    return M[keep]
+    # prime the per-session records/index cache with the shared copies
+    st.session_state["inventory_index"] = bundle
+    return bundle[0]
 
 # ---------------------- Sidebar ----------------------
 with st.sidebar:
@@ -208,27 +117,9 @@ with st.sidebar:
                 raw_df = pd.read_csv(up)
                 # try unit-shaped first
                 if any(c in raw_df.columns for c in ["Unit ID","unique_id","Size (SF)","SQFT","Rent","Monthly Rent"]):
-                    inv = _normalize_units(raw_df)
-                    # try to enrich with repo building file
+                    # enrich with the repo building file when there is one
                     b_repo = os.path.join(os.path.dirname(__file__), "..", "temp_files", "building_data.csv")
-                    if os.path.exists(b_repo):
-                        B = _normalize_buildings(pd.read_csv(b_repo))
-                        if "building_id" in inv.columns and "building_id" in B.columns:
-                            inv = inv.merge(B, on="building_id", how="left")
-                    # finalize
-                    if "address" not in inv.columns: inv["address"] = ""
-                    if "neighborhood" not in inv.columns: inv["neighborhood"] = ""
-                    if "near_transit" not in inv.columns: inv["near_transit"] = False
-                    if "pet_friendly" not in inv.columns: inv["pet_friendly"] = False
-                    inv["id"] = inv["unit_id"].astype(str)
-                    if "ppsf_year" not in inv.columns: inv["ppsf_year"] = None
-                    need_ppsf = inv["ppsf_year"].isna() & inv["rent"].notna() & inv["sqft"].notna()
-                    inv.loc[need_ppsf, "ppsf_year"] = (inv["rent"]*12.0/inv["sqft"]).round(2)
-                    keep = ["id","address","neighborhood","sqft","rent","ppsf_year","floor","suite","amenities","near_transit","pet_friendly"]
-                    for k in keep:
-                        if k not in inv.columns:
-                            inv[k] = None if k not in ("amenities","near_transit","pet_friendly") else ([] if k=="amenities" else False)
-                    inventory_df = inv[keep]
+                    inventory_df = build_inventory(raw_df, pd.read_csv(b_repo) if os.path.exists(b_repo) else None)
                 else:
                     # treat as already combined
                     inventory_df = raw_df
@@ -376,17 +267,37 @@ def _score_row(row: Dict[str,Any], spec: Dict[str,Any]) -> Tuple[float,List[str]
     return max(0.0, min(100.0, s)), reasons[:3]
 
 class MatchRankAgent:
-    def __init__(self, rows: List[Dict[str, Any]]): self.rows = rows
+    def __init__(self, rows: List[Dict[str, Any]], index: Optional[InventoryIndex] = None):
+        self.rows = rows
+        self.index = index or InventoryIndex(rows, text_fields=("neighborhood","address"))
+
+    def _candidates(self, spec: Dict[str, Any]):
+        # union of index postings for every rule in _score_row; rows outside it score 0
+        idx = self.index; parts = []
+        if spec.get("min_sqft"): parts.append(idx.range("sqft", lo=spec["min_sqft"]))
+        if spec.get("max_sqft"): parts.append(idx.range("sqft", hi=spec["max_sqft"]))
+        hi = (spec.get("budget_monthly_usd") or {}).get("max")
+        if hi is not None: parts.append(idx.range("rent", hi=hi))
+        if spec.get("location"): parts.append(idx.location(spec["location"]))
+        musts = " ".join(m.lower() for m in spec.get("must_haves", []))
+        if musts: parts.append(idx.amenities_any(spec["must_haves"]))
+        parts.append(idx.flag("near_transit"))
+        if "pet" in musts or "dog" in musts: parts.append(idx.flag("pet_friendly"))
+        return InventoryIndex.union(*parts)
+
     def run(self, spec: Dict[str, Any], topn=5) -> MatchResult:
-        cands: List[MatchItem] = []
-        for row in self.rows:
-            sc, reasons = _score_row(row, spec)
-            cands.append(MatchItem(
-                id=str(row.get("id", row.get("address",""))),
-                score=sc, reasons=reasons, row_preview=row
-            ))
-        cands.sort(key=lambda x: x.score, reverse=True)
-        return MatchResult(matches=cands[:topn], spec_used=spec)
+        scored = [(int(i), *_score_row(self.rows[i], spec)) for i in self._candidates(spec)]
+        scored = sorted([t for t in scored if t[1] > 0], key=lambda t: (-t[1], t[0]))[:topn]
+        if len(scored) < topn:
+            # pad with zero-score rows in inventory order, as the full sort would
+            seen = {t[0] for t in scored}
+            for i, row in enumerate(self.rows):
+                if len(scored) >= topn: break
+                if i not in seen: scored.append((i, *_score_row(row, spec)))
+        cands = [MatchItem(id=str(self.rows[i].get("id", self.rows[i].get("address",""))),
+                           score=sc, reasons=reasons, row_preview=self.rows[i])
+                 for i, sc, reasons in scored]
+        return MatchResult(matches=cands, spec_used=spec)
 
 class ActionPlan(BaseModel):
     actions: List[Dict[str, Any]]
@@ -408,9 +319,9 @@ class TourCloseAgent:
         return ActionPlan(actions=props, confirmation_prompt="Book tour 1, tour 2, or propose other times?")
 
 class VIAAgent:
-    def __init__(self, inventory_rows: List[Dict[str, Any]], slots: List[Dict[str, str]]):
+    def __init__(self, inventory_rows: List[Dict[str, Any]], slots: List[Dict[str, str]], index: Optional[InventoryIndex] = None):
         self.needs = NeedsAgent()
-        self.matcher = MatchRankAgent(rows=inventory_rows)
+        self.matcher = MatchRankAgent(rows=inventory_rows, index=index)
         self.closer = TourCloseAgent(slots)
     def handle_full(self, user_text: str, sample_rows: Optional[str]) -> Dict[str, Any]:
         spec = self.needs.run(user_text, sample_rows)
@@ -424,23 +335,22 @@ class VIAAgent:
 DOMA_SYSTEM = ("Answer only from lease text; cite page/section; if unknown, say so.")
 class LeaseAnswer(BaseModel): answer: str; citations: List[Dict[str,Any]]; risk_flags: List[str]=[]
 class LeaseQAAgent:
-    def run(self, question: str, chunks: List[Dict[str, Any]]) -> LeaseAnswer:
+    def run(self, question: str, chunks: List[Dict[str, Any]], render=None) -> LeaseAnswer:
+        """`render` consumes the answer's token stream as it arrives (e.g. st.write_stream) and returns the full text."""
         ctx = "\n\n".join([f"[p{c.get('page','?')}] {c.get('text','')}" for c in chunks])
         msgs=[{"role":"system","content":DOMA_SYSTEM},
               {"role":"user","content":f"Lease snippets:\n{ctx}\n\nQ: {question}\nReply concisely with inline citations."}]
-        r = client.chat.completions.create(model="gpt-4o-mini", messages=msgs)
-        return LeaseAnswer(answer=r.choices[0].message.content, citations=[{"page":c.get("page")} for c in chunks[:2]])
-
-class TriageResult(BaseModel):
-    category:str; priority:str; vendor:str; eta_hours:int; confirm_message:str
-class ServiceTriageAgent:
-    def run(self, ticket_text: str) -> TriageResult:
-        t=ticket_text.lower()
-        if any(k in t for k in ["gas leak","smoke","water main break"]):
-            return TriageResult("emergency","P0","dispatch_call_center",1,"Emergency detected. Dispatching now.")
-        cat="plumbing" if "leak" in t else "hvac" if ("ac" in t or "air" in t or "heater" in t) else "general"
-        vendor={"plumbing":"preferred_plumber_inc","hvac":"preferred_hvac_llc"}.get(cat,"handyman_pool")
-        return TriageResult(cat,"P2",vendor,8 if cat!="general" else 24,f"Ticket logged as {cat}. Assigned {vendor}.")
+        if render is None:
+            r = client.chat.completions.create(model="gpt-4o-mini", messages=msgs)
+            text = r.choices[0].message.content
+        else:
+            text = render(self._tokens(client.chat.completions.create(model="gpt-4o-mini", messages=msgs, stream=True)))
+        return LeaseAnswer(answer=text, citations=[{"page":c.get("page")} for c in chunks[:2]])
+    @staticmethod
+    def _tokens(stream):
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta: yield delta
 
 class Offer(BaseModel): rent_usd:float; term_months:int; incentives:List[str]=[]
 class RenewalPackage(BaseModel):
@@ -468,17 +378,17 @@ class ManagerAgent:
         if any(k in t for k in self.DOMA_INTENTS["triage"]): return "triage"
         if any(k in t for k in self.DOMA_INTENTS["renewal"]): return "renewal"
         return "lease"
-    def handle_via(self, user_text:str, inventory:List[Dict[str,Any]], slots:List[Dict[str,str]], sample_rows:Optional[str])->Dict[str,Any]:
-        via=VIAAgent(inventory_rows=inventory, slots=slots)
+    def handle_via(self, user_text:str, inventory:List[Dict[str,Any]], slots:List[Dict[str,str]], sample_rows:Optional[str], index:Optional[InventoryIndex]=None)->Dict[str,Any]:
+        via=VIAAgent(inventory_rows=inventory, slots=slots, index=index)
         return {"route":"VIA/"+self.via_route(user_text), **via.handle_full(user_text, sample_rows)}
-    def handle_doma(self, user_text:str, pasted_lease:str)->Dict[str,Any]:
+    def handle_doma(self, user_text:str, pasted_lease:str, render=None)->Dict[str,Any]:
         r=self.doma_route(user_text)
         if r=="triage": return {"route":"DOMA/triage", "triage": ServiceTriageAgent().run(user_text).model_dump()}
         if r=="renewal": return {"route":"DOMA/renewal", "renewal": RenewalDealAgent().run(3200,3300,3000,3600).model_dump()}
         chunks=[]
         if pasted_lease.strip():
             for i,blk in enumerate(pasted_lease.split("\n\n")): chunks.append({"page":i+1,"text":blk[:1200]})
-        ans=LeaseQAAgent().run(user_text, chunks)
+        ans=LeaseQAAgent().run(user_text, chunks, render=render)
         return {"route":"DOMA/lease", "lease_answer": ans.model_dump()}
 
 manager = ManagerAgent()
@@ -500,9 +410,11 @@ def friendly_via_reply(res: Dict[str,Any], user_text: str) -> str:
             lines.append(f"- {rp.get('address','(pending)')} — {int(rp.get('sqft',0)) or '—'} SF · {_fmt_money(rp.get('rent'))}/mo")
         return "Here are a few that look promising:\n"+"\n".join(lines)+"\n\nWant me to book a tour for one of these?"
 
+LEASE_REPLY_INTRO = "Here’s what your lease says:"
+LEASE_REPLY_OUTRO = "Want me to draft a quick note to your building manager or check renewal timelines?"
 def friendly_lease_reply(ans: Dict[str,Any]) -> str:
     a = ans.get("lease_answer",{}).get("answer","")
-    return f"Here’s what your lease says:\n\n{a}\n\nWant me to draft a quick note to your building manager or check renewal timelines?"
+    return f"{LEASE_REPLY_INTRO}\n\n{a}\n\n{LEASE_REPLY_OUTRO}"
 
 def _slot_labels(slots):
     lbls=[]
@@ -535,7 +447,7 @@ def generate_suggestions(history: List[Dict[str,str]], mode: str) -> List[str]:
     key=f"{mode}|{len(history)}|{history[-1]['content'][:80]}"
     if last_suggestions.get("key")==key: return last_suggestions["items"]
     try:
-        snippet="\n".join([f"{m['role']}: {m['content']}" for m in history[-6:]])
+        snippet="\n".join([f"{m['role']}: {m['content']}" for m in memory.messages(max_tokens=400)])
         sys_prompt=("Return JSON {'suggestions':[...]} of 3 short, friendly, concrete follow-ups (<= 12 words) "
                     f"for {mode}.")
         r=client.chat.completions.create(model="gpt-4o-mini",
@@ -546,21 +458,36 @@ def generate_suggestions(history: List[Dict[str,str]], mode: str) -> List[str]:
         items=["Show top 3 near subway","Book a tour for Tue 3pm"] if mode=="VIA" else ["What’s the late fee policy?","Offer a 24-month option"]
     st.session_state["last_suggestions"]={"key":key,"items":items}; return items
 
+def add_turn(role: str, content: str):
+    messages.append({"role":role,"content":content})
+    memory.add(role, content)
+
 def ensure_welcome():
     if not messages:
         hello = "Hi! I’m BuildWise. Tell me what you’re looking for and I’ll help. Choose **VIA** for new-place search, or **DOMA** for lease/maintenance/renewals."
         if lead_name: hello = f"Hi {lead_name}! " + hello
-        messages.append({"role":"assistant","content":hello})
+        add_turn("assistant", hello)
+
+def _inventory_cache() -> Tuple[List[Dict[str, Any]], Optional[InventoryIndex]]:
+    # records + index are rebuilt only when the inventory DataFrame object changes
+    if inventory_df is None or inventory_df.empty: return [], None
+    cached = st.session_state.get("inventory_index")
+    if cached is None or cached[0] is not inventory_df:
+        rows = inventory_df.to_dict(orient="records")
+        cached = (inventory_df, rows, InventoryIndex(rows, text_fields=("neighborhood","address")))
+        st.session_state["inventory_index"] = cached
+    return cached[1], cached[2]
 
 def inventory_records() -> List[Dict[str, Any]]:
-    if inventory_df is None or inventory_df.empty: return []
-    return inventory_df.to_dict(orient="records")
+    return _inventory_cache()[0]
+
+def inventory_index() -> Optional[InventoryIndex]:
+    return _inventory_cache()[1]
 
-def build_email_summary(conv: List[Dict[str,str]], structured: Dict[str,Any]) -> str:
+def build_email_summary(structured: Dict[str,Any]) -> str:
     lines=["Subject: BuildWise AI — Conversation Summary","","Hello team","","Here is the latest BuildWise AI conversation summary.",""]
     if lead_name or lead_email: lines += [f"Lead: {lead_name or '—'} · {lead_email or '—'}",""]
-    for m in conv[-12:]:
-        who="User" if m["role"]=="user" else "Assistant"; lines.append(f"{who}: {m['content']}")
+    lines.append(memory.transcript())
     lines.append("")
     if structured.get("VIA"): lines.append("— VIA Result —\n"+json.dumps(structured["VIA"], indent=2))
     if structured.get("DOMA"): lines.append("— DOMA Result —\n"+json.dumps(structured["DOMA"], indent=2))
@@ -575,6 +502,7 @@ with col_chat:
     with c1:
         if st.button("🧹 Clear chat", use_container_width=True):
             st.session_state["messages"]=[]
+            st.session_state["memory"]=ConversationMemory(client=client)
             st.session_state["last_structured"]={}
             st.session_state["last_suggestions"]={"key":"", "items":[]}
             st.session_state["holds"]=[]
@@ -587,12 +515,26 @@ with col_chat:
         with st.chat_message(msg["role"], avatar=("🧑" if msg["role"]=="user" else "🤖")):
             st.markdown(msg["content"])
 
-    def run_manager_and_reply(user_text: str):
+    def run_manager_and_reply(user_text: str, live: bool = False):
+        """Returns the reply text; with `live`, also writes it into the open chat bubble, streaming lease answers."""
+        if live:
+            streamed = []
+            def render(tokens):
+                st.markdown(f"_DOMA/lease_\n\n{LEASE_REPLY_INTRO}")
+                streamed.append(True)
+                return st.write_stream(tokens)
+            reply = _manager_reply(user_text, render)
+            if streamed: st.markdown(LEASE_REPLY_OUTRO)
+            else: st.markdown(reply)
+            return reply
+        return _manager_reply(user_text, None)
+
+    def _manager_reply(user_text: str, render=None):
         if st.session_state["mode"] == "VIA":
             inv = inventory_records()
             sample = inventory_df.head(3).to_string() if (inventory_df is not None and not inventory_df.empty) else None
             with st.spinner("Finding options for you…"):
-                res = manager.handle_via(user_text=user_text, inventory=inv, slots=DEFAULT_SLOTS, sample_rows=sample)
+                res = manager.handle_via(user_text=user_text, inventory=inv, slots=DEFAULT_SLOTS, sample_rows=sample, index=inventory_index())
             st.session_state["last_structured"] = {"VIA": res}
             msg = friendly_via_reply(res, user_text)
             if st.session_state.get("holds"):
@@ -602,7 +544,7 @@ with col_chat:
         else:
             pasted = st.session_state.get("lease_paste","")
             with st.spinner("Checking your lease/policy…"):
-                res = manager.handle_doma(user_text=user_text, pasted_lease=pasted)
+                res = manager.handle_doma(user_text=user_text, pasted_lease=pasted, render=render)
             st.session_state["last_structured"] = {"DOMA": res}
             if "lease_answer" in res: return f"_{res['route']}_\n\n" + friendly_lease_reply(res)
             if "triage" in res: return f"_{res['route']}_\n\n**Service ticket**\n\n{res['triage']['confirm_message']}\n\nShould I notify your vendor now?"
@@ -611,7 +553,7 @@ with col_chat:
 
     if regenerate and any(m["role"] == "user" for m in messages):
         last_user = [m for m in messages if m["role"] == "user"][-1]["content"]
-        messages.append({"role":"assistant","content":run_manager_and_reply(last_user)})
+        add_turn("assistant", run_manager_and_reply(last_user))
         st.session_state["messages"]=messages; st.rerun()
 
     # Suggestions
@@ -634,10 +576,9 @@ with col_chat:
 
     if user_input:
         with st.chat_message("user", avatar="🧑"): st.markdown(user_input)
-        messages.append({"role":"user","content":user_input})
-        reply = run_manager_and_reply(user_input)
-        with st.chat_message("assistant", avatar="🤖"): st.markdown(reply)
-        messages.append({"role":"assistant","content":reply})
+        add_turn("user", user_input)
+        with st.chat_message("assistant", avatar="🤖"): reply = run_manager_and_reply(user_input, live=True)
+        add_turn("assistant", reply)
         st.session_state["messages"]=messages
 
 # --------- RIGHT: Results / tools ----------
@@ -742,7 +683,7 @@ with col_right:
 
     st.markdown("<hr class='soft'/>", unsafe_allow_html=True)
     st.markdown("#### ✉️ Share conversation")
-    email_body = build_email_summary(messages, last_structured)
+    email_body = build_email_summary(last_structured)
     st.download_button("Download email draft (.txt)", email_body.encode("utf-8"),
                        file_name="buildwise_conversation_summary.txt", mime="text/plain")
     if email_to.strip(): st.caption(f"Ready to send to: **{email_to}**")
@@ -0,0 +1,34 @@
+import hashlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+def fake_vector(text: str, dim: int = 8) -> list:
+    """Deterministic unit vector per text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    v = np.random.default_rng(seed).standard_normal(dim)
+    return (v / np.linalg.norm(v)).tolist()
+
+class FakeEmbeddings:
+    """Stands in for client.embeddings: records every input batch it is sent."""
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.calls = []
+
+    def create(self, model, input, **_):
+        self.calls.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=fake_vector(t, self.dim))
+                                     for i, t in enumerate(input)])
+
+class AsyncFakeEmbeddings(FakeEmbeddings):
+    async def create(self, model, input, **_):
+        return FakeEmbeddings.create(self, model, input)
+
+@pytest.fixture
+def embed_client():
+    return SimpleNamespace(embeddings=FakeEmbeddings())
+
+@pytest.fixture
+def aembed_client():
+    return SimpleNamespace(embeddings=AsyncFakeEmbeddings())
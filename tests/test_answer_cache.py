@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from backend.core import answer_cache
+from backend.core.answer_cache import AnswerCache, context_key
+
+SOURCES, CHUNKS = ["lease.pdf"], ["lease.pdf#1", "lease.pdf#2"]
+
+def _near(vec, cos, seed=0):
+    """A vector at cosine `cos` from `vec`."""
+    v = np.asarray(vec, dtype=np.float64)
+    v = v / np.linalg.norm(v)
+    r = np.random.default_rng(seed).standard_normal(len(v))
+    r -= (r @ v) * v
+    r /= np.linalg.norm(r)
+    return (cos * v + np.sqrt(1 - cos ** 2) * r).tolist()
+
+BASE = np.random.default_rng(42).standard_normal(32).tolist()
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+def test_context_key_ignores_order_and_duplicates():
+    assert context_key(["b", "a"], ["2", "1", "1"]) == context_key(["a", "b"], ["1", "2"])
+    assert context_key(["a"], ["1"]) != context_key(["a"], ["1", "2"])
+
+def test_similar_questions_hit_above_threshold():
+    cache = AnswerCache(threshold=0.9)
+    cache.put(SOURCES, CHUNKS, BASE, "when is rent due?", {"answer": "On the 1st."})
+    hit = cache.get(SOURCES, list(reversed(CHUNKS)), _near(BASE, 0.95))
+    assert hit["answer"] == {"answer": "On the 1st."} and hit["question"] == "when is rent due?"
+    assert hit["similarity"] == pytest.approx(0.95, abs=1e-3)
+    assert cache.get(SOURCES, CHUNKS, _near(BASE, 0.85)) is None
+    # same question, different retrieval context
+    assert cache.get(SOURCES, CHUNKS[:1], BASE) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_best_match_wins():
+    cache = AnswerCache(threshold=0.8)
+    cache.put(SOURCES, CHUNKS, _near(BASE, 0.85, seed=1), "far", {"answer": "far"})
+    cache.put(SOURCES, CHUNKS, _near(BASE, 0.99, seed=2), "close", {"answer": "close"})
+    assert cache.get(SOURCES, CHUNKS, BASE)["question"] == "close"
+
+def test_entries_expire(clock):
+    cache = AnswerCache(threshold=0.9, ttl_seconds=60)
+    cache.put(SOURCES, CHUNKS, BASE, "q", {"answer": "a"})
+    clock[0] += 59
+    assert cache.get(SOURCES, CHUNKS, BASE) is not None
+    clock[0] += 2
+    assert cache.get(SOURCES, CHUNKS, BASE) is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+def test_least_recently_used_is_evicted():
+    cache = AnswerCache(threshold=0.99, max_entries=2)
+    ctx = [(["a.pdf"], ["a#1"]), (["b.pdf"], ["b#1"]), (["c.pdf"], ["c#1"])]
+    cache.put(*ctx[0], BASE, "qa", {"answer": "a"})
+    cache.put(*ctx[1], BASE, "qb", {"answer": "b"})
+    assert cache.get(*ctx[0], BASE) is not None  # a is now the most recently used
+    cache.put(*ctx[2], BASE, "qc", {"answer": "c"})
+    assert cache.get(*ctx[1], BASE) is None
+    assert cache.get(*ctx[0], BASE) is not None and cache.get(*ctx[2], BASE) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_invalidate_source_drops_only_answers_citing_it():
+    cache = AnswerCache(threshold=0.99)
+    cache.put(["a.pdf", "b.pdf"], ["a#1", "b#1"], BASE, "both", {"answer": "1"})
+    cache.put(["a.pdf"], ["a#1"], BASE, "a only", {"answer": "2"})
+    cache.put(["b.pdf"], ["b#1"], BASE, "b only", {"answer": "3"})
+    assert cache.invalidate_source("a.pdf") == 2
+    assert cache.get(["a.pdf", "b.pdf"], ["a#1", "b#1"], BASE) is None
+    assert cache.get(["a.pdf"], ["a#1"], BASE) is None
+    assert cache.get(["b.pdf"], ["b#1"], BASE)["question"] == "b only"
+    assert cache.invalidate_source("a.pdf") == 0
+    assert cache.stats()["entries"] == 1 and cache.stats()["invalidations"] == 2
@@ -0,0 +1,139 @@
+import math
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from backend.core import embedding_cache
+from backend.core.embedding_cache import EmbeddingCache
+from backend.rag.bm25 import BM25Index, tokenize, matches_filter
+from backend.rag.retriever import Retriever, LocalANNBackend, reciprocal_rank_fusion
+from backend.utils.local_vector_store import LocalVectorStore
+from conftest import fake_vector, AsyncFakeEmbeddings
+
+WORDS = "rent deposit late fee parking pet utilities repair notice renewal sublease insurance".split()
+
+def _chunks(source, n, seed=0):
+    out = []
+    for i in range(n):
+        words = [WORDS[(seed + i * 7 + j * 3) % len(WORDS)] for j in range(3 + i % 5)]
+        text = f"Section {i % 9 + 1}.{i % 4} " + " ".join(words)
+        out.append((f"{source}#{i}", text, {"kind": "chunk", "text": text, "source": source, "page": i % 6 + 1}))
+    return out
+
+def _reference(docs, query, k1=1.2, b=0.75):
+    """Textbook BM25 over (id, text) pairs."""
+    toks = {cid: tokenize(text) for cid, text in docs}
+    n, avgdl = len(toks), sum(map(len, toks.values())) / len(toks)
+    df = Counter(t for ts in toks.values() for t in set(ts))
+    scores = {}
+    for cid, ts in toks.items():
+        tf, s = Counter(ts), 0.0
+        for t in dict.fromkeys(tokenize(query)):
+            if tf[t]:
+                idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+                s += idf * tf[t] * (k1 + 1) / (tf[t] + k1 * (1 - b + b * len(ts) / avgdl))
+        if s:
+            scores[cid] = s
+    return scores
+
+@pytest.fixture
+def index(tmp_path):
+    idx = BM25Index(str(tmp_path / "bm25"))
+    idx.update_document("a.pdf", _chunks("a.pdf", 40))
+    idx.update_document("b.pdf", _chunks("b.pdf", 25, seed=5))
+    return idx
+
+def _docs(index):
+    return [(cid, text) for src, n, seed in (("a.pdf", 40, 0), ("b.pdf", 25, 5))
+            for cid, text, _ in _chunks(src, n, seed)][:len(index)]
+
+def test_tokenize_keeps_dotted_numbers_and_drops_stopwords():
+    assert tokenize("See Section 14.2 of the Lease, 3 pages") == ["see", "section", "14.2", "lease", "3", "pages"]
+
+@pytest.mark.parametrize("query", ["late fee", "pet deposit renewal", "section 3.1", "insurance"])
+def test_scores_match_reference(index, query):
+    want = _reference(_docs(index), query)
+    got = index.search(query, top_k=1000)
+    assert {h["id"]: pytest.approx(s, rel=1e-4) for h, s in ((h, h["score"]) for h in got)} == \
+        {cid: pytest.approx(s, rel=1e-4) for cid, s in want.items()}
+    assert [h["score"] for h in got] == sorted((h["score"] for h in got), reverse=True)
+
+def test_dotted_clause_numbers_match_exactly(index):
+    hits = index.search("14.2 7.3", top_k=5)
+    assert hits and all("7.3" in h["text"] for h in hits)
+
+def test_filters(index):
+    hits = index.search("rent parking", top_k=100, filter={"source": "b.pdf", "page": {"$lte": 2}})
+    assert hits and all(h["source"] == "b.pdf" and h["page"] <= 2 for h in hits)
+    assert matches_filter({"page": 3}, {"$or": [{"page": 1}, {"page": {"$in": [3]}}]})
+    assert not matches_filter({"page": "3"}, {"page": {"$gt": 1}})
+
+def test_update_and_remove_document(index):
+    index.update_document("a.pdf", [("a.pdf#new", "holdover penalty", {"source": "a.pdf"})])
+    assert len(index) == 26
+    assert [h["id"] for h in index.search("holdover")] == ["a.pdf#new"]
+    assert all(h["source"] == "b.pdf" for h in index.search("rent late fee", top_k=100))
+    index.remove_document("a.pdf")
+    assert len(index) == 25 and not index.has_document("a.pdf")
+    assert index.search("holdover") == []
+
+def test_reload_from_disk(index, tmp_path):
+    reloaded = BM25Index(str(tmp_path / "bm25"))
+    assert len(reloaded) == len(index)
+    for q in ("late fee", "section 2.1 pet"):
+        assert reloaded.search(q, top_k=20) == index.search(q, top_k=20)
+
+def test_writer_parts_search_like_one_segment(tmp_path):
+    chunks = _chunks("big.xlsx", 50)
+    whole = BM25Index(str(tmp_path / "whole"))
+    whole.update_document("big.xlsx", chunks)
+    parted = BM25Index(str(tmp_path / "parted"))
+    w = parted.writer("big.xlsx", part_chunks=8)
+    for c in chunks:
+        w.add(*c)
+    assert len(parted) == 0 and parted.search("rent") == []  # nothing visible before commit
+    w.commit()
+    assert len(os.listdir(tmp_path / "parted")) == 7
+    for q in ("rent", "late fee notice", "section 4.2"):
+        assert [(h["id"], round(h["score"], 4)) for h in parted.search(q, top_k=50)] == \
+               [(h["id"], round(h["score"], 4)) for h in whole.search(q, top_k=50)]
+
+    # a shorter rewrite removes the stale part files
+    parted.update_document("big.xlsx", chunks[:5])
+    assert len(os.listdir(tmp_path / "parted")) == 1 and len(parted) == 5
+    assert len(BM25Index(str(tmp_path / "parted"))) == 5
+
+def test_reciprocal_rank_fusion():
+    dense = [{"id": "a", "text": "A"}, {"id": "b"}, {"id": "c"}]
+    sparse = [{"id": "c"}, {"id": "d"}, {"id": "a"}]
+    fused = reciprocal_rank_fusion({"dense": dense, "sparse": sparse}, top_k=3, k=60)
+    assert [r["id"] for r in fused] == ["a", "c", "b"]
+    assert fused[0]["score"] == pytest.approx(1 / 61 + 1 / 63)
+    assert fused[0]["ranks"] == {"dense": 1, "sparse": 3} and fused[0]["text"] == "A"
+    assert fused[2]["ranks"] == {"dense": 2}
+    assert reciprocal_rank_fusion({"dense": [], "sparse": []}, top_k=5) == []
+
+def test_hybrid_retriever_finds_exact_terms(tmp_path, monkeypatch, embed_client):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    monkeypatch.setattr(embedding_cache, "_default_cache", cache)
+    target = ("a.pdf#holdover", "Section 21.4 holdover tenancy",
+              {"kind": "chunk", "text": "Section 21.4 holdover tenancy", "source": "a.pdf", "page": 9})
+    chunks = _chunks("a.pdf", 40) + [target]
+    backend = LocalANNBackend(LocalVectorStore(str(tmp_path / "store")))
+    backend.add([c[0] for c in chunks], [fake_vector(c[1]) for c in chunks], [c[2] for c in chunks])
+    sparse = BM25Index(str(tmp_path / "bm25"))
+    sparse.update_document("a.pdf", chunks)
+    aclient = SimpleNamespace(embeddings=AsyncFakeEmbeddings())
+    hybrid = Retriever(backend=backend, top_k=3, client=embed_client, aclient=aclient, sparse=sparse)
+    dense = Retriever(backend=backend, top_k=3, client=embed_client, aclient=aclient, hybrid=False)
+
+    # the fake embeddings carry no meaning: only the sparse ranking can find the term
+    query = "what happens on holdover?"
+    hits = hybrid.retrieve(query)
+    assert hits[0]["id"] == target[0] and "sparse" in hits[0]["ranks"]
+    assert target[0] in {h["id"] for h in hybrid.retrieve(query, source="a.pdf")}
+    assert hybrid.retrieve(query, source="b.pdf") == []
+    assert len(dense.retrieve(query)) == 3
+    cache._conn.close()
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from backend.loaders.chunker import iter_chunk_spans, count_tokens, count_tokens_batch
+
+CLAUSE = ("The Tenant shall pay the Base Rent in equal monthly installments in advance on the first day "
+          "of each calendar month; late payments accrue a fee of five percent. ")
+
+def _lease(sections=30, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for n in range(1, sections + 1):
+        body = "\n\n".join(CLAUSE * rng.randint(1, 6) for _ in range(rng.randint(1, 3)))
+        parts.append(f"SECTION {n}. TERMS AND CONDITIONS\n{body}\n")
+    return "\n\n".join(parts)
+
+def _covered(text, spans):
+    seen = bytearray(len(text))
+    for s, e in spans:
+        seen[s:e] = b"\x01" * (e - s)
+    return all(seen[i] or text[i].isspace() for i in range(len(text)))
+
+@pytest.mark.parametrize("max_tokens,overlap", [(400, 40), (120, 20), (60, 0)])
+def test_spans_fit_cover_and_trim(max_tokens, overlap):
+    text = _lease()
+    spans = list(iter_chunk_spans(text, max_tokens=max_tokens, overlap_tokens=overlap))
+    assert len(spans) > 1
+    for s, e in spans:
+        assert count_tokens(text[s:e]) <= max_tokens
+        assert not text[s].isspace() and not text[e - 1].isspace()
+    assert [s for s, _ in spans] == sorted(s for s, _ in spans)
+    assert _covered(text, spans)
+
+def test_overlap_is_bounded_and_never_crosses_a_heading():
+    text = _lease(seed=1)
+    spans = list(iter_chunk_spans(text, max_tokens=120, overlap_tokens=30))
+    overlaps = 0
+    for (s0, e0), (s1, e1) in zip(spans, spans[1:]):
+        if s1 < e0:
+            overlaps += 1
+            assert count_tokens(text[s1:e0]) <= 30
+            assert "SECTION" not in text[s1:e0]
+        if text[s1:e1].startswith("SECTION"):
+            assert s1 >= e0
+    assert overlaps > 0
+
+def test_no_overlap_when_disabled():
+    text = _lease(seed=2)
+    spans = list(iter_chunk_spans(text, max_tokens=100, overlap_tokens=0))
+    assert all(s1 >= e0 for (_, e0), (s1, _) in zip(spans, spans[1:]))
+
+def test_breaks_at_headings_after_sentence_ends():
+    # sections that fit a chunk: a break only ever falls on a heading, even though
+    # each section ends in a period (the clause break must not swallow the heading)
+    sections = [f"SECTION {n}. RENT \n" + CLAUSE * (1 + n % 3) for n in range(1, 41)]
+    text = "\n\n".join(sections)
+    spans = list(iter_chunk_spans(text, max_tokens=200, overlap_tokens=20))
+    assert len(spans) > 1
+    assert all(text[s:e].startswith("SECTION") for s, e in spans)
+
+def test_long_clause_splits_at_words():
+    text = " ".join(f"word{i}" for i in range(2000))  # no clause or paragraph breaks
+    spans = list(iter_chunk_spans(text, max_tokens=50, overlap_tokens=0))
+    assert all(count_tokens(text[s:e]) <= 50 for s, e in spans)
+    assert " ".join(text[s:e] for s, e in spans) == text
+
+def test_short_and_empty_text():
+    assert list(iter_chunk_spans("Rent is due monthly.")) == [(0, 20)]
+    assert list(iter_chunk_spans("")) == []
+    assert list(iter_chunk_spans("  \n\n  ")) == []
+
+def test_count_tokens_batch_matches_count_tokens():
+    texts = ["", "Rent is due on the 1st.", CLAUSE * 3, "§ 4.2 Security Deposit — $2,500"]
+    assert count_tokens_batch(texts) == [count_tokens(t) for t in texts]
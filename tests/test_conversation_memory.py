@@ -0,0 +1,111 @@
+import pytest
+
+from backend.db import supabase_client as sc
+from backend.db.sqlite_supabase import SQLiteSupabase
+from backend.core import conversation_memory
+from backend.core.conversation_memory import ConversationMemory, extractive_summary
+
+def _summarize(previous, messages):
+    return extractive_summary(previous, messages, max_tokens=80)
+
+def _memory(**kw):
+    kw.setdefault("summarize", _summarize)
+    return ConversationMemory(window_tokens=120, fold_tokens=40, summary_tokens=80, **kw)
+
+def _turn(i):
+    return f"Turn {i}: the unit at {100 + i} W 36th St has {i % 4 + 1} bedrooms. More details follow here."
+
+@pytest.fixture
+def db(monkeypatch):
+    db = SQLiteSupabase()
+    monkeypatch.setattr(sc, "_client", db)
+    writer = sc.MessageWriter(client=db, flush_seconds=5)
+    monkeypatch.setattr(sc, "_writer", writer)
+    yield db
+    writer.close(timeout=5)
+
+def test_folds_keep_context_bounded():
+    memory = _memory(background=False)
+    for i in range(200):
+        memory.add("user" if i % 2 == 0 else "assistant", _turn(i))
+        assert memory.stats()["window_tokens"] <= 120 + 40
+    stats = memory.stats()
+    assert stats["folds"] > 0
+    assert stats["summarized_turns"] + stats["window_turns"] == 200
+    # the newest turns stay verbatim, in order
+    assert memory.messages()[-1] == {"role": "assistant", "content": _turn(199)}
+    assert memory.messages()[-2]["content"] == _turn(198)
+    assert memory.summary and memory.context_tokens() <= 120 + 40 + 80
+
+def test_background_folds_match_inline():
+    inline, background = _memory(background=False), _memory()
+    for i in range(60):
+        inline.add("user", _turn(i))
+        background.add("user", _turn(i))
+        background.wait()
+    assert background.summary == inline.summary
+    assert background.messages() == inline.messages()
+
+def test_prompt_messages_and_token_cap():
+    memory = _memory(background=False)
+    for i in range(40):
+        memory.add("user", _turn(i))
+    prompt = memory.prompt_messages(system="You are BuildWise.")
+    assert prompt[0] == {"role": "system", "content": "You are BuildWise."}
+    assert prompt[1]["role"] == "system" and memory.summary in prompt[1]["content"]
+    capped = memory.messages(max_tokens=30)
+    assert capped == memory.messages()[-len(capped):] and len(capped) < len(memory.messages())
+
+def test_summarizer_errors_keep_turns():
+    def broken(previous, messages):
+        raise RuntimeError("model unavailable")
+    memory = _memory(background=False, summarize=broken)
+    for i in range(30):
+        memory.add("user", _turn(i))
+    assert memory.stats()["fold_errors"] > 0
+    assert len(memory.messages()) == 30 and memory.summary == ""
+
+def test_persisted_conversation_reloads(db):
+    memory = _memory(conversation_id="c1", persist=True, background=False)
+    for i in range(50):
+        memory.add("user" if i % 2 == 0 else "assistant", _turn(i))
+    memory.wait()
+    stats = memory.stats()
+    assert stats["folds"] > 0
+
+    row = sc.get_conversation_summary("c1")
+    assert row["summary"] == memory.summary and row["message_count"] == stats["summarized_turns"]
+    # through_id is the id of the last folded message
+    ids = [m["id"] for m in sc.iter_messages("c1")]
+    assert len(ids) == 50 and row["through_id"] == ids[stats["summarized_turns"] - 1]
+
+    reloaded = _memory(conversation_id="c1", persist=True, background=False)
+    assert reloaded.summary == memory.summary
+    assert reloaded.messages() == memory.messages()
+    assert reloaded.stats()["summarized_turns"] == stats["summarized_turns"]
+
+    # the reloaded memory carries on from where the first one stopped
+    reloaded.add("user", "What is the rent?")
+    assert reloaded.messages()[-1]["content"] == "What is the rent?"
+    assert sc.get_recent_messages("c1", limit=1)[0]["message_text"] == "What is the rent?"
+
+def test_through_id_after_loading_a_long_unsummarized_tail(db, monkeypatch):
+    monkeypatch.setattr(conversation_memory, "CONTEXT_LOAD_MAX_MESSAGES", 20)
+    for i in range(60):
+        sc.add_message("c2", "user", _turn(i))
+    memory = _memory(conversation_id="c2", persist=True, background=False)
+    assert memory.messages()[0]["content"] == _turn(40)
+    memory.add("assistant", "Noted.")
+    memory.add("user", "Anything else?")
+    assert memory.stats()["folds"] > 0
+
+    # through_id is the last folded message, not counted from the start of the conversation
+    rows = list(sc.iter_messages("c2"))
+    first_kept = next(i for i, r in enumerate(rows) if r["message_text"] == memory.messages()[0]["content"])
+    assert sc.get_conversation_summary("c2")["through_id"] == rows[first_kept - 1]["id"]
+    reloaded = _memory(conversation_id="c2", persist=True, background=False)
+    assert reloaded.messages() == memory.messages()
+
+def test_persist_needs_conversation_id():
+    with pytest.raises(ValueError):
+        ConversationMemory(persist=True)
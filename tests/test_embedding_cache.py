@@ -0,0 +1,56 @@
+import asyncio
+import itertools
+
+import pytest
+
+from backend.core import embedding_cache
+from backend.core.embedding_cache import EmbeddingCache, embed_with_cache, aembed_with_cache
+from conftest import fake_vector
+
+@pytest.fixture
+def cache(tmp_path):
+    c = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), max_entries=3)
+    yield c
+    c._conn.close()
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+def test_only_distinct_misses_are_sent(cache, embed_client):
+    out = embed_with_cache(embed_client, ["rent is due", "late fee", "rent  is due "], "m", cache)
+    assert embed_client.embeddings.calls == [["rent is due", "late fee"]]
+    assert out[0] == out[2]
+    assert out[1] == pytest.approx(fake_vector("late fee"))
+
+    embed_with_cache(embed_client, ["late fee", "deposit"], "m", cache)
+    assert embed_client.embeddings.calls[-1] == ["deposit"]
+    assert cache.stats()["hits"] == 1
+
+def test_models_do_not_share_entries(cache, embed_client):
+    embed_with_cache(embed_client, ["late fee"], "small", cache)
+    embed_with_cache(embed_client, ["late fee"], "large", cache)
+    assert len(embed_client.embeddings.calls) == 2
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    assert cache.get_many("m", ["a"]) == [[1.0]]  # a is now the most recently used
+    cache.put_many("m", ["d"], [[4.0]])
+    assert cache.get_many("m", ["a", "b", "c", "d"]) == [[1.0], None, [3.0], [4.0]]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 3
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "e.sqlite")
+    EmbeddingCache(path).put_many("m", ["a"], [[0.5, 0.25]])
+    assert EmbeddingCache(path).get_many("m", ["a"]) == [[0.5, 0.25]]
+
+def test_async_path_matches_sync_path(cache, aembed_client, embed_client):
+    texts = ["when is rent due", "pets allowed?", "when is rent due"]
+    out = asyncio.run(aembed_with_cache(aembed_client, texts, "m", cache))
+    assert aembed_client.embeddings.calls == [["when is rent due", "pets allowed?"]]
+    # fresh vectors come back as sent, cached ones as stored float32
+    cached = embed_with_cache(embed_client, texts, "m", cache)
+    assert [v == pytest.approx(w, abs=1e-6) for v, w in zip(out, cached)] == [True] * 3
+    assert embed_client.embeddings.calls == []
@@ -0,0 +1,114 @@
+import json
+import threading
+
+import pytest
+
+from backend.core.memory_redis import MemoryRedis
+from backend.core.notifications import EventBus
+
+STREAM = "test.events"
+
+class FlakyRedis:
+    """MemoryRedis whose pipelines can be held at a gate and made to fail."""
+    def __init__(self):
+        self.inner = MemoryRedis()
+        self.down = False
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def ping(self):
+        return True
+
+    def pipeline(self, transaction=False):
+        return _Pipeline(self)
+
+    def published(self):
+        return [json.loads(f[b"data"])["n"] for _, f in self.inner.xrange(STREAM)]
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def xadd(self, *args, **kwargs):
+        self.ops.append((args, kwargs))
+
+    def execute(self):
+        self.redis.entered.set()
+        assert self.redis.gate.wait(5)
+        if self.redis.down:
+            raise ConnectionError("redis down")
+        return [self.redis.inner.xadd(*a, **k) for a, k in self.ops]
+
+@pytest.fixture
+def spool(tmp_path):
+    return str(tmp_path / "events.spool.jsonl")
+
+def _bus(client, spool, **kw):
+    kw = {"batch_size": 2, "flush_seconds": 0.01, "max_buffer": 1000, **kw}
+    return EventBus(redis_url=None, stream=STREAM, spool_path=spool, client=client, **kw)
+
+def test_events_reach_the_stream_in_batches(spool):
+    redis = FlakyRedis()
+    bus = _bus(redis, spool, batch_size=50)
+    for n in range(120):
+        bus.publish({"n": n})
+    assert bus.flush(timeout=5)
+    bus.close(timeout=5)
+    assert redis.published() == list(range(120))
+    assert bus.stats()["flushes"] >= 3
+
+def test_outage_is_spooled_and_replayed_in_order(spool):
+    redis = FlakyRedis()
+    redis.down = True
+    bus = _bus(redis, spool)
+    for n in range(10):
+        bus.publish({"n": n})
+    assert bus.flush(timeout=5)
+    assert redis.published() == []
+    assert bus.stats()["spooled"] == 10
+
+    redis.down = False
+    for n in range(10, 15):
+        bus.publish({"n": n})
+    assert bus.flush(timeout=5)
+    bus.close(timeout=5)
+    assert redis.published() == list(range(15))
+    assert bus.stats()["replayed"] == 10
+
+def test_spool_left_by_a_previous_process_is_replayed(spool):
+    down = FlakyRedis()
+    down.down = True
+    bus = _bus(down, spool)
+    for n in range(4):
+        bus.publish({"n": n})
+    bus.flush(timeout=5)
+    bus.close(timeout=5)
+
+    redis = FlakyRedis()
+    bus = _bus(redis, spool)
+    bus.publish({"n": 4})
+    assert bus.flush(timeout=5)
+    bus.close(timeout=5)
+    assert redis.published() == [0, 1, 2, 3, 4]
+
+def test_buffer_overflow_keeps_publish_order(spool):
+    redis = FlakyRedis()
+    redis.down = True
+    redis.gate.clear()
+    bus = _bus(redis, spool, max_buffer=3)
+    bus.publish({"n": 0})
+    bus.publish({"n": 1})
+    assert redis.entered.wait(5)  # [0, 1] is in flight, held at the gate
+
+    for n in range(2, 7):  # 2-4 fill the buffer, 5 spills 2-5, 6 is buffered again
+        bus.publish({"n": n})
+    redis.gate.set()  # the in-flight batch fails and is spooled ahead of the spill
+    assert bus.flush(timeout=5)
+
+    redis.down = False
+    bus.publish({"n": 7})
+    assert bus.flush(timeout=5)
+    bus.close(timeout=5)
+    assert redis.published() == list(range(8))
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from backend.core.event_consumer import EventConsumer
+from backend.core.memory_redis import MemoryRedis
+
+STREAM, DEAD = "test.events", "test.events.dead"
+
+@pytest.fixture
+def client():
+    return MemoryRedis()
+
+def _publish(client, event_type, n=1, **payload):
+    for i in range(n):
+        evt = {"event_id": f"{event_type}-{i}", "event_type": event_type, "payload": {"i": i, **payload}}
+        client.xadd(STREAM, {"data": json.dumps(evt)})
+
+def _consumer(client, name="w1", **kw):
+    kw.setdefault("reclaim_idle_ms", 0)  # anything pending can be reclaimed at once
+    return EventConsumer("group", consumer=name, client=client, stream=STREAM, block_ms=None,
+                         workers=4, dead_letter_stream=DEAD, **kw)
+
+def _pending(client):
+    return client.xpending_range(STREAM, "group", count=1000)
+
+def test_dispatches_by_type_and_acks(client):
+    seen = []
+    c = _consumer(client)
+    c.register("a", lambda evt: seen.append(("a", evt["payload"]["i"])))
+    c.on("*")(lambda evt: seen.append(("*", evt["event_type"])))
+    _publish(client, "a", 3)
+    _publish(client, "b")
+    assert c.poll() == 4
+    assert sorted(seen) == sorted([("a", 0), ("a", 1), ("a", 2), ("*", "a"), ("*", "a"), ("*", "a"), ("*", "b")])
+    assert _pending(client) == []
+    assert c.stats()["acked"] == 4 and c.stats()["failed"] == 0
+    assert c.poll() == 0
+    c.stop()
+
+def test_group_members_share_the_stream(client):
+    handled = []
+    workers = [_consumer(client, f"w{i}", batch_size=5) for i in range(2)]
+    for w in workers:
+        w.register("a", lambda evt: handled.append(evt["event_id"]))
+    _publish(client, "a", 20)
+    while sum(w.poll() for w in workers):
+        pass
+    assert sorted(handled) == sorted(f"a-{i}" for i in range(20))
+    assert all(w.stats()["processed"] > 0 for w in workers)
+    for w in workers:
+        w.stop()
+
+def test_failed_event_is_retried_then_acked(client):
+    attempts = []
+    def flaky(evt):
+        attempts.append(evt["event_id"])
+        if len(attempts) == 1:
+            raise RuntimeError("vendor API down")
+    c = _consumer(client)
+    c.register("a", flaky)
+    _publish(client, "a")
+    c.poll()
+    assert len(_pending(client)) == 1 and c.stats()["failed"] == 1
+    c.poll()  # reclaimed and retried
+    assert attempts == ["a-0", "a-0"]
+    assert _pending(client) == [] and client.xlen(DEAD) == 0
+    assert c.stats()["reclaimed"] == 1
+    c.stop()
+
+def test_dead_letter_after_max_deliveries(client):
+    calls = []
+    def broken(evt):
+        calls.append(evt["event_id"])
+        raise ValueError("bad payload")
+    c = _consumer(client, max_deliveries=3)
+    c.register("a", broken)
+    _publish(client, "a")
+    for _ in range(5):
+        c.poll()
+    assert calls == ["a-0"] * 3
+    assert _pending(client) == []
+    [(_, dead)] = client.xrange(DEAD)
+    assert dead[b"source_id"] and dead[b"group"] == b"group" and dead[b"deliveries"] == b"3"
+    assert b"ValueError: bad payload" in dead[b"error"]
+    assert json.loads(dead[b"data"])["event_id"] == "a-0"
+    assert c.stats()["dead_lettered"] == 1
+    c.stop()
+
+def test_unparseable_entry_is_dead_lettered_at_once(client):
+    c = _consumer(client)
+    c.register("*", lambda evt: None)
+    client.xadd(STREAM, {"data": "{not json"})
+    c.poll()
+    assert _pending(client) == []
+    [(_, dead)] = client.xrange(DEAD)
+    assert dead[b"error"].startswith(b"unparseable event") and dead[b"deliveries"] == b"1"
+    c.stop()
+
+def test_entries_of_a_crashed_worker_are_reclaimed(client):
+    _publish(client, "a", 3)
+    crashed = _consumer(client, "crashed")
+    crashed.ensure_group()
+    # read without processing or acking, as a worker that died mid-batch would leave them
+    client.xreadgroup("group", "crashed", {STREAM: ">"}, count=10)
+    assert len(_pending(client)) == 3
+
+    handled = []
+    patient = _consumer(client, "patient", reclaim_idle_ms=60_000)
+    patient.register("a", lambda evt: handled.append(evt["event_id"]))
+    assert patient.poll() == 0 and handled == []  # not idle long enough yet
+
+    rescuer = _consumer(client, "rescuer")
+    rescuer.register("a", lambda evt: handled.append(evt["event_id"]))
+    assert rescuer.reclaim() == 3
+    assert sorted(handled) == ["a-0", "a-1", "a-2"]
+    assert _pending(client) == []
+    for c in (crashed, patient, rescuer):
+        c.stop()
+
+def test_ensure_group_is_idempotent(client):
+    a, b = _consumer(client, "a"), _consumer(client, "b")
+    a.ensure_group()
+    b.ensure_group()  # BUSYGROUP is not an error
+    assert b._group_ready
+    a.stop()
+    b.stop()
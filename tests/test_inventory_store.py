@@ -0,0 +1,44 @@
+import pytest
+
+from backend.core.inventory_store import InventoryStore
+
+ROWS = [{"id": "1", "neighborhood": "Chelsea", "sqft": 1200, "rent": 9000, "amenities": []},
+        {"id": "2", "neighborhood": "SoHo", "sqft": 2500, "rent": 15000, "amenities": ["gym"]}]
+
+def test_update_rows_creates_new_version_and_keeps_old():
+    store = InventoryStore()
+    store.put("x", ROWS)
+    snap = store.update_rows("x", [{"id": "1", "rent": 8000}], delete_ids=["2"])
+    assert snap.version == 2
+    assert snap.rows == [dict(ROWS[0], rent=8000)]
+    assert len(store.get("x", 1).rows) == 2
+
+def test_update_based_on_stale_version_conflicts(monkeypatch):
+    store = InventoryStore()
+    store.put("x", ROWS)
+    stale = store.get("x")
+    store.update_rows("x", [{"id": "1", "rent": 8000}])
+    # a second update that read version 1 before the first one landed
+    monkeypatch.setattr(store, "get", lambda *a, **k: stale)
+    with pytest.raises(ValueError, match="Concurrent update"):
+        store.update_rows("x", [{"id": "2", "rent": 14000}])
+    monkeypatch.undo()
+    latest = store.get("x")
+    assert latest.version == 2
+    assert latest.rows[0]["rent"] == 8000
+
+def test_full_replace_wins_over_stale_state():
+    store = InventoryStore()
+    store.put("x", ROWS)
+    store.update_rows("x", [{"id": "1", "rent": 8000}])
+    snap = store.put("x", ROWS[:1])
+    assert snap.version == 3
+    assert store.get("x").rows == [ROWS[0]]
+
+def test_retention_window():
+    store = InventoryStore(keep_versions=2)
+    for _ in range(4):
+        store.put("x", ROWS)
+    assert [s["versions"] for s in store.list()] == [[3, 4]]
+    with pytest.raises(KeyError):
+        store.get("x", 1)
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from backend.utils.local_vector_store import LocalVectorStore
+
+DIM = 16
+BUILDINGS = ["north", "south", "east"]
+
+def _vectors(n, seed=0, offset=0):
+    rng = np.random.default_rng(seed)
+    mat = rng.normal(size=(n, DIM)).astype(np.float32)
+    return [{"id": f"v{offset + i}", "values": mat[i].tolist(),
+             "metadata": {"source": f"doc{(offset + i) % 4}.pdf", "page": (offset + i) % 10,
+                          "building": BUILDINGS[(offset + i) % 3]}} for i in range(n)]
+
+def _unit(values):
+    v = np.asarray(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+def _brute(vectors, query, k, keep=lambda m: True):
+    rows = [v for v in vectors if keep(v["metadata"])]
+    scores = [float(_unit(v["values"]) @ _unit(query)) for v in rows]
+    order = np.argsort(-np.asarray(scores), kind="stable")[:k]
+    return [rows[i]["id"] for i in order]
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalVectorStore(str(tmp_path / "store"))
+
+def test_upsert_query_fetch(store):
+    vectors = _vectors(300)
+    assert store.upsert(vectors) == {"upserted_count": 300}
+    assert len(store) == 300
+    res = store.query(vector=vectors[7]["values"], top_k=5, include_metadata=True)
+    assert res.matches[0].id == "v7" and res.matches[0].score == pytest.approx(1.0, abs=1e-5)
+    assert res.matches[0].metadata == vectors[7]["metadata"]
+    assert [m.id for m in res.matches] == _brute(vectors, vectors[7]["values"], 5)
+    got = store.fetch(["v3", "missing"]).vectors
+    assert list(got) == ["v3"]
+    assert np.allclose(got["v3"].values, _unit(vectors[3]["values"]), atol=1e-6)
+
+def test_upsert_replaces_ids(store):
+    vectors = _vectors(50)
+    store.upsert(vectors)
+    moved = {"id": "v1", "values": vectors[2]["values"], "metadata": {"source": "new.pdf"}}
+    store.upsert([moved, ("v2", vectors[1]["values"])])  # tuple form, no metadata
+    assert len(store) == 50
+    assert store.describe_index_stats().stored_rows == 52
+    assert store.fetch(["v1"]).vectors["v1"].metadata == {"source": "new.pdf"}
+    assert store.fetch(["v2"]).vectors["v2"].metadata == {}
+    top = store.query(vector=vectors[1]["values"], top_k=3).matches
+    assert top[0].id == "v2" and len({m.id for m in top}) == 3
+
+def test_dimension_mismatch(store):
+    store.upsert(_vectors(3))
+    with pytest.raises(ValueError):
+        store.upsert([{"id": "bad", "values": [1.0, 2.0]}])
+
+@pytest.mark.parametrize("flt,keep", [
+    ({"building": "north"}, lambda m: m["building"] == "north"),
+    ({"page": {"$gte": 7}}, lambda m: m["page"] >= 7),
+    ({"source": {"$in": ["doc1.pdf", "doc3.pdf"]}}, lambda m: m["source"] in ("doc1.pdf", "doc3.pdf")),
+    ({"building": {"$nin": ["north"]}, "page": {"$lt": 3}}, lambda m: m["building"] != "north" and m["page"] < 3),
+    ({"$or": [{"building": "east"}, {"page": 0}]}, lambda m: m["building"] == "east" or m["page"] == 0),
+])
+def test_filters_match_brute_force(store, flt, keep):
+    vectors = _vectors(400, seed=1)
+    store.upsert(vectors)
+    for q in (vectors[0]["values"], vectors[123]["values"]):
+        matches = store.query(vector=q, top_k=10, filter=flt, include_metadata=True).matches
+        assert all(keep(m.metadata) for m in matches)
+        assert [m.id for m in matches] == _brute(vectors, q, 10, keep)
+
+def test_unsupported_filter(store):
+    store.upsert(_vectors(3))
+    with pytest.raises(ValueError):
+        store.query(vector=[1.0] * DIM, filter={"page": {"$regex": "x"}})
+    with pytest.raises(ValueError):
+        store.query(vector=[1.0] * DIM, filter={"page; DROP TABLE rows": 1})
+
+def test_delete_by_id_filter_and_all(store):
+    vectors = _vectors(100)
+    store.upsert(vectors)
+    store.delete(ids=["v0", "v1", "nope"])
+    assert len(store) == 98 and not store.fetch(["v0", "v1"]).vectors
+    store.delete(filter={"source": "doc2.pdf"})
+    assert len(store) == 98 - 25  # every fourth id is doc2.pdf
+    matches = store.query(vector=vectors[2]["values"], top_k=100, include_metadata=True).matches
+    assert all(m.metadata["source"] != "doc2.pdf" for m in matches)
+    assert {"v0", "v1"}.isdisjoint(m.id for m in matches)
+    store.delete(delete_all=True)
+    assert len(store) == 0
+    assert store.query(vector=vectors[2]["values"], top_k=5).matches == []
+
+def test_compact_and_reopen(tmp_path):
+    path = str(tmp_path / "store")
+    store = LocalVectorStore(path)
+    vectors = _vectors(200)
+    store.upsert(vectors)
+    store.upsert(_vectors(50, seed=5))  # replaces v0..v49
+    store.delete(ids=[f"v{i}" for i in range(150, 200)])
+    live = _vectors(50, seed=5) + vectors[50:150]
+    queries = [v["values"] for v in live[::17]]
+    before = [[(m.id, round(m.score, 5)) for m in store.query(vector=q, top_k=8).matches] for q in queries]
+
+    assert store.compact() == 100
+    assert store.describe_index_stats().stored_rows == 150 and len(store) == 150
+    after = [[(m.id, round(m.score, 5)) for m in store.query(vector=q, top_k=8).matches] for q in queries]
+    assert after == before
+    assert [m.id for m in store.query(vector=queries[0], top_k=8, filter={"building": "south"}).matches] \
+        == _brute(live, queries[0], 8, lambda m: m["building"] == "south")
+
+    reopened = LocalVectorStore(path)
+    assert len(reopened) == 150
+    assert [[(m.id, round(m.score, 5)) for m in reopened.query(vector=q, top_k=8).matches] for q in queries] == before
+
+def test_ann_covers_rows_appended_after_build(store):
+    vectors = _vectors(2000, seed=3)
+    store.upsert(vectors[:1500])
+    store.build_ann(nlist=16)
+    store.upsert(vectors[1500:])
+    store.nprobe = 16  # probing every list makes IVF exact
+    for v in vectors[::97]:
+        assert [m.id for m in store.query(vector=v["values"], top_k=5).matches] == _brute(vectors, v["values"], 5)
+
+def test_query_by_id(store):
+    vectors = _vectors(100)
+    store.upsert(vectors)
+    assert [m.id for m in store.query(id="v9", top_k=3).matches] == _brute(vectors, vectors[9]["values"], 3)
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from backend.agents.via.match_rank_agent import MatchRankAgent
+
+HOODS = ["Midtown South", "Flatiron", "Chelsea", "SoHo", "Tribeca", "NoMad"]
+AMENITIES = ["elevator", "doorman", "gym", "roof deck", "pet friendly", "parking"]
+
+def _inventory(n, rng):
+    return [{
+        "id": str(i),
+        "neighborhood": rng.choice(HOODS),
+        "sqft": rng.choice([0, rng.randint(500, 12000)]),
+        "rent": rng.randint(0, 40000),
+        "amenities": rng.sample(AMENITIES, rng.randint(0, 4)),
+    } for i in range(n)]
+
+def _spec(rng):
+    spec = {"must_haves": rng.sample(AMENITIES, rng.choice([0, 0, 1, 2, 4]))}
+    if rng.random() < 0.6:
+        spec["min_sqft"] = rng.randint(500, 9000)
+    if rng.random() < 0.6:
+        spec["max_sqft"] = rng.randint(1000, 12000)
+    if rng.random() < 0.6:
+        spec["budget_monthly_usd"] = {"min": rng.choice([None, rng.randint(0, 10000)]),
+                                      "max": rng.choice([None, rng.randint(5000, 40000)])}
+    if rng.random() < 0.5:
+        spec["location"] = rng.sample(["chelsea", "soho", "tribeca", "noho"], rng.randint(1, 2))
+    return spec
+
+@pytest.mark.parametrize("n", [3, 40, 2000])
+def test_indexed_run_matches_rowwise_baseline(n):
+    rng = random.Random(n)
+    agent = MatchRankAgent(_inventory(n, rng))
+    for _ in range(300):
+        spec = _spec(rng)
+        original = dict(spec)
+        topn = rng.choice([1, 3, 5, 10])
+        fast = agent.run(spec, topn=topn)
+        assert spec == original  # the caller's spec is not touched
+        # same ranking as the row loop over the spec actually used (widened, if relaxed)
+        slow = agent._run_rowwise(dict(fast.spec_used), topn=topn)
+        assert [(m.id, m.score) for m in fast.matches] == [(m.id, m.score) for m in slow.matches], spec
+        for m in fast.matches:
+            relaxed = bool(spec.get("max_sqft")) and spec["max_sqft"] < (m.row_preview["sqft"] or 0) <= fast.spec_used["max_sqft"]
+            assert (m.relaxed_field == "max_sqft") == relaxed, spec
+
+def test_relaxation_brings_in_units_just_above_max_sqft():
+    rows = [
+        {"id": "fits", "sqft": 950, "rent": 100, "amenities": ["gym"]},
+        {"id": "just-above", "sqft": 1080, "rent": 100, "amenities": ["gym"]},
+        {"id": "far-above", "sqft": 1500, "rent": 100, "amenities": ["gym"]},
+        {"id": "no-gym", "sqft": 900, "rent": 100, "amenities": []},
+    ]
+    agent = MatchRankAgent(rows)
+    spec = {"max_sqft": 1000, "must_haves": ["gym"]}
+    res = agent.run(spec, topn=3)
+    assert spec["max_sqft"] == 1000 and res.spec_used["max_sqft"] == 1100
+    assert [(m.id, m.score, m.relaxed_field) for m in res.matches] == [
+        ("fits", 20.0, None), ("just-above", 20.0, "max_sqft"), ("far-above", 0.0, None)]
+
+def test_no_relaxation_with_enough_units_in_range():
+    rows = [{"id": str(i), "sqft": 900 + i, "rent": 100, "amenities": []} for i in range(3)]
+    rows.append({"id": "above", "sqft": 1050, "rent": 100, "amenities": []})
+    res = MatchRankAgent(rows).run({"max_sqft": 1000}, topn=4)
+    assert res.spec_used["max_sqft"] == 1000
+    assert [(m.id, m.score, m.relaxed_field) for m in res.matches][-1] == ("above", 0.0, None)
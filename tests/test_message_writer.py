@@ -0,0 +1,116 @@
+import time
+import threading
+
+import pytest
+
+from backend.db import supabase_client as sc
+from backend.db.sqlite_supabase import SQLiteSupabase
+
+class GatedClient:
+    """SQLiteSupabase whose inserts for `blocked` conversations wait until `gate` is set."""
+    def __init__(self, db, blocked=()):
+        self.db = db
+        self.blocked = set(blocked)
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+
+    def table(self, name):
+        q = self.db.table(name)
+        insert = q.insert
+
+        def gated(rows):
+            if any(r.get("conversation_id") in self.blocked for r in rows):
+                self.entered.set()
+                self.gate.wait(10)
+            return insert(rows)
+        q.insert = gated
+        return q
+
+@pytest.fixture
+def db(monkeypatch):
+    db = SQLiteSupabase()
+    monkeypatch.setattr(sc, "_client", db)
+    yield db
+
+@pytest.fixture
+def writer(db, monkeypatch):
+    # a long flush interval: rows only reach the table early through a batch filling up or a flush
+    w = sc.MessageWriter(client=db, batch_size=50, flush_seconds=5)
+    monkeypatch.setattr(sc, "_writer", w)
+    yield w
+    w.close(timeout=5)
+
+def _texts(rows):
+    return [r["message_text"] for r in rows]
+
+def test_rows_are_bulk_inserted_in_batches(db, writer):
+    for i in range(120):
+        writer.add({"conversation_id": "c", "sender": "user", "message_text": f"m{i}"})
+    writer.flush()
+    stats = writer.stats()
+    assert stats["written"] == 120 and stats["batches"] == 3 and stats["failed"] == 0
+    assert writer.pending() == 0
+    assert _texts(db.table("chat_messages").select("*").order("id").execute().data) == [f"m{i}" for i in range(120)]
+
+def test_reads_see_queued_messages(writer):
+    t0 = time.monotonic()
+    sc.add_message("c", "user", "hello")
+    sc.add_message("c", "assistant", "hi there")
+    assert _texts(sc.get_recent_messages("c")) == ["hello", "hi there"]
+    assert _texts(sc.get_messages("c").data) == ["hello", "hi there"]
+    assert time.monotonic() - t0 < 2  # did not wait for the 5 s flush interval
+
+def test_read_waits_only_for_its_own_conversation(db):
+    client = GatedClient(db, blocked={"busy"})
+    w = sc.MessageWriter(client=client, batch_size=1, flush_seconds=5)
+    try:
+        w.add({"conversation_id": "mine", "sender": "user", "message_text": "a"})
+        w.add({"conversation_id": "busy", "sender": "user", "message_text": "b"})
+        assert client.entered.wait(5)  # the worker is stuck on the busy conversation
+
+        done = threading.Event()
+        threading.Thread(target=lambda: (w.flush("mine"), done.set()), daemon=True).start()
+        assert done.wait(2)
+        assert w.pending("mine") == 0 and w.pending("busy") == 1
+
+        everything = threading.Event()
+        threading.Thread(target=lambda: (w.flush(), everything.set()), daemon=True).start()
+        assert not everything.wait(0.3)
+        client.gate.set()
+        assert everything.wait(5)
+        assert w.pending() == 0
+    finally:
+        client.gate.set()
+        w.close(timeout=5)
+
+def test_flush_does_not_wait_for_later_writes(db):
+    client = GatedClient(db, blocked={"later"})
+    w = sc.MessageWriter(client=client, batch_size=1, flush_seconds=5)
+    try:
+        w.add({"conversation_id": "early", "sender": "user", "message_text": "a"})
+        w.flush()
+        # rows queued after the flush returned do not hold up the next flush of earlier rows
+        w.add({"conversation_id": "early", "sender": "user", "message_text": "b"})
+        done = threading.Event()
+        threading.Thread(target=lambda: (w.flush(), done.set()), daemon=True).start()
+        w.add({"conversation_id": "later", "sender": "user", "message_text": "c"})
+        assert done.wait(2)
+    finally:
+        client.gate.set()
+        w.close(timeout=5)
+
+def test_keyset_pages(writer):
+    for i in range(250):
+        sc.add_message("k", "user", f"k{i}")
+        if i % 25 == 0:
+            sc.add_message("other", "user", f"o{i}")
+    expected = [f"k{i}" for i in range(250)]
+
+    first = sc.get_messages("k", limit=100).data
+    second = sc.get_messages("k", after_id=first[-1]["id"], limit=100).data
+    third = sc.get_messages("k", after_id=second[-1]["id"], limit=100).data
+    assert _texts(first + second + third) == expected
+    assert len(third) == 50
+    assert [r["message_text"] for r in sc.iter_messages("k", page_size=97)] == expected
+    assert _texts(sc.get_recent_messages("k", limit=20)) == expected[-20:]
+    assert sc.get_messages("k", after_id=third[-1]["id"]).data == []
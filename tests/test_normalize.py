@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.loaders.normalize import (to_number, to_currency, to_percent, to_bool, to_list, to_text,
+                                       normalize_frame, infer_kinds, rows_to_text, _synthetic_units)
+
+def _values(s):
+    return [None if isinstance(v, float) and math.isnan(v) else v for v in s.tolist()]
+
+def test_to_number():
+    s = pd.Series(["$1,622,550", "$87.00", "(1,200)", "18,650 sqft", "$87.00/SF/Yr", "$4,500/mo",
+                   " 42 ", "1e3", "n/a", "", None, "-5", "USD 300"], index=range(10, 23))
+    out = to_number(s)
+    assert out.dtype == "float64" and list(out.index) == list(s.index)
+    assert _values(out) == [1622550.0, 87.0, -1200.0, 18650.0, 87.0, 4500.0, 42.0, 1000.0,
+                            None, None, None, -5.0, 300.0]
+    assert to_currency is to_number
+
+def test_to_number_plain_and_numeric_columns():
+    assert _values(to_number(pd.Series(["1", "2.5", "(3)"]))) == [1.0, 2.5, -3.0]
+    ints = pd.Series([1, 2, 3])
+    assert to_number(ints).dtype == "float64" and _values(to_number(ints)) == [1.0, 2.0, 3.0]
+
+def test_to_percent():
+    out = to_percent(pd.Series(["3.5%", " 12 % ", "0.04", "1,000%", "", "abc", None]))
+    assert out.dtype == "float64"
+    assert _values(out) == [pytest.approx(0.035), pytest.approx(0.12), 0.04, 10.0, None, None, None]
+    assert _values(to_percent(pd.Series([0.1, 0.2]))) == [0.1, 0.2]
+
+def test_to_bool():
+    s = pd.Series(["Yes", "no", "Pets allowed", "No pets", "TRUE", "0", "", None, "maybe", "y", "Not allowed"])
+    out = to_bool(s)
+    assert out.dtype == bool
+    assert out.tolist() == [True, False, True, False, True, False, False, False, False, True, False]
+    assert to_bool(pd.Series([True, None, False], dtype="boolean")).tolist() == [True, False, False]
+
+def test_to_list():
+    s = pd.Series(["Gym; Roof deck", "Doorman, Bike room", "", None, "Pet friendly|Laundry",
+                   '["Gym", "Pool"]', '["a, b", "c"]', '[1, 2]', "[broken", " ;Gym;; ", "Solo"])
+    out = to_list(s)
+    assert out.dtype == object
+    assert out.tolist() == [["Gym", "Roof deck"], ["Doorman", "Bike room"], [], [], ["Pet friendly", "Laundry"],
+                            ["Gym", "Pool"], ["a, b", "c"], ["1", "2"], ["broken"], ["Gym"], ["Solo"]]
+
+def test_to_text():
+    out = to_text(pd.Series(["  a ", None, "b"]))
+    assert out[0] == "a" and pd.isna(out[1]) and out[2] == "b"
+
+def test_normalize_frame_and_infer_kinds():
+    df = pd.DataFrame({"Rent": ["$1,000", "$2,500.50", "($10)"], "Vacancy": ["5%", "10.5%", "0%"],
+                       "Name": ["A", "B", "C"], "Units": [1, 2, 3]})
+    kinds = infer_kinds(df)
+    assert kinds == {"Rent": "currency", "Vacancy": "percent"}
+    out = normalize_frame(df, {**kinds, "Missing": "bool"})
+    assert _values(out["Rent"]) == [1000.0, 2500.5, -10.0]
+    assert _values(out["Vacancy"]) == [0.05, 0.105, 0.0]
+    assert out["Name"].tolist() == ["A", "B", "C"] and df["Rent"][0] == "$1,000"
+
+def test_rows_to_text():
+    df = pd.DataFrame({"Address": [" 1 Main St ", "", None], "Rent": [100.0, None, 300.0],
+                       "Amenities": [["Gym", "Pool"], [], ["Roof"]]})
+    assert rows_to_text(df) == ["Address: 1 Main St; Rent: 100; Amenities: Gym, Pool", "", "Rent: 300; Amenities: Roof"]
+    assert rows_to_text(df.head(0)) == []
+
+def test_matches_per_cell_parsing_on_synthetic_units():
+    df = _synthetic_units(500, seed=3).astype(str)
+
+    def cell(x):
+        try:
+            return float(str(x).replace("$", "").replace(",", ""))
+        except ValueError:
+            return np.nan
+    for col in ("Size (SF)", "Rent/SF/Year", "Annual Rent", "Monthly Rent"):
+        assert np.allclose(to_currency(df[col]).to_numpy(), df[col].map(cell).to_numpy(), equal_nan=True)
+    assert np.allclose(to_percent(df["Vacancy"]).to_numpy(), df["Vacancy"].str.rstrip("%").astype(float) / 100)
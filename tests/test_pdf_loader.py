@@ -0,0 +1,28 @@
+import pytest
+from PyPDF2 import PdfWriter
+
+from backend.loaders import pdf_loader
+
+@pytest.fixture
+def blank_pdf(tmp_path):
+    path = str(tmp_path / "blank.pdf")
+    writer = PdfWriter()
+    for _ in range(30):
+        writer.add_blank_page(100, 100)
+    writer.write(path)
+    return path
+
+def test_parallel_extraction_keeps_page_order_and_reuses_the_pool(blank_pdf):
+    pages = list(pdf_loader.iter_pdf_pages(blank_pdf, workers=2, max_pages_in_flight=8))
+    assert [p for p, _ in pages] == list(range(1, 31))
+    pool = pdf_loader._pools[2]
+    # abandoning a document part-way leaves the shared pool usable
+    partial = pdf_loader.iter_pdf_pages(blank_pdf, workers=2, max_pages_in_flight=8)
+    next(partial)
+    partial.close()
+    assert len(list(pdf_loader.iter_pdf_pages(blank_pdf, workers=2))) == 30
+    assert pdf_loader._pools[2] is pool
+
+def test_serial_path_matches_parallel(blank_pdf):
+    assert list(pdf_loader.iter_pdf_pages(blank_pdf, workers=1)) == \
+        list(pdf_loader.iter_pdf_pages(blank_pdf, workers=2, max_pages_in_flight=8))
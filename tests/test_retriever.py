@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend.core import embedding_cache
+from backend.core.embedding_cache import EmbeddingCache
+from backend.rag.retriever import Retriever, LocalANNBackend, build_filter, make_backend
+from backend.utils.local_vector_store import LocalVectorStore
+from conftest import fake_vector, AsyncFakeEmbeddings
+
+CLAUSES = [f"Clause {i}: the tenant pays {i * 10} dollars for item {i}." for i in range(60)]
+
+def _meta(i):
+    return {"kind": "chunk", "text": CLAUSES[i], "source": f"lease{i % 3}.pdf", "page": i % 12 + 1, "building": f"B{i % 4}"}
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    c = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    monkeypatch.setattr(embedding_cache, "_default_cache", c)
+    yield c
+    c._conn.close()
+
+@pytest.fixture
+def backend(tmp_path):
+    b = LocalANNBackend(LocalVectorStore(str(tmp_path / "store")))
+    b.add([f"c{i}" for i in range(len(CLAUSES))], [fake_vector(t) for t in CLAUSES],
+          [_meta(i) for i in range(len(CLAUSES))])
+    return b
+
+@pytest.fixture
+def retriever(backend, embed_client):
+    return Retriever(backend=backend, top_k=3, client=embed_client,
+                     aclient=SimpleNamespace(embeddings=AsyncFakeEmbeddings()), hybrid=False)
+
+def test_build_filter():
+    assert build_filter() is None
+    assert build_filter(source="a.pdf", page=[1, 2], building={"$ne": "B1"}) == {
+        "source": {"$eq": "a.pdf"}, "page": {"$in": [1, 2]}, "building": {"$ne": "B1"}}
+    assert build_filter(page={"$gte": 3, "$lte": 7}) == {"page": {"$gte": 3, "$lte": 7}}
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_backend("faiss")
+
+def test_retrieve_finds_the_matching_chunk(retriever):
+    hits = retriever.retrieve(CLAUSES[17])
+    assert len(hits) == 3
+    assert hits[0]["id"] == "c17" and hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert hits[0]["text"] == CLAUSES[17] and hits[0]["source"] == "lease2.pdf"
+    assert hits[0]["score"] >= hits[1]["score"] >= hits[2]["score"]
+
+def test_filters_restrict_results(retriever):
+    hits = retriever.retrieve(CLAUSES[17], top_k=10, source="lease0.pdf", page={"$lte": 6})
+    assert hits and all(h["source"] == "lease0.pdf" and h["page"] <= 6 for h in hits)
+    assert "c17" not in {h["id"] for h in hits}
+    hits = retriever.retrieve(CLAUSES[5], top_k=5, filter={"building": "B1"}, page=[6, 7])
+    assert [h["id"] for h in hits][:1] == ["c5"]
+    assert all(h["building"] == "B1" and h["page"] in (6, 7) for h in hits)
+
+def test_retrieve_many_embeds_the_batch_once(retriever, embed_client):
+    queries = [CLAUSES[1], CLAUSES[2], CLAUSES[1]]
+    results = retriever.retrieve_many(queries)
+    assert [r[0]["id"] for r in results] == ["c1", "c2", "c1"]
+    assert embed_client.embeddings.calls == [[CLAUSES[1], CLAUSES[2]]]
+    retriever.retrieve_many(queries)
+    assert len(embed_client.embeddings.calls) == 1  # served from the embedding cache
+    assert retriever.retrieve_many([]) == []
+
+def test_async_matches_sync(retriever):
+    queries = [CLAUSES[3], CLAUSES[40]]
+    got = asyncio.run(retriever.aretrieve_many(queries, top_k=4, source="lease1.pdf"))
+    want = retriever.retrieve_many(queries, top_k=4, source="lease1.pdf")
+    assert [[h["id"] for h in r] for r in got] == [[h["id"] for h in r] for r in want]
+
+def test_ann_backend_agrees_with_exact(backend):
+    queries = np.asarray([fake_vector(t) for t in CLAUSES[::7]], dtype=np.float32)
+    exact = [[m["id"] for m in r] for r in backend.query(queries, 5)]
+    backend.build_ann(nlist=4)
+    backend.store.nprobe = 4
+    assert [[m["id"] for m in r] for r in backend.query(queries, 5)] == exact
+
+def test_memory_records_in_the_index_are_not_retrieved(backend, retriever, embed_client):
+    # conversation memory shares the index: no kind, no text
+    backend.add(["m1"], [fake_vector(CLAUSES[17])], [{"type": "user_input", "query": CLAUSES[17]}])
+    assert "m1" not in {h["id"] for h in retriever.retrieve(CLAUSES[17], top_k=10)}
+    # untagged legacy chunks are still reachable with the kind filter off, text-less matches never are
+    untagged = Retriever(backend=backend, top_k=10, client=embed_client, hybrid=False, kind="")
+    hits = untagged.retrieve(CLAUSES[17])
+    assert hits[0]["id"] == "c17" and "m1" not in {h["id"] for h in hits}
@@ -0,0 +1,27 @@
+import random
+
+from backend.agents.doma.service_triage_agent import ServiceTriageAgent
+
+TICKETS = [
+    "The AC is not cooling", "Water leaking under the kitchen sink", "I smell gas near the stove",
+    "Back door lock is broken", "Heater makes a loud noise", "Contact me about the backyard fence",
+    "There is a gas leak in the basement", "", "SPARKS from the outlet", "drip drip drip",
+]
+
+def test_classify_batch_matches_classify():
+    agent = ServiceTriageAgent()
+    rng = random.Random(3)
+    tickets = [rng.choice(TICKETS) for _ in range(500)]
+    ranks = agent.classify_batch(tickets)
+    assert [agent.categories[r] for r in ranks] == [agent.classify(t) for t in tickets]
+
+def test_classify_batch_with_case_folding_that_changes_length():
+    # "İ".lower() is two code points, which shifts offsets in the joined text
+    agent = ServiceTriageAgent()
+    tickets = ["İİİİİİİİİİİİİİİİİİİİ lobby light", "the heater is out", "toilet clogged", "İstanbul office: sparks"]
+    ranks = agent.classify_batch(tickets)
+    assert [agent.categories[r] for r in ranks] == [agent.classify(t) for t in tickets]
+    assert [agent.categories[r] for r in ranks] == ["general", "hvac", "plumbing", "emergency"]
+
+def test_run_batch_empty():
+    assert ServiceTriageAgent().run_batch([]) == []
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import backend.api.upload as upload
+
+class FakeJobQueue:
+    """Records submissions; every file stays queued."""
+    def __init__(self):
+        self.jobs = {}
+
+    def submit(self, file_paths, building=None, rewrite=()):
+        job_id = f"job{len(self.jobs)}"
+        self.jobs[job_id] = {"job_id": job_id, "building": building, "files": [
+            {"path": p, "status": "queued", "incremental": p not in rewrite} for p in file_paths]}
+        return self.jobs[job_id]
+
+    def status(self, job_id):
+        return self.jobs.get(job_id)
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(upload, "_HASH_INDEX", str(tmp_path / ".upload_hashes.json"))
+    monkeypatch.setattr(upload, "job_queue", FakeJobQueue())
+    app = FastAPI()
+    app.include_router(upload.router)
+    return TestClient(app)
+
+def _post(client, files, building=None):
+    data = {"building": building} if building else {}
+    resp = client.post("/upload_docs", files=[("files", (n, b)) for n, b in files], data=data)
+    assert resp.status_code == 200
+    return resp.json()
+
+def test_new_version_of_a_file_does_not_overwrite_the_queued_one(client):
+    first = _post(client, [("lease.txt", b"v1")])
+    second = _post(client, [("lease.txt", b"v2")])
+    p1, p2 = first["files"][0]["path"], second["files"][0]["path"]
+    assert p1 != p2
+    assert os.path.basename(p1) == os.path.basename(p2) == "lease.txt"
+    with open(p1, "rb") as f:
+        assert f.read() == b"v1"
+
+def test_identical_files_in_one_request_are_ingested_once(client):
+    body = _post(client, [("a.txt", b"same"), ("b.txt", b"same")])
+    assert len(body["job"]["files"]) == 1
+    assert body["files"][1]["duplicate_of"] == body["files"][0]["path"]
+
+def test_duplicate_upload_is_skipped_for_the_same_building(client):
+    _post(client, [("lease.txt", b"v1")], building="A")
+    body = _post(client, [("lease.txt", b"v1")], building="A")
+    assert "job_id" not in body
+    assert body["files"][0]["duplicate_of"]
+
+def test_building_change_reingests_without_incremental(client):
+    first = _post(client, [("lease.txt", b"v1")], building="A")
+    body = _post(client, [("lease.txt", b"v1")], building="B")
+    assert body["job"]["building"] == "B"
+    assert body["job"]["files"] == [{"path": first["files"][0]["path"], "status": "queued", "incremental": False}]
+    # and once re-ingested for B, the same upload is a duplicate again
+    assert "job_id" not in _post(client, [("lease.txt", b"v1")], building="B")